@@ -4,15 +4,22 @@ import plotly.express as px
 import os 
 import pandas.api.types
 import json
-import gspread
-from google.oauth2.service_account import Credentials
+import re
+import threading
+import itertools
+import time
 from auth import (
     check_password,
     get_user_info,
     change_password_db,
+    get_data_store,
     user_manager_interface
 )
 from datetime import datetime # Importa datetime
+import ingest
+import metrics
+import store
+from storage import StorageError, get_storage
 
 # --- Configuração Inicial ---
 st.set_page_config(
@@ -22,8 +29,7 @@ st.set_page_config(
 )
 
 # Mapeamento de meses (para facilitar a identificação dos arquivos e ordenação)
-MESES_ORDER = ["janeiro", "fevereiro", "março", "abril", "maio", "junho", 
-               "julho", "agosto", "setembro", "outubro", "novembro", "dezembro"]
+MESES_ORDER = ingest.MESES_ORDER
 MESES = {month: f"{month}.csv" for month in MESES_ORDER}
 
 
@@ -52,402 +58,393 @@ def format_time(minutes):
         return 'N/A'
 
 def apply_formatting(df):
-    """Aplica formatação condicional (Tempo, Percentual) ao DataFrame."""
-    df_copy = df.copy()
+    """Prepara o DataFrame para exibição sem copiar os dados.
+
+    Tempos viram MM:SS de uma vez por coluna (ingest.format_duration). FCR e
+    Satisfação continuam numéricos, na escala 0-100: quem formata como
+    '88.89%' é o próprio st.dataframe, só nas linhas visíveis (ver table_config).
+    """
+    # Cópia rasa: as colunas não alteradas continuam apontando para os mesmos dados
+    df_copy = df.copy(deep=False)
     
     # Colunas de Tempo
     time_cols = [col for col in ['TMA', 'TME', 'TMIA', 'TMIC'] if col in df_copy.columns]
     for col in time_cols:
-         # Verifica se a coluna é numérica antes de aplicar format_time
+         # Verifica se a coluna é numérica antes de formatar
         if pd.api.types.is_numeric_dtype(df_copy[col]):
-             df_copy[col] = df_copy[col].apply(format_time)
+             df_copy[col] = ingest.format_duration(df_copy[col])
 
     # Colunas de Porcentagem (FCR e Satisfacao)
     
     if 'FCR' in df_copy.columns and pd.api.types.is_numeric_dtype(df_copy['FCR']):
-        df_copy['FCR'] = (df_copy['FCR'] * 100).map('{:.2f}%'.format)
+        df_copy['FCR'] = df_copy['FCR'].astype('float64') * 100
 
     if 'Satisfacao' in df_copy.columns and pd.api.types.is_numeric_dtype(df_copy['Satisfacao']):
         # Converte a métrica de 0-5 para 0-100%
-        df_copy['Satisfacao'] = (df_copy['Satisfacao'] / 5.0 * 100).map('{:.2f}%'.format)
+        df_copy['Satisfacao'] = df_copy['Satisfacao'].astype('float64') / 5.0 * 100
         
     return df_copy
 
+def quantile_formatting(df, metric):
+    """apply_formatting para as tabelas de uma métrica só (Agente, Média, p50, p90, p99)."""
+    df_copy = df.copy(deep=False)
+    stat_cols = [col for col in df_copy.columns if col != 'Agente']
+    for col in stat_cols:
+        df_copy[col] = apply_formatting(pd.DataFrame({metric: df_copy[col]}))[metric]
+    config = {}
+    if metric in ['FCR', 'Satisfacao']:
+        config = {col: st.column_config.NumberColumn(col, format="%.2f%%") for col in stat_cols}
+    return df_copy, config
+
+def table_config(df):
+    """column_config do st.dataframe para as colunas percentuais de apply_formatting."""
+    return {
+        col: st.column_config.NumberColumn(col, format="%.2f%%")
+        for col in ['FCR', 'Satisfacao'] if col in df.columns
+    }
+
 
 # --- Funções de Carregamento e Tratamento de Dados ---
+# Todas passam pelo motor de ingestão (ingest.py), que declara o esquema de cada tipo de arquivo,
+# e leem do store colunar (store.py), que só recompila os CSVs alterados.
+
+@st.cache_resource
+def get_file_cache():
+    """Cache por arquivo (caminho, mtime, tamanho): um CSV novo na pasta só lê ele mesmo."""
+    return ingest.FileCache(reader=get_data_store().read_file)
+
+@st.cache_resource
+def get_protocol_index():
+    """Índice num_protocolo -> avaliações de todas as pastas notas/ (store.ProtocolIndex)."""
+    data_store = get_data_store()
+    return store.ProtocolIndex(data_store.store_dir, data_store.data_dir, reader=data_store.read_file)
+
+# Cada carregador recebe a versão (mtime/tamanho) dos arquivos que lê: quando chega ou muda
+# um CSV, a chave do cache muda e o mês é remontado a partir das peças do get_file_cache().
+
 # Função principal: Carrega UM mês (usada para o painel principal)
-@st.cache_data(show_spinner="Carregando dados do mês selecionado...")
 def load_and_preprocess_data(file_name, selected_year): # ADICIONADO selected_year
     """Carrega o CSV específico do mês na pasta 'data/[ANO]/'."""
-    
+    file_path = os.path.join('data', str(selected_year), file_name)
+    return _load_and_preprocess_data(file_name, selected_year, ingest.file_version(file_path))
+
+@st.cache_data(show_spinner="Carregando dados do mês selecionado...")
+def _load_and_preprocess_data(file_name, selected_year, data_version):
     DATA_FOLDER = os.path.join('data', str(selected_year)) # ALTERADO
     file_path = os.path.join(DATA_FOLDER, file_name)
     
-    if not os.path.exists(file_path):
+    if data_version is None:
         st.warning(f"Arquivo de dados '{file_name}' não encontrado na pasta '{DATA_FOLDER}/'.")
         return pd.DataFrame()
         
     try:
-        df = pd.read_csv(file_path, encoding='utf-8', engine='python')
+        df = ingest.agent_rows(get_file_cache().read_file(file_path, 'mensal'))
     except Exception as e:
         st.error(f"Erro ao ler o arquivo {file_name}: {e}")
         return pd.DataFrame()
 
-    # LIMPEZA E RENOMEAÇÃO DE COLUNAS
-    cols = df.columns.str.strip().str.upper()
-    df.columns = cols.str.replace('[^A-Z0-9_]+', '', regex=True) 
-
-    rename_mapping = {
-        'NOM_AGENTE': 'Agente',
-        'QTDATENDIMENTO': 'QTD Atendimento', # Corrigido (sem S)
-        'SATISFACAO': 'Satisfacao',
-        'QTDSATISFACAO': 'QTD Avaliacoes',
-    }
-    df = df.rename(columns=rename_mapping)
-
-    EXPECTED_COLS = {
-        'QTD Atendimento', 'TMA', 'TME', 'TMIA', 'TMIC', 
-        'FCR', 'Satisfacao', 'NPS', 'QTD Avaliacoes', 'Agente'
-    }
-    
-    missing_cols = EXPECTED_COLS - set(df.columns)
+    missing_cols = ingest.missing_columns(df, 'mensal')
     if missing_cols:
          st.warning(f"As seguintes colunas esperadas não foram encontradas após a limpeza: {missing_cols}")
-
-    # Conversão de colunas de tempo
-    def time_to_minutes(time_str):
-        if pd.isna(time_str) or time_str == '': return 0.0
-        try:
-            parts = str(time_str).split(':')
-            if len(parts) == 3: # Formato HH:MM:SS
-                hours, minutes, seconds = map(float, parts)
-                return (hours * 60) + minutes + seconds / 60
-            elif len(parts) == 2: # Formato MM:SS
-                minutes, seconds = map(float, parts)
-                return minutes + seconds / 60
-            else:
-                return 0.0
-        except:
-            return 0.0
-
-    time_cols = ['TMA', 'TME', 'TMIA', 'TMIC']
-    for col in time_cols:
-        if col in df.columns:
-             if not df[col].isnull().all():
-                  df[col] = df[col].apply(time_to_minutes)
-
-
-    # Conversão de FCR, Satisfacao e NPS (Garantindo que são numéricos)
-    for col in ['FCR', 'Satisfacao', 'NPS']:
-        if col in df.columns:
-            current_col_name = col
-            df[current_col_name] = df[current_col_name].astype(str).str.replace('%', '', regex=False).str.replace(',', '.', regex=False)
-            df[current_col_name] = pd.to_numeric(df[current_col_name], errors='coerce')
-    
-    # Normaliza FCR (0-1) e Satisfação (0-5)
-    if 'FCR' in df.columns and pd.api.types.is_numeric_dtype(df['FCR']):
-        df['FCR'] = df['FCR'] / 100
-    
-    if 'Satisfacao' in df.columns and pd.api.types.is_numeric_dtype(df['Satisfacao']):
-        df['Satisfacao'] = df['Satisfacao'] / 100 * 5 
     
     return df
 
 # --- Função 2: Carrega TODOS os dados (para Histórico e Admin) ---
-@st.cache_data(show_spinner="Carregando histórico completo...")
 def load_all_history_data(selected_year): # ADICIONADO selected_year
     """Carrega TODOS os CSVs de TODOS os meses disponíveis na pasta 'data/[ANO]/' para o histórico."""
     DATA_FOLDER = os.path.join('data', str(selected_year)) # ALTERADO
-    df_list = []
-    
-    if not os.path.exists(DATA_FOLDER):
-        return pd.DataFrame()
-        
-    # 1. Leitura e Combinação dos Arquivos
-    for filename in os.listdir(DATA_FOLDER):
-        if filename.endswith(".csv"):
-            path = os.path.join(DATA_FOLDER, filename)
-            try:
-                df_temp = pd.read_csv(path, encoding='utf-8', engine='python')
-                
-                # Adiciona coluna de mês e ordenação
-                month_name = filename.replace('.csv', '').capitalize()
-                month_name_lower = month_name.lower()
-                if month_name_lower not in MESES: continue 
-                
-                # TRATAMENTO DE COLUNAS (ANTES de adicionar Mês/MonthSort)
-                df_temp.columns = df_temp.columns.str.strip().str.upper().str.replace('[^A-Z0-9_]+', '', regex=True) 
-                rename_mapping_temp = {
-                    'NOM_AGENTE': 'Agente', 'QTDATENDIMENTO': 'QTD Atendimento', # Corrigido (sem S)
-                    'SATISFACAO': 'Satisfacao', 'QTDSATISFACAO': 'QTD Avaliacoes',
-                }
-                df_temp = df_temp.rename(columns=rename_mapping_temp)
-                
-                # Adiciona Mês e MonthSort DEPOIS da limpeza
-                df_temp['Mês'] = month_name
-                df_temp['MonthSort'] = MESES_ORDER.index(month_name_lower)
+    return _load_all_history_data(selected_year, ingest.folder_version(DATA_FOLDER))
 
-                if df_temp.empty or 'Agente' not in df_temp.columns: continue
-                
-                df_list.append(df_temp)
-            except Exception as e:
-                continue
-
-    if not df_list: return pd.DataFrame()
-    df = pd.concat(df_list, ignore_index=True)
-
-    # --- Tratamento Final (Geral para Histórico) ---
-    time_cols = ['TMA', 'TME', 'TMIA', 'TMIC']
-    def time_to_minutes(time_str):
-        if pd.isna(time_str) or time_str == '': return 0.0
-        try: parts = str(time_str).split(':')
-        except: return 0.0
-        try:
-            if len(parts) == 3: h, m, s = map(float, parts); return (h * 60) + m + s / 60
-            elif len(parts) == 2: m, s = map(float, parts); return m + s / 60
-            else: return 0.0
-        except: return 0.0
-    for col in time_cols:
-        if col in df.columns and not df[col].isnull().all(): 
-             df[col] = df[col].apply(time_to_minutes)
-    for col in ['FCR', 'Satisfacao', 'NPS']:
-        if col in df.columns:
-            df[col] = df[col].astype(str).str.replace('%', '', regex=False).str.replace(',', '.', regex=False)
-            df[col] = pd.to_numeric(df[col], errors='coerce')
-    if 'FCR' in df.columns and pd.api.types.is_numeric_dtype(df['FCR']): df['FCR'] = df['FCR'] / 100
-    if 'Satisfacao' in df.columns and pd.api.types.is_numeric_dtype(df['Satisfacao']): df['Satisfacao'] = df['Satisfacao'] / 100 * 5 
-    
-    return df
+@st.cache_data(show_spinner="Carregando histórico completo...")
+def _load_all_history_data(selected_year, data_version):
+    DATA_FOLDER = os.path.join('data', str(selected_year)) # ALTERADO
+
+    def annotate(df_temp, filename):
+        month_name_lower = filename.replace('.csv', '').lower()
+        if month_name_lower not in MESES or 'Agente' not in df_temp.columns:
+            return None
+        return ingest.annotate_month(df_temp, month_name_lower)
+
+    return ingest.load_folder(DATA_FOLDER, 'mensal', annotate, reader=get_file_cache().read_file)
+
+# --- Função 2b: Histórico por intervalo de meses (atravessa os anos) ---
+def load_history_range(months, agente_name=None):
+    """Carrega só os arquivos mensais dos meses pedidos [(ano, 'mês'), ...], de qualquer ano."""
+    months = tuple(months)
+    df_range = _load_history_range(months, ingest.range_version(months))
+    if agente_name:
+        return ingest.agent_view(df_range, agente_name)
+    return df_range
+
+@st.cache_data(show_spinner="Carregando histórico do período...")
+def _load_history_range(months, data_version):
+    def on_error(filename, e):
+        st.warning(f"Erro ao ler o arquivo mensal {filename}: {e}")
+
+    df = ingest.load_months(months, reader=get_file_cache().read_file, on_error=on_error)
+    return ingest.index_by_agent(df)
+
+# --- Cubos de agregados (metrics.RollupCube) ---
+# Montados uma vez por versão dos dados, junto com os frames; os painéis fazem
+# só roll-ups (somas de células) sobre eles em vez de groupby a cada rerun.
+def load_history_cube(months):
+    """Cubo agente × mês dos meses pedidos [(ano, 'mês'), ...]."""
+    months = tuple(months)
+    return _load_history_cube(months, ingest.range_version(months))
+
+@st.cache_data(show_spinner=False)
+def _load_history_cube(months, data_version):
+    df = _load_history_range(months, data_version)
+    return metrics.RollupCube.from_frame(df, ['PeriodSort', 'Período', 'Mês', 'Ano'])
+
+def load_daily_cube(selected_month_name, selected_year):
+    """Cubo agente × dia dos diários de 'data/[ANO]/[mês]/'."""
+    DATA_FOLDER = os.path.join('data', str(selected_year), selected_month_name.lower())
+    return _load_daily_cube(selected_month_name, selected_year, ingest.folder_version(DATA_FOLDER))
+
+@st.cache_data(show_spinner=False)
+def _load_daily_cube(selected_month_name, selected_year, data_version):
+    df = _load_daily_data(selected_month_name, selected_year, data_version)
+    return metrics.RollupCube.from_frame(df, ['DaySort', 'Dia', 'Data'])
+
+def load_daily_sketches(selected_month_name, selected_year):
+    """Percentis (metrics.QuantileCube) dos valores diários de cada agente, com os mesmos dias de load_daily_cube."""
+    DATA_FOLDER = os.path.join('data', str(selected_year), selected_month_name.lower())
+    return _load_daily_sketches(selected_month_name, selected_year, ingest.folder_version(DATA_FOLDER))
+
+@st.cache_data(show_spinner=False)
+def _load_daily_sketches(selected_month_name, selected_year, data_version):
+    df = _load_daily_data(selected_month_name, selected_year, data_version)
+    return metrics.QuantileCube.from_frame(df, ['DaySort', 'Dia', 'Data'])
 
 # --- Função 3: Carrega os dados DIÁRIOS de uma subpasta ---
-@st.cache_data(show_spinner="Carregando detalhes diários...")
+# O mês é lido UMA vez (para todos os agentes) e ordenado por agente;
+# a visão de cada agente sai desse índice, sem nova leitura nem cópia por agente no cache.
 def load_daily_data(selected_month_name, selected_year, agente_name=None): # ADICIONADO selected_year
     """Carrega todos os CSVs da subpasta 'data/[ANO]/[mês]' e filtra pelo agente (se fornecido)."""
-    
+    DATA_FOLDER = os.path.join('data', str(selected_year), selected_month_name.lower())
+    df_month = _load_daily_data(selected_month_name, selected_year, ingest.folder_version(DATA_FOLDER))
+    if agente_name:
+        return ingest.agent_view(df_month, agente_name)
+    return df_month
+
+@st.cache_data(show_spinner="Carregando detalhes diários...")
+def _load_daily_data(selected_month_name, selected_year, data_version):
     month_folder_lower = selected_month_name.lower()
     DATA_FOLDER = os.path.join('data', str(selected_year), month_folder_lower) # ALTERADO: Inclui ano no caminho
-    
-    df_list = []
-    
-    if not os.path.exists(DATA_FOLDER) or not os.path.isdir(DATA_FOLDER):
-        return pd.DataFrame()
-        
-    for filename in os.listdir(DATA_FOLDER):
-        if filename.endswith(".csv"):
-            path = os.path.join(DATA_FOLDER, filename)
-            try:
-                df_temp = pd.read_csv(path, encoding='utf-8', engine='python')
-                
-                # Limpa colunas ANTES de adicionar Dia/DaySort
-                df_temp.columns = df_temp.columns.str.strip().str.upper().str.replace('[^A-Z0-9_]+', '', regex=True) 
-                rename_mapping_temp = {
-                    'NOM_AGENTE': 'Agente', 'QTDATENDIMENTO': 'QTD Atendimento', # Corrigido (sem S)
-                    'SATISFACAO': 'Satisfacao', 'QTDSATISFACAO': 'QTD Avaliacoes',
-                }
-                df_temp = df_temp.rename(columns=rename_mapping_temp)
-
-                # Adiciona coluna de Dia (01.10.csv -> 01/10)
-                day_month_str = filename.replace('.csv', '').replace('.', '/')
-                df_temp['Dia'] = day_month_str 
-                # Adiciona ordenação (01.10.csv -> 1)
-                df_temp['DaySort'] = int(filename.split('.')[0])
-                
-                # Adiciona a coluna de Data real (para o filtro de calendário)
-                month_num_index = MESES_ORDER.index(month_folder_lower)
-                month_num = month_num_index + 1
-                year = int(selected_year) # Usa o ano SELECIONADO
-                
-                # Cria um DataFrame de datas para garantir que a conversão funcione
-                date_components = pd.DataFrame({
-                    'year': [year] * len(df_temp),
-                    'month': [month_num] * len(df_temp),
-                    'day': df_temp['DaySort']
-                })
-                df_temp['Data'] = pd.to_datetime(date_components, errors='coerce')
-                
-                # Filtra pelo agente (se fornecido)
-                if agente_name and 'Agente' in df_temp.columns:
-                    df_temp = df_temp[df_temp['Agente'] == agente_name]
-                
-                if df_temp.empty: 
-                    continue
-                
-                df_list.append(df_temp)
-            except Exception as e:
-                st.warning(f"Erro ao processar o arquivo diário {filename}: {e}")
-                continue
-
-    if not df_list: return pd.DataFrame()
-    df = pd.concat(df_list, ignore_index=True)
-
-    # Tratamento de tipos (copiado de load_all_history_data)
-    time_cols = ['TMA', 'TME', 'TMIA', 'TMIC']
-    def time_to_minutes(time_str):
-        if pd.isna(time_str) or time_str == '': return 0.0
-        try: parts = str(time_str).split(':')
-        except: return 0.0
-        try:
-            if len(parts) == 3: h, m, s = map(float, parts); return (h * 60) + m + s / 60
-            elif len(parts) == 2: m, s = map(float, parts); return m + s / 60
-            else: return 0.0
-        except: return 0.0
-    for col in time_cols:
-        if col in df.columns and not df[col].isnull().all(): 
-             df[col] = df[col].apply(time_to_minutes)
-    for col in ['FCR', 'Satisfacao', 'NPS']:
-        if col in df.columns:
-            df[col] = df[col].astype(str).str.replace('%', '', regex=False).str.replace(',', '.', regex=False)
-            df[col] = pd.to_numeric(df[col], errors='coerce')
-    if 'FCR' in df.columns and pd.api.types.is_numeric_dtype(df['FCR']): df['FCR'] = df['FCR'] / 100
-    if 'Satisfacao' in df.columns and pd.api.types.is_numeric_dtype(df['Satisfacao']): df['Satisfacao'] = df['Satisfacao'] / 100 * 5 
-    
-    return df
 
-# --- Função 4: Carrega dados do Ranking Semanal ---
-@st.cache_data(show_spinner="Carregando dados do ranking semanal...")
-def load_ranking_data(filename, selected_year): # ADICIONADO selected_year
-    """Carrega um arquivo CSV de ranking da pasta 'data/[ANO]/semana/'."""
-    
-    RANKING_FILE_PATH = os.path.join('data', str(selected_year), 'semana', filename) # ALTERADO: Inclui ano no caminho
-    
-    if not os.path.exists(RANKING_FILE_PATH):
-        # Retorna um DF vazio, o erro será tratado na função de exibição
-        return pd.DataFrame()
-        
-    try:
-        df = pd.read_csv(RANKING_FILE_PATH, encoding='utf-8', engine='python')
-    except Exception as e:
-        st.error(f"Erro ao ler o arquivo de ranking {RANKING_FILE_PATH}: {e}")
-        return pd.DataFrame()
+    def annotate(df_temp, filename):
+        return ingest.annotate_day(df_temp, filename, month_folder_lower, selected_year)
 
-    # LIMPEZA E RENOMEAÇÃO DE COLUNAS
-    cols = df.columns.str.strip().str.upper()
-    df.columns = cols.str.replace('[^A-Z0-9_]+', '', regex=True) 
+    def on_error(filename, e):
+        st.warning(f"Erro ao processar o arquivo diário {filename}: {e}")
 
-    rename_mapping = {
-        'NOM_AGENTE': 'Agente',
-        'QTDATENDIMENTO': 'QTD Atendimento', # Corrigido (sem S)
-        'SATISFACAO': 'Satisfacao',
-        'QTDSATISFACAO': 'QTD Avaliacoes',
-    }
-    df = df.rename(columns=rename_mapping)
+    df = ingest.load_folder(DATA_FOLDER, 'diario', annotate, on_error, reader=get_file_cache().read_file)
+    return ingest.index_by_agent(df)
 
-    if 'Agente' not in df.columns:
-        st.error(f"Arquivo de ranking {filename} não contém a coluna 'Agente'.")
-        return pd.DataFrame()
+# --- Função 4: Semanas ISO montadas a partir dos diários ---
+# Substitui os arquivos exportados de data/[ANO]/semana/: qualquer semana vira um
+# cubo agente × dia, e só a semana que recebeu um dia novo muda de versão.
+def load_week_cube(iso_year, week):
+    """Cubo agente × dia da semana ISO (pode atravessar meses e anos)."""
+    return _load_week_cube(iso_year, week, ingest.week_version(iso_year, week))
 
-    # Conversão de colunas de tempo
-    def time_to_minutes(time_str):
-        if pd.isna(time_str) or time_str == '': return 0.0
-        try:
-            parts = str(time_str).split(':')
-            if len(parts) == 3: hours, minutes, seconds = map(float, parts); return (hours * 60) + minutes + seconds / 60
-            elif len(parts) == 2: minutes, seconds = map(float, parts); return minutes + seconds / 60
-            else: return 0.0
-        except: return 0.0
-
-    time_cols = ['TMA', 'TME', 'TMIA', 'TMIC']
-    for col in time_cols:
-        if col in df.columns and not df[col].isnull().all():
-             df[col] = df[col].apply(time_to_minutes)
-
-    # Conversão de FCR, Satisfacao e NPS (Garantindo que são numéricos)
-    for col in ['FCR', 'Satisfacao', 'NPS']:
-        if col in df.columns:
-            current_col_name = col
-            df[current_col_name] = df[current_col_name].astype(str).str.replace('%', '', regex=False).str.replace(',', '.', regex=False)
-            df[current_col_name] = pd.to_numeric(df[current_col_name], errors='coerce')
-    
-    # Normaliza FCR (0-1) e Satisfação (0-5)
-    if 'FCR' in df.columns and pd.api.types.is_numeric_dtype(df['FCR']):
-        df['FCR'] = df['FCR'] / 100
-    
-    if 'Satisfacao' in df.columns and pd.api.types.is_numeric_dtype(df['Satisfacao']):
-        df['Satisfacao'] = df['Satisfacao'] / 100 * 5 
-    
-    return df
+@st.cache_data(show_spinner="Carregando dados do ranking semanal...")
+def _load_week_cube(iso_year, week, data_version):
+    def on_error(filename, e):
+        st.warning(f"Erro ao processar o arquivo diário {filename}: {e}")
+
+    df = ingest.load_week(iso_year, week, reader=get_file_cache().read_file, on_error=on_error)
+    return metrics.RollupCube.from_frame(df, ['Data', 'Dia'])
+
+def ranking_weeks(selected_month_name, selected_year):
+    """(semana atual, semana anterior, todas as semanas com diários) para o mês selecionado.
+
+    A atual é a do último diário até o fim do mês (sem diários nele, a mais
+    recente). Em cache pela versão da pasta do mês, que é onde chegam os dias
+    da semana atual; o resto da árvore é relido a cada store.REFRESH_INTERVAL.
+    """
+    month, year = selected_month_name.lower(), str(selected_year)
+    return _ranking_weeks(month, year, ingest.folder_version(os.path.join('data', year, month)))
+
+@st.cache_data(ttl=store.REFRESH_INTERVAL, show_spinner=False)
+def _ranking_weeks(month, year, data_version):
+    month_end = (pd.Timestamp(int(year), MESES_ORDER.index(month) + 1, 1) + pd.offsets.MonthEnd(0)).date()
+    current, previous = ingest.current_weeks(until=month_end)
+    if current is None:
+        current, previous = ingest.current_weeks()
+    return current, previous, ingest.list_weeks()
+
+# --- Função 4b: Alertas diários (metrics.RollingAlerts) ---
+# O motor fica em memória, compartilhado pelas sessões, e só recebe os dias que
+# ainda não viu; se um dia já processado mudar (ou chegar um dia mais antigo que
+# o último), recomeça do zero. A árvore inteira só é listada quando muda a pasta
+# do último mês processado, ou a cada store.REFRESH_INTERVAL segundos (mês novo,
+# correção num mês antigo); nos outros reruns vale o resultado guardado.
+@st.cache_resource
+def get_alert_engine():
+    """Estado compartilhado: o motor, as versões dos dias já processados, o último resultado e um lock."""
+    return {'engine': metrics.RollingAlerts(), 'versions': {}, 'lock': threading.Lock(),
+            'folder': None, 'folder_version': None, 'scanned_at': None, 'result': None}
+
+def load_daily_alerts():
+    """(alertas do último dia, data do último dia), alimentando o motor com os diários novos."""
+    state = get_alert_engine()
+    with state['lock']:
+        if (state['result'] is not None and state['folder'] is not None
+                and time.monotonic() - state['scanned_at'] < store.REFRESH_INTERVAL
+                and ingest.folder_version(state['folder']) == state['folder_version']):
+            return state['result']
+
+        days = ingest.list_days()
+        current = {path: ingest.file_version(path) for _, path, _, _ in days}
+        engine, versions = state['engine'], state['versions']
+        new_days = [day for day in days if day[1] not in versions]
+        stale = any(current.get(path) != version for path, version in versions.items())
+        if stale or (new_days and engine.last_date is not None and new_days[0][0] <= engine.last_date):
+            engine, versions, new_days = metrics.RollingAlerts(), {}, days
+            state['engine'], state['versions'] = engine, versions
+
+        for date, group in itertools.groupby(new_days, key=lambda day: day[0]):
+            frames = []
+            for _, path, month_name_lower, year in group:
+                try:
+                    df_day = get_file_cache().read_file(path, 'diario')
+                    frames.append(ingest.agent_rows(ingest.annotate_day(df_day, os.path.basename(path), month_name_lower, year)))
+                except Exception as e:
+                    st.warning(f"Erro ao processar o arquivo diário {path}: {e}")
+                versions[path] = current[path]
+            engine.push(date, pd.concat(frames, ignore_index=True) if frames else pd.DataFrame())
+
+        state['folder'] = os.path.dirname(days[-1][1]) if days else None
+        state['folder_version'] = ingest.folder_version(state['folder']) if days else None
+        state['scanned_at'] = time.monotonic()
+        state['result'] = (engine.current(), engine.last_date)
+        return state['result']
 
 # --- Função 5: Carrega os dados de AVALIAÇÃO Diária ---
-@st.cache_data(show_spinner="Carregando avaliações diárias...")
 def load_evaluation_data(selected_month_name, agente_name, selected_year): # ADICIONADO selected_year
     """Carrega todos os CSVs da subpasta 'data/[ANO]/[mês]/notas/' e filtra pelo agente."""
-    
+    # Mesma chave de cache do load_score_cube (mês em minúsculas, ano em texto): a pasta é lida uma vez só
+    month, year = selected_month_name.lower(), str(selected_year)
+    EVAL_FOLDER = os.path.join('data', year, month, 'notas')
+    df_month = _load_evaluation_data(month, year, ingest.folder_version(EVAL_FOLDER))
+    return ingest.agent_view(df_month, agente_name)
+
+@st.cache_data(show_spinner="Carregando avaliações diárias...")
+def _load_evaluation_data(selected_month_name, selected_year, data_version):
     month_folder_lower = selected_month_name.lower()
     EVAL_FOLDER = os.path.join('data', str(selected_year), month_folder_lower, 'notas') # ALTERADO: Inclui ano no caminho
-    
-    df_list = []
-    
-    if not os.path.exists(EVAL_FOLDER) or not os.path.isdir(EVAL_FOLDER):
+
+    def annotate(df_temp, filename):
+        # Pula se não tiver coluna Agente
+        if 'Agente' not in df_temp.columns:
+            return None
+        return ingest.annotate_day(df_temp, filename)
+
+    def on_error(filename, e):
+        st.warning(f"Erro ao ler arquivo de avaliação {filename}: {e}")
+
+    df = ingest.load_folder(EVAL_FOLDER, 'notas', annotate, on_error, reader=get_file_cache().read_file)
+    return ingest.index_by_agent(df)
+
+# --- Função 5b: Histogramas de notas (metrics.ScoreCube), montados na carga das avaliações ---
+def load_score_cube(selected_month_name, selected_year):
+    """Contagens de notas por agente e dia de 'data/[ANO]/[mês]/notas/'."""
+    month, year = selected_month_name.lower(), str(selected_year)
+    EVAL_FOLDER = os.path.join('data', year, month, 'notas')
+    return _load_score_cube(month, year, ingest.folder_version(EVAL_FOLDER))
+
+@st.cache_data(show_spinner=False)
+def _load_score_cube(selected_month_name, selected_year, data_version):
+    df = _load_evaluation_data(selected_month_name, selected_year, data_version)
+    return metrics.ScoreCube.from_frame(df, ['DaySort', 'Dia'])
+
+def load_score_range(months):
+    """Histogramas dos meses pedidos [(ano, 'mês'), ...] juntos: só soma as contagens de cada mês."""
+    return metrics.ScoreCube.concat([load_score_cube(month, year) for year, month in months])
+
+# --- Função 6: Resumo da EQUIPE (linha sem agente dos CSVs) ---
+def load_team_summary(kind, selected_year, name):
+    """Linhas de totais da equipe: uma por dia ('diario', name=mês), a do mês ('mensal', name=mês)
+    ou uma por dia da semana ('semanal', name=(ano ISO, semana))."""
+    if kind == 'diario':
+        data_version = ingest.folder_version(os.path.join('data', str(selected_year), name.lower()))
+    elif kind == 'mensal':
+        data_version = ingest.file_version(os.path.join('data', str(selected_year), MESES.get(name.lower(), '')))
+    else:
+        data_version = ingest.week_version(*name)
+    return _load_team_summary(kind, selected_year, name, data_version)
+
+@st.cache_data(show_spinner=False)
+def _load_team_summary(kind, selected_year, name, data_version):
+    if kind == 'diario':
+        month_folder_lower = name.lower()
+        DATA_FOLDER = os.path.join('data', str(selected_year), month_folder_lower)
+
+        def annotate(df_temp, filename):
+            return ingest.annotate_day(df_temp, filename, month_folder_lower, selected_year)
+
+        return ingest.load_folder(DATA_FOLDER, 'diario', annotate, reader=get_file_cache().read_file, rows='equipe')
+    if kind == 'semanal':
+        return ingest.load_week(*name, reader=get_file_cache().read_file, rows='equipe')
+
+    if data_version is None:
+        return pd.DataFrame()
+    path = os.path.join('data', str(selected_year), MESES.get(name.lower()))
+    try:
+        return ingest.team_rows(get_file_cache().read_file(path, kind))
+    except Exception:
         return pd.DataFrame()
-        
-    for filename in os.listdir(EVAL_FOLDER):
-        if filename.endswith(".csv"):
-            path = os.path.join(EVAL_FOLDER, filename)
-            try:
-                df_temp = pd.read_csv(path, encoding='utf-8', engine='python')
-                
-                # Limpa colunas ANTES
-                df_temp.columns = df_temp.columns.str.strip().str.upper().str.replace('[^A-Z0-9_]+', '', regex=True) 
-
-                # Renomeia (Baseado no seu input: nom_agente, num_protocolo, nom_valor)
-                rename_mapping_temp = {
-                    'NOM_AGENTE': 'Agente', 
-                    'NUM_PROTOCOLO': 'Protocolo',
-                    'NOM_VALOR': 'Nota', # 'nom_valor' vira 'NOMVALOR' -> 'Nota'
-                    'DIA': 'Dia (CSV)' # Coluna 'Dia' original do CSV
-                }
-                df_temp = df_temp.rename(columns=rename_mapping_temp)
-
-                # Adiciona Dia e DaySort (do nome do arquivo)
-                day_month_str = filename.replace('.csv', '').replace('.', '/')
-                df_temp['Dia'] = day_month_str 
-                df_temp['DaySort'] = int(filename.split('.')[0])
-
-                # Filtra pelo agente
-                if 'Agente' in df_temp.columns:
-                    df_temp = df_temp[df_temp['Agente'] == agente_name]
-                else:
-                    continue # Pula se não tiver coluna Agente
 
-                if df_temp.empty: 
-                    continue
-                    
-                df_list.append(df_temp)
-            except Exception as e:
-                st.warning(f"Erro ao ler arquivo de avaliação {filename}: {e}")
-                continue
+# --- Função 7: Rankings (metrics.top_k), em cache por versão do arquivo de origem ---
+RANKING_METRICS = ['FCR', 'Satisfacao', 'TMIA']
 
-    if not df_list: return pd.DataFrame()
-    df = pd.concat(df_list, ignore_index=True)
-    return df
+def ranking_source_version(kind, selected_year, name):
+    """Versão da origem do ranking: consolidado do mês (name=mês) ou semana ISO (name=(ano ISO, semana)).
+
+    None (ou vazia) quando a origem não existe.
+    """
+    if kind == 'mensal':
+        return ingest.file_version(os.path.join('data', str(selected_year), MESES.get(name.lower(), '')))
+    return ingest.week_version(*name)
+
+def load_ranking_source(kind, selected_year, name):
+    """Frame de origem do ranking (uma linha por agente)."""
+    if kind == 'mensal':
+        return load_and_preprocess_data(MESES.get(name.lower(), ''), selected_year)
+    return load_week_cube(*name).by_agent()
+
+def load_ranking_board(kind, selected_year, name, metric, k=3, bottom=False):
+    """Top K (ou Bottom K) da métrica na fonte pedida."""
+    data_version = ranking_source_version(kind, selected_year, name)
+    return _load_ranking_board(kind, selected_year, name, metric, k, bottom, data_version)
+
+@st.cache_data(show_spinner=False)
+def _load_ranking_board(kind, selected_year, name, metric, k, bottom, data_version):
+    return metrics.top_k(load_ranking_source(kind, selected_year, name), metric, k, bottom)
+
+def load_agent_rank(kind, selected_year, name, metric, agente_name):
+    """(posição, total) do agente na métrica, ou None se ele ficou fora do ranking."""
+    data_version = ranking_source_version(kind, selected_year, name)
+    return _load_agent_rank(kind, selected_year, name, metric, agente_name, data_version)
+
+@st.cache_data(show_spinner=False)
+def _load_agent_rank(kind, selected_year, name, metric, agente_name, data_version):
+    return metrics.agent_rank(load_ranking_source(kind, selected_year, name), metric, agente_name)
 
 # -------------------------------------------------------------
 # 🤖 FUNÇÕES DO FAQ e NOVA PERGUNTA
 # -------------------------------------------------------------
 
-def get_gspread_client():
-    """Conecta ao Google Sheets usando as credenciais do secrets.toml (formato google_credentials)"""
-    scopes = ["https://www.googleapis.com/auth/spreadsheets", "https://www.googleapis.com/auth/drive"]
-    creds_dict = dict(st.secrets["google_credentials"])
-    # Correção obrigatória para Windows
-    if "private_key" in creds_dict:
-        creds_dict["private_key"] = creds_dict["private_key"].replace("\\n", "\n")
-    creds = Credentials.from_service_account_info(creds_dict, scopes=scopes)
-    return gspread.authorize(creds)
-
-@st.cache_data(ttl=300, show_spinner="Carregando FAQ...")
+# FAQ e perguntas vêm do armazenamento do processo (storage.get_storage: planilha ou SQLite),
+# que já guarda as leituras em memória
+
 def load_faq_data_secure():
     try:
-        client = get_gspread_client()
-        # Tenta abrir pelo NOME "BaseFAQ"
-        try:
-            sh = client.open("BaseFAQ")
-        except:
-            # Fallback para URL se nome falhar
-            sh = client.open_by_url(st.secrets["spreadsheet_url"])
-            
-        worksheet = sh.sheet1 
-        data = worksheet.get_all_records()
+        storage = get_storage()
+        if storage is None: return pd.DataFrame()
+        data = storage.faq()
         if not data: return pd.DataFrame()
         return pd.DataFrame(data).astype(str)
     except Exception as e:
@@ -456,44 +453,39 @@ def load_faq_data_secure():
 
 def salvar_nova_pergunta(pergunta_texto):
     try:
-        client = get_gspread_client()
-        try:
-            sh = client.open("BaseFAQ")
-        except:
-            sh = client.open_by_url(st.secrets["spreadsheet_url"])
-            
-        try:
-            worksheet = sh.worksheet("Novas_Perguntas")
-        except:
-            st.error("Erro: Crie uma aba chamada 'Novas_Perguntas' na sua planilha!")
+        storage = get_storage()
+        if storage is None:
+            st.error("Sem conexão com a planilha.")
             return False
-            
+
         quem = st.session_state.get('username', 'Anônimo')
         agora = datetime.now().strftime("%d/%m/%Y %H:%M")
-        
-        worksheet.append_row([agora, pergunta_texto, quem])
+
+        # Na planilha, a linha é anexada em segundo plano (fila de escrita)
+        storage.add_question([agora, pergunta_texto, quem])
         return True
+    except StorageError as e:
+        st.error(f"Erro: {e}")
+        return False
     except Exception as e:
         st.error(f"Erro ao salvar pergunta: {e}")
         return False
 
 # --- Funções de Dashboard KPI e Histórico ---
 
-def display_kpi(df_filtered):
-    """Exibe os cards de KPIs agregados."""
-    kpi_cols = {
-        'QTD Atendimento': 'sum', 'TMA': 'mean', 'TME': 'mean', 'TMIA': 'mean',
-        'FCR': 'mean', 'Satisfacao': 'mean', 'NPS': 'mean', 'QTD Avaliacoes': 'sum'
-    }
-    valid_kpi_cols = {col: agg for col, agg in kpi_cols.items() if col in df_filtered.columns}
-    if not valid_kpi_cols: return
-    kpi_data = df_filtered.agg(valid_kpi_cols).reset_index().T
-    kpi_data.columns = kpi_data.iloc[0]
-    kpi_data = kpi_data[1:]
-    display_kpi_metrics(kpi_data)
-
-def display_kpi_metrics(kpi_data):
-    """Função auxiliar para formatar e exibir as métricas de KPI."""
+def display_kpi(kpis, team_totals=None):
+    """Exibe os cards de KPIs agregados.
+
+    Todos os cards vêm de `kpis`, o total das linhas de agentes no período
+    (RollupCube.total). `team_totals` (de ingest.team_totals, a linha de
+    totais da equipe do CSV) é outra população: aparece à parte, numa
+    legenda abaixo dos cards.
+    """
+    if not kpis: return
+    display_kpi_metrics(pd.DataFrame([kpis]), caption=team_caption(team_totals))
+
+def display_kpi_metrics(kpi_data, caption=None):
+    """Função auxiliar para formatar e exibir as métricas de KPI (e uma legenda opcional abaixo)."""
     cols = st.columns(8)
     def display_metric(col, label, unit="", fmt="{:.2f}"):
         if label in kpi_data.columns and not kpi_data.empty and not pd.isna(kpi_data[label].iloc[0]):
@@ -513,60 +505,145 @@ def display_kpi_metrics(kpi_data):
     display_metric(cols[5], "Satisfacao", unit="") 
     display_metric(cols[6], "NPS", unit="")
     display_metric(cols[7], "QTD Avaliacoes")
+    if caption:
+        st.caption(caption)
     st.markdown("---")
 
 
+def team_caption(totals):
+    """Texto com a Satisfação da equipe (linha de totais do CSV), ou None se não houver."""
+    if totals and not pd.isna(totals.get('Satisfacao')):
+        return (f"Equipe (totais do CSV): Satisfação {(totals['Satisfacao'] / 5.0):.2%} "
+                f"em {totals['QTD Avaliacoes']:.0f} avaliações")
+    return None
+
+def display_team_caption(df_team):
+    """Legenda com a Satisfação da equipe (linha de totais do CSV), quando houver."""
+    caption = team_caption(ingest.team_totals(df_team))
+    if caption:
+        st.caption(caption)
+
+
+def format_metric(metric, value):
+    """Valor de uma métrica como nos cards de KPI (MM:SS ou %)."""
+    if pd.isna(value): return "N/A"
+    if metric in ['TMA', 'TME', 'TMIA', 'TMIC']: return format_time(value)
+    if metric == 'FCR': return f"{value:.2%}"
+    if metric == 'Satisfacao': return f"{(value / 5.0):.2%}"
+    return f"{value:.2f}"
+
+def display_daily_alerts():
+    """Agentes cujo último dia saiu do próprio normal (média ± k desvios dos últimos N dias)."""
+    df_alerts, last_date = load_daily_alerts()
+    st.subheader("🚨 Alertas do Dia")
+    if last_date is None:
+        st.info("Nenhum arquivo diário encontrado para calcular os alertas.")
+        return
+    st.caption(f"Dia {last_date:%d/%m/%Y} comparado com os últimos {metrics.ALERT_WINDOW} dias de cada agente "
+               f"(média ± {metrics.ALERT_K:g} desvios-padrão).")
+    if df_alerts.empty:
+        st.success("Nenhum agente fora do seu normal no último dia.")
+        return
+
+    df_display = df_alerts.sort_values(by='Desvios', key=abs, ascending=False)
+    df_display = pd.DataFrame({
+        'Agente': df_display['Agente'],
+        'Métrica': df_display['Métrica'],
+        'Valor': [format_metric(m, v) for m, v in zip(df_display['Métrica'], df_display['Valor'])],
+        'Normal': [f"{format_metric(m, lo)} a {format_metric(m, hi)}"
+                   for m, lo, hi in zip(df_display['Métrica'], df_display['Mínimo'], df_display['Máximo'])],
+        'Desvios': df_display['Desvios'].round(1),
+    })
+    st.dataframe(df_display, use_container_width=True, hide_index=True)
+
+
+def display_ranking_board(kind, selected_year, name, k=3):
+    """Top K de FCR, Satisfação e TMIA de uma fonte de ranking (semanal ou mensal)."""
+    if not ranking_source_version(kind, selected_year, name):
+        if kind == 'mensal':
+            st.warning(f"Arquivo '{MESES.get(name.lower(), name)}' não encontrado.")
+        else:
+            st.warning(f"Nenhum arquivo diário na {ingest.week_label(*name)}.")
+        return
+    df_source = load_ranking_source(kind, selected_year, name)
+    if 'Agente' not in df_source.columns:
+        st.error(f"Ranking ({name}): Coluna 'Agente' não encontrada.")
+        return
+
+    for metric in RANKING_METRICS:
+        if metric not in df_source.columns:
+            st.info(f"Métrica '{metric}' não disponível.")
+            continue
+        board = apply_formatting(load_ranking_board(kind, selected_year, name, metric, k).drop(columns=['Posição']))
+        st.dataframe(board, column_config=table_config(board), use_container_width=True, hide_index=True)
+
+def display_agent_ranks(kind, selected_year, name, agente_name):
+    """Legenda com a posição do agente em cada métrica do ranking."""
+    parts = []
+    for metric in RANKING_METRICS:
+        rank = load_agent_rank(kind, selected_year, name, metric, agente_name)
+        if rank:
+            parts.append(f"{metric} {rank[0]}º de {rank[1]}")
+    if parts:
+        st.caption("🏆 Posição no ranking: " + " · ".join(parts))
+
+
 def display_monthly_history(agente_name=None): # Nome do agente é opcional
-    """Carrega todos os dados, filtra pelo agente (se houver) e exibe o histórico."""
+    """Carrega os meses do período escolhido (pode atravessar anos), filtra pelo agente (se houver) e exibe o histórico."""
     
     if agente_name:
         st.header("📈 Histórico Mês a Mês (Meu)")
     else:
         st.header("📈 Histórico Mês a Mês (Geral)")
 
-    # Carrega todos os dados históricos DENTRO desta função
-    # PRECISAMOS SABER O ANO SELECIONADO AQUI, VAMOS PEGAR DA SESSION STATE
+    # Período do histórico: o ano selecionado ou uma janela móvel que atravessa os anos
     selected_year = st.session_state.get('selected_year', '2026')
-    df_full_history = load_all_history_data(selected_year) # PASSANDO O ANO
-
-    if df_full_history.empty:
+    available_months = ingest.list_months()
+    if not available_months:
         st.info("Não há dados históricos disponíveis.")
         return
 
-    # 1. Filtra pelo agente (se fornecido)
-    if agente_name:
-        df_agent_history = df_full_history[df_full_history['Agente'] == agente_name].copy() if 'Agente' in df_full_history.columns else pd.DataFrame()
+    # A janela termina no mês selecionado na barra lateral (ou no último disponível)
+    selected_month = st.session_state.get('selected_month_name', '').lower()
+    end_month = (int(selected_year), selected_month)
+    if end_month not in available_months:
+        end_month = available_months[-1]
+
+    period_options = ["Ano selecionado", "Últimos 6 meses", "Últimos 12 meses", "Intervalo personalizado"]
+    period = st.radio("Período:", period_options, horizontal=True, key=f"history_period_{agente_name or 'geral'}")
+
+    if period == "Últimos 6 meses":
+        months = ingest.trailing_months(end_month, 6)
+    elif period == "Últimos 12 meses":
+        months = ingest.trailing_months(end_month, 12)
+    elif period == "Intervalo personalizado":
+        labels = [f"{m.capitalize()}/{y}" for y, m in available_months]
+        c1, c2 = st.columns(2)
+        start_idx = c1.selectbox("De:", range(len(labels)), format_func=lambda i: labels[i],
+                                 index=max(0, available_months.index(end_month) - 5), key=f"history_from_{agente_name or 'geral'}")
+        end_idx = c2.selectbox("Até:", range(len(labels)), format_func=lambda i: labels[i],
+                               index=available_months.index(end_month), key=f"history_to_{agente_name or 'geral'}")
+        months = ingest.months_in_range(available_months[start_idx], available_months[end_idx])
     else:
-        df_agent_history = df_full_history.copy() # Admin vê tudo
-    
-    if df_agent_history.empty:
+        months = [m for m in available_months if m[0] == int(selected_year)]
+
+    # Lê só os meses do período; o cubo já traz os agregados por agente e mês (Admin vê todos)
+    cube = load_history_cube(months)
+    if agente_name and not cube.has_agent(agente_name):
          st.info("Não há histórico de dados para a seleção atual.")
          return
 
-    # Garante que as colunas Mês e MonthSort existem APÓS o filtro
-    if 'Mês' not in df_agent_history.columns or 'MonthSort' not in df_agent_history.columns:
-        st.info("Colunas 'Mês' ou 'MonthSort' não encontradas nos dados históricos do agente.")
-        return
-
-    # Define as agregações
-    agg_dict = {
-        'QTD Atendimento': 'sum', 'TMA': 'mean', 'TME': 'mean', 'TMIA': 'mean',
-        'FCR': 'mean', 'Satisfacao': 'mean', 'NPS': 'mean', 'QTD Avaliacoes': 'sum',
-        'MonthSort': 'first' # Coluna auxiliar para manter a ordem
-    }
-
-    # Filtra as colunas válidas e agrupa
-    valid_agg_cols = {col: agg for col, agg in agg_dict.items() if col in df_agent_history.columns}
-    
-    if not valid_agg_cols:
+    # Um ponto por mês/ano (PeriodSort ordena entre anos: Dezembro/2025 antes de Janeiro/2026)
+    df_monthly = cube.by_period(agente_name, metrics=metrics.KPI_COLS)
+    if df_monthly.empty:
+         st.info("Não há histórico de dados para a seleção atual.")
+         return
+    if not cube.metrics:
         st.info("Não há métricas suficientes para exibir o histórico mensal.")
         return
 
-    # Agrupa por Mês e MonthSort
-    df_monthly = df_agent_history.groupby(['MonthSort', 'Mês'], as_index=False).agg(valid_agg_cols)
-    
-    # Ordena usando a coluna MonthSort
-    df_monthly = df_monthly.sort_values(by='MonthSort')
+    df_monthly = df_monthly.drop(columns=['Mês', 'Ano']).rename(columns={'Período': 'Mês'})
+    df_monthly['Mês'] = df_monthly['Mês'].astype(str)
     
     # --- Gráficos de Tendência Mensal ---
     st.subheader("Gráficos de Tendência Mensal")
@@ -582,7 +659,7 @@ def display_monthly_history(agente_name=None): # Nome do agente é opcional
                 y='Satisfacao', 
                 title='Satisfação Mês a Mês (0-5)',
                 markers=True,
-                # Garante que a ordem do eixo X siga a ordenação dos dados (MonthSort)
+                # Garante que a ordem do eixo X siga a ordenação dos dados (PeriodSort)
                 category_orders={"Mês": df_monthly['Mês']} 
             )
             fig_sat.update_yaxes(range=[0, 5])
@@ -608,7 +685,7 @@ def display_monthly_history(agente_name=None): # Nome do agente é opcional
     st.subheader("Tabela de Histórico Mês a Mês")
 
     # Descarta a coluna de ordenação
-    df_monthly_display = df_monthly.drop(columns=['MonthSort'])
+    df_monthly_display = df_monthly.drop(columns=['PeriodSort'])
 
     # Aplica formatação de exibição
     df_display = apply_formatting(df_monthly_display)
@@ -617,7 +694,7 @@ def display_monthly_history(agente_name=None): # Nome do agente é opcional
     cols = ['Mês'] + [col for col in df_display.columns if col != 'Mês']
     df_display = df_display[cols]
     
-    st.dataframe(df_display, use_container_width=True)
+    st.dataframe(df_display, column_config=table_config(df_display), use_container_width=True)
     st.markdown("---")
 
 # --- FUNÇÃO DE DETALHE DIÁRIO (com Gráficos) ---
@@ -627,38 +704,24 @@ def display_daily_detail(selected_month, agente_name=None): # Agente opcional
     # Carrega dados diários (filtrados por agente se agente_name for fornecido)
     # PRECISAMOS SABER O ANO SELECIONADO AQUI TAMBÉM
     selected_year = st.session_state.get('selected_year', '2026')
-    df_daily = load_daily_data(selected_month_name=selected_month, selected_year=selected_year, agente_name=agente_name) # PASSANDO O ANO
-    
-    if df_daily.empty:
+    cube = load_daily_cube(selected_month, selected_year) # PASSANDO O ANO
+
+    if cube.empty or (agente_name and not cube.has_agent(agente_name)):
         if agente_name:
             st.info(f"Nenhum dado diário encontrado para {agente_name} na subpasta 'data/{selected_year}/{selected_month.lower()}/'.")
         else:
             st.info(f"Nenhum dado diário encontrado na subpasta 'data/{selected_year}/{selected_month.lower()}/'.")
         return
 
-    # Define as agregações
-    agg_dict = {
-        'QTD Atendimento': 'sum', 'TMA': 'mean', 'TME': 'mean', 'TMIA': 'mean',
-        'FCR': 'mean', 'Satisfacao': 'mean', 'NPS': 'mean', 'QTD Avaliacoes': 'sum',
-        'DaySort': 'first', 'Data': 'first' # Mantém a coluna Data
-    }
-    # Se for admin (agente_name=None), precisamos agrupar por Dia E Agente
-    group_by_cols = ['DaySort', 'Dia']
-    if agente_name is None: 
-        group_by_cols.append('Agente')
-        agg_dict['Agente'] = 'first' # Mantém o nome do agente
-
-    valid_agg_cols = {col: agg for col, agg in agg_dict.items() if col in df_daily.columns}
-    
-    if not valid_agg_cols or 'DaySort' not in df_daily.columns:
+    if not cube.metrics or 'DaySort' not in cube.periods.columns:
         st.info("Não há métricas ou colunas de dia suficientes para exibir o detalhe diário.")
         return
 
-    # Agrupa por Dia (e Agente, se admin)
-    df_daily_agg = df_daily.groupby(group_by_cols, as_index=False).agg(valid_agg_cols)
-    
-    # Ordena usando a coluna DaySort
-    df_daily_agg = df_daily_agg.sort_values(by='DaySort')
+    # Um ponto por Dia (e por Agente, se admin), já na ordem de DaySort
+    if agente_name is None:
+        df_daily_agg = cube.by_agent_period(metrics=metrics.KPI_COLS)
+    else:
+        df_daily_agg = cube.by_period(agente_name, metrics=metrics.KPI_COLS)
 
     # --- Gráficos de Tendência Diária ---
     st.subheader("Gráficos de Tendência Diária")
@@ -693,7 +756,7 @@ def display_daily_detail(selected_month, agente_name=None): # Agente opcional
     st.subheader("Tabela de Detalhe Diário")
     
     # Descarta a coluna de ordenação
-    df_daily_agg = df_daily_agg.drop(columns=['DaySort', 'Data']) # Remove Data também
+    df_daily_agg = df_daily_agg.drop(columns=['DaySort', 'Data'], errors='ignore') # Remove Data também
 
     # Aplica formatação de exibição
     df_display = apply_formatting(df_daily_agg)
@@ -702,7 +765,18 @@ def display_daily_detail(selected_month, agente_name=None): # Agente opcional
     cols = ['Dia'] + [col for col in df_display.columns if col != 'Dia']
     df_display = df_display[cols]
     
-    st.dataframe(df_display, use_container_width=True)
+    st.dataframe(df_display, column_config=table_config(df_display), use_container_width=True)
+
+    # Distribuição dos dias: média do mês ao lado dos percentis (metrics.QuantileCube)
+    sketches = load_daily_sketches(selected_month, selected_year)
+    df_quantiles = sketches.quantiles(agente_name)
+    if not df_quantiles.empty:
+        st.subheader("📐 Distribuição dos Dias (Média e Percentis)")
+        st.caption("p50/p90/p99: valor diário abaixo do qual ficam 50%, 90% e 99% dos dias do mês.")
+        kpis = cube.total(agente_name, metrics=list(df_quantiles.columns))
+        df_dist = pd.concat([pd.DataFrame([kpis], index=['Média']), df_quantiles])
+        df_dist = apply_formatting(df_dist)
+        st.dataframe(df_dist, column_config=table_config(df_dist), use_container_width=True)
     st.markdown("---")
 
 # 🚨 --- INÍCIO DA ADIÇÃO (Função Tabela 4) --- 🚨
@@ -723,6 +797,16 @@ def display_evaluation_details(selected_month, agente_name):
         st.error("Erro: A coluna 'DaySort' não foi criada ao carregar as avaliações.")
         return
         
+    # Distribuição das notas (contagens já agregadas na carga)
+    score_period = st.radio("Distribuição das notas:", ["Mês selecionado", "Últimos 3 meses", "Últimos 6 meses"],
+                            horizontal=True, key="score_period")
+    if score_period == "Mês selecionado":
+        score_cube = load_score_cube(selected_month, selected_year)
+    else:
+        count = 3 if score_period == "Últimos 3 meses" else 6
+        score_cube = load_score_range(ingest.trailing_months((int(selected_year), selected_month.lower()), count))
+    display_score_distribution(score_cube, agente_name)
+
     df_evals = df_evals.sort_values(by='DaySort')
     
     # Define as colunas que queremos mostrar, com base no seu pedido
@@ -743,6 +827,51 @@ def display_evaluation_details(selected_month, agente_name):
 # 🚨 --- FIM DA ADIÇÃO --- 🚨
 
 
+def display_score_distribution(score_cube, agente_name=None, periods=None):
+    """Cards (avaliações, nota média, % de notas 0) e gráfico da distribuição das notas."""
+    summary = score_cube.summary(agente_name, periods)
+    if not summary:
+        st.info("Nenhuma avaliação no período.")
+        return
+    col1, col2, col3 = st.columns(3)
+    col1.metric("Avaliações", f"{summary['Avaliações']}")
+    col2.metric("Nota média", f"{summary['Nota média']:.2f}")
+    col3.metric("Notas 0", f"{summary['Notas 0 (%)']:.2f}%")
+
+    df_hist = score_cube.histogram(agente_name, periods)
+    fig_notes = px.bar(df_hist, x='Nota', y='Avaliações', text=df_hist['%'].map('{:.1f}%'.format),
+                       title='Distribuição das Notas')
+    fig_notes.update_xaxes(dtick=1)
+    st.plotly_chart(fig_notes, use_container_width=True)
+    st.dataframe(df_hist, column_config={'%': st.column_config.NumberColumn('%', format="%.2f%%")},
+                 use_container_width=True, hide_index=True)
+
+
+def display_protocol_search():
+    """Busca de avaliações por num_protocolo em todas as pastas notas/ (todos os anos e meses)."""
+    st.header("🔍 Buscar Avaliação por Protocolo")
+    index = get_protocol_index()
+    summary = index.refresh(max_age=store.REFRESH_INTERVAL) # Só relê os arquivos de notas novos ou alterados
+    for path, error in summary['erros']:
+        st.warning(f"Erro ao indexar o arquivo de avaliação {path}: {error}")
+    st.caption(f"{len(index)} protocolos indexados.")
+
+    query = st.text_area("Protocolo(s):", placeholder="Um ou mais números, separados por espaço, vírgula ou linha", key="protocol_query")
+    protocols = [p for p in re.split(r'[\s,;]+', query or '') if p]
+    if not protocols:
+        return
+
+    found = [item for protocolo in protocols for item in index.lookup(protocolo)]
+    missing = [protocolo for protocolo in protocols if not index.lookup(protocolo)]
+    if found:
+        df_found = pd.DataFrame(found)
+        df_found.insert(1, 'Data', [f"{day:02d}/{MESES_ORDER.index(month) + 1:02d}/{year}"
+                                    for year, month, day in zip(df_found['Ano'], df_found['Mês'], df_found['Dia'])])
+        st.dataframe(df_found[['Protocolo', 'Data', 'Agente', 'Nota']], use_container_width=True, hide_index=True)
+    if missing:
+        st.info(f"Protocolo(s) não encontrado(s): {', '.join(missing)}")
+
+
 # --- FUNÇÕES DE PAINEL ---
 
 def display_user_dashboard(df_agent_current_month): # Recebe dados do mês selecionado
@@ -759,7 +888,9 @@ def display_user_dashboard(df_agent_current_month): # Recebe dados do mês selec
         st.warning(f"Não há dados para o agente {agente_name} no mês de {selected_month}.")
     else:
         # KPIs Agregados do Mês
-        display_kpi(df_agent_current_month)
+        selected_year = st.session_state.get('selected_year', '2026')
+        display_kpi(load_history_cube([(int(selected_year), selected_month.lower())]).total(agente_name))
+        display_agent_ranks('mensal', selected_year, selected_month, agente_name)
 
         # Tabela Detalhada do Mês
         st.subheader("📋 Tabela de Detalhe Mensal")
@@ -772,7 +903,7 @@ def display_user_dashboard(df_agent_current_month): # Recebe dados do mês selec
             'FCR', 'Satisfacao', 'NPS', 'QTD Avaliacoes'
         ]
         final_cols = [col for col in relevant_cols if col in df_display.columns]
-        st.dataframe(df_display[final_cols], use_container_width=True)
+        st.dataframe(df_display[final_cols], column_config=table_config(df_display), use_container_width=True)
 
     # --- Painel de Histórico (Tabela 2) ---
     display_monthly_history(agente_name=agente_name) 
@@ -792,23 +923,19 @@ def display_admin_dashboard(df_monthly_aggregate): # df (passado do main) é o M
     selected_month = st.session_state['selected_month_name']
     selected_year = st.session_state.get('selected_year', '2026') # Recupera o ano
 
-    # 1. Carrega os dados DIÁRIOS para este mês (para todos os agentes)
-    df_daily_full = load_daily_data(selected_month_name=selected_month, selected_year=selected_year, agente_name=None) # PASSANDO O ANO
+    # 1. Carrega os cubos DIÁRIO e MENSAL deste mês (para todos os agentes)
+    daily_cube = load_daily_cube(selected_month, selected_year) # PASSANDO O ANO
+    month_cube = load_history_cube([(int(selected_year), selected_month.lower())])
     
-    is_date_available = not df_daily_full.empty and 'Data' in df_daily_full.columns
+    is_date_available = not daily_cube.empty and 'Data' in daily_cube.periods.columns
 
     # --- Filtros do Admin na Sidebar ---
     st.sidebar.subheader(f"Filtros (Admin - {selected_month})")
     
-    # 2. Filtro de Agente
+    # 2. Filtro de Agente (os agentes do cubo exibido: só quem tem dados no painel)
     agent_list = ["Todos os Agentes"]
-    source_df_for_agents = df_daily_full if is_date_available else df_monthly_aggregate
-    
-    if 'Agente' in source_df_for_agents.columns:
-        # CORREÇÃO: Converte para string ANTES de ordenar
-        unique_agents = source_df_for_agents['Agente'].dropna().unique()
-        valid_agents = [str(agent) for agent in unique_agents if str(agent).strip() != '']
-        agent_list.extend(sorted(list(set(valid_agents))))
+    source_cube_for_agents = daily_cube if is_date_available else month_cube
+    agent_list.extend(sorted(agent for agent in source_cube_for_agents.agent_names() if agent.strip() != ''))
 
     selected_agent = st.sidebar.selectbox(
         "Filtrar por Agente:", 
@@ -816,9 +943,13 @@ def display_admin_dashboard(df_monthly_aggregate): # df (passado do main) é o M
         key="admin_agent_filter"
     )
     
-    # 3. Filtro de Calendário (Dias)
+    # 3. Filtro de Calendário (Dias): vira um intervalo de dias do cubo (somas acumuladas),
+    # sem varrer nem copiar linhas
+    team_totals = None
+    period_range = None
+    calendar_days = None # (primeiro, último) dia do calendário, para os cubos por DaySort
     if is_date_available:
-        valid_dates = df_daily_full['Data'].dropna()
+        valid_dates = daily_cube.periods['Data'].dropna()
         if not valid_dates.empty:
             min_date = valid_dates.min().date()
             max_date = valid_dates.max().date()
@@ -838,36 +969,41 @@ def display_admin_dashboard(df_monthly_aggregate): # df (passado do main) é o M
 
             if not start_date or not end_date:
                 st.warning("Selecione um período válido.")
-                df_filtered_daily = pd.DataFrame() 
+                period_range = slice(0, 0)
             else:
-                # Filtra o DataFrame diário pelos dias selecionados
-                df_filtered_daily = df_daily_full[
-                    (df_daily_full['Data'].dt.date >= start_date) & 
-                    (df_daily_full['Data'].dt.date <= end_date)
-                ].copy()
+                # Dias selecionados
+                period_range = daily_cube.period_range(start_date, end_date)
+                calendar_days = (start_date.day, end_date.day)
+                # Totais da equipe no período (linhas sem agente, uma por dia)
+                df_team_daily = load_team_summary('diario', selected_year, selected_month)
+                if not df_team_daily.empty:
+                    # Limites Timestamp (comparação vetorizada, sem converter cada linha em date)
+                    start_ts = pd.Timestamp(start_date)
+                    end_ts = pd.Timestamp(end_date) + pd.Timedelta(days=1)
+                    df_team_period = df_team_daily[(df_team_daily['Data'] >= start_ts) & (df_team_daily['Data'] < end_ts)]
+                    team_totals = ingest.team_totals(df_team_period)
         
         else: # Datas inválidas
             st.sidebar.info(f"Nenhum dado diário com data válida encontrado.")
-            df_filtered_daily = pd.DataFrame() 
             is_date_available = False
         
     else:
         st.sidebar.info(f"Nenhum dado diário encontrado na subpasta 'data/{selected_year}/{selected_month.lower()}/'. Exibindo o consolidado mensal.")
-        df_filtered_daily = pd.DataFrame() 
         is_date_available = False
         
     
-    # 4. Decide qual DataFrame usar com base nos filtros
+    # 4. Decide qual cubo usar com base nos filtros
     if is_date_available:
-        df_filtered = df_filtered_daily.copy()
+        period_cube = daily_cube
     else:
-        df_filtered = df_monthly_aggregate.copy()
+        period_cube, period_range = month_cube, None
+        team_totals = ingest.team_totals(load_team_summary('mensal', selected_year, selected_month))
 
     # Aplica o filtro de Agente (se não for "Todos")
-    if selected_agent != "Todos os Agentes":
-        df_filtered = df_filtered[df_filtered['Agente'] == selected_agent].copy()
+    agent_filter = None if selected_agent == "Todos os Agentes" else selected_agent
+    kpis = period_cube.total(agent_filter, period_range)
 
-    if df_filtered.empty:
+    if not kpis:
         st.warning("Nenhum dado encontrado para a seleção atual.")
         return
 
@@ -884,18 +1020,18 @@ def display_admin_dashboard(df_monthly_aggregate): # df (passado do main) é o M
         if df_agent_current_month.empty:
             st.warning(f"Não há dados consolidados para o agente {selected_agent} no mês de {selected_month}.")
         else:
-            display_kpi(df_agent_current_month)
+            display_kpi(load_history_cube([(int(selected_year), selected_month.lower())]).total(selected_agent))
             st.subheader("📋 Tabela de Detalhe Mensal")
             df_display = apply_formatting(df_agent_current_month)
             df_display.insert(0, 'Mês', selected_month.capitalize()) 
             relevant_cols = ['Mês', 'Agente', 'QTD Atendimento', 'TMA', 'TME', 'TMIA', 'FCR', 'Satisfacao', 'NPS', 'QTD Avaliacoes']
             final_cols = [col for col in relevant_cols if col in df_display.columns]
-            st.dataframe(df_display[final_cols], use_container_width=True)
+            st.dataframe(df_display[final_cols], column_config=table_config(df_display), use_container_width=True)
 
         # Tabela 2: Histórico Mês a Mês
         display_monthly_history(agente_name=selected_agent) 
 
-        # Tabela 3: Detalhe Dia a Dia (baseado no df_filtered que já foi filtrado por dia E agente)
+        # Tabela 3: Detalhe Dia a Dia (do agente selecionado)
         display_daily_detail(selected_month, agente_name=selected_agent)
         
         # Tabela 4: Avaliações (do agente selecionado)
@@ -905,142 +1041,76 @@ def display_admin_dashboard(df_monthly_aggregate): # df (passado do main) é o M
         # 2. Se "Todos os Agentes", mostra o painel de Admin (Ranking, etc.)
         
         # Criação das abas
-        tab1, tab2, tab3 = st.tabs(["Visão Geral (Período Selecionado)", "Histórico Geral (Todos os Meses)", "Detalhe Diário (Período Selecionado)"])
+        tab1, tab2, tab3, tab4 = st.tabs(["Visão Geral (Período Selecionado)", "Histórico Geral (Todos os Meses)", "Detalhe Diário (Período Selecionado)", "Buscar Protocolo"])
 
         with tab1:
             st.subheader("📈 Métricas Agregadas (Período Selecionado)")
-            display_kpi(df_filtered) # Usa o DF filtrado (diário ou mensal)
+            display_kpi(kpis, team_totals) # Totais dos agentes no período + legenda com os totais da equipe
+            display_daily_alerts() # Último dia com arquivo, independente do calendário
             
             # Rankings (Sempre visíveis, não filtrados pelo calendário)
             st.subheader("🏆 Ranking Top 3")
-            st.info("Os rankings abaixo são baseados nos arquivos consolidados (semanais e mensal) e **não** são afetados pelo filtro de calendário.")
+            st.info("Os rankings semanais são calculados a partir dos arquivos diários (semana ISO) e o do mês vem do consolidado; **não** são afetados pelo filtro de calendário.")
             
             col_rank1, col_rank2, col_rank3 = st.columns(3)
             
-            # --- RANKING 1: SEMANAL ATUAL ---
-            with col_rank1:
-                st.markdown("##### 🥇 Semana Atual")
-                df_ranking_atual = load_ranking_data("ranking_semanal_atual.csv", selected_year) # PASSANDO O ANO
-                
-                if df_ranking_atual.empty:
-                    st.warning("Arquivo 'ranking_semanal_atual.csv' não encontrado.")
-                elif 'Agente' not in df_ranking_atual.columns:
-                     st.error("Ranking Atual: Coluna 'Agente' não encontrada.")
+            current_week, previous_week, all_weeks = ranking_weeks(selected_month, selected_year)
+            ranking_sources = [(col_rank3, f"##### 🥉 Consolidado do Mês ({selected_month})", 'mensal', selected_month)]
+            if current_week:
+                ranking_sources = [
+                    (col_rank1, "##### 🥇 Semana Atual", 'semanal', current_week),
+                    (col_rank2, "##### 🥈 Semana Anterior", 'semanal', previous_week),
+                ] + ranking_sources
+            for col_rank, title, kind, name in ranking_sources:
+                with col_rank:
+                    st.markdown(title)
+                    if kind == 'mensal':
+                        st.info(f"Base: '{MESES.get(selected_month.lower())}'")
+                    else:
+                        st.info(f"Base: {ingest.week_label(*name)}")
+                    display_team_caption(load_team_summary(kind, selected_year, name))
+                    display_ranking_board(kind, selected_year, name)
+
+            # Rankings mais profundos: Top 10, Bottom 5 e a posição de um agente
+            with st.expander("🔎 Ranking completo (Top 10, Bottom 5 e posição do agente)"):
+                # Bases: as do quadro acima e qualquer semana ISO com diários (mais recente primeiro)
+                ranking_bases = [(title.lstrip('# '), kind, name) for _, title, kind, name in ranking_sources]
+                ranking_bases += [(ingest.week_label(*week), 'semanal', week) for week in reversed(all_weeks)
+                                  if week not in (current_week, previous_week)]
+                c1, c2, c3 = st.columns(3)
+                source_idx = c1.selectbox("Base:", range(len(ranking_bases)),
+                                          format_func=lambda i: ranking_bases[i][0], key="ranking_source")
+                metric = c2.selectbox("Métrica:", RANKING_METRICS, key="ranking_metric")
+                view = c3.radio("Visão:", ["Top 10", "Bottom 5"], horizontal=True, key="ranking_view")
+                _, kind, name = ranking_bases[source_idx]
+
+                board = load_ranking_board(kind, selected_year, name, metric, k=10 if view == "Top 10" else 5,
+                                           bottom=(view == "Bottom 5"))
+                if board.empty:
+                    st.info("Nenhum agente ranqueado nesta base.")
                 else:
-                    agg_cols = [col for col in ['QTD Atendimento', 'Satisfacao', 'FCR', 'TMIA'] if col in df_ranking_atual.columns]
-                    agg_dict = {col: ('sum' if col.startswith('QTD') else 'mean') for col in agg_cols}
-                    df_compare_atual = df_ranking_atual.groupby('Agente').agg(agg_dict).reset_index()
-
-                    # FCR
-                    if 'FCR' in df_compare_atual.columns and 'QTD Atendimento' in df_compare_atual.columns:
-                        df_fcr_filtered = df_compare_atual[(df_compare_atual['FCR'] > 0.0) & (df_compare_atual['FCR'] < 1.0)]
-                        top_fcr = df_fcr_filtered.sort_values(by=['FCR', 'QTD Atendimento'], ascending=[False, False]).head(3) 
-                        top_fcr = top_fcr[['Agente', 'FCR']] 
-                        top_fcr['FCR'] = (top_fcr['FCR'] * 100).map('{:.2f}%'.format) 
-                        st.dataframe(top_fcr, use_container_width=True, hide_index=True)
-                    # Satisfacao
-                    if 'Satisfacao' in df_compare_atual.columns and 'QTD Atendimento' in df_compare_atual.columns:
-                        df_satisfacao_filtered = df_compare_atual[(df_compare_atual['Satisfacao'] > 0.0) & (df_compare_atual['Satisfacao'] < 5.0)]
-                        top_satisfacao = df_satisfacao_filtered.sort_values(by=['Satisfacao', 'QTD Atendimento'], ascending=[False, False]).head(3)
-                        top_satisfacao = top_satisfacao[['Agente', 'Satisfacao']]
-                        top_satisfacao['Satisfacao'] = (top_satisfacao['Satisfacao'] / 5.0 * 100).map('{:.2f}%'.format)
-                        st.dataframe(top_satisfacao, use_container_width=True, hide_index=True)
-                    # TMIA
-                    if 'TMIA' in df_compare_atual.columns and 'QTD Atendimento' in df_compare_atual.columns:
-                        df_tmia_filtered = df_compare_atual[(df_compare_atual['TMIA'] > 0.0)]
-                        top_tmia = df_tmia_filtered.sort_values(by=['TMIA', 'QTD Atendimento'], ascending=[True, False]).head(3)
-                        top_tmia = top_tmia[['Agente', 'TMIA']]
-                        top_tmia['TMIA'] = top_tmia['TMIA'].apply(format_time)
-                        st.dataframe(top_tmia, use_container_width=True, hide_index=True)
-
-            # --- RANKING 2: SEMANAL ANTERIOR ---
-            with col_rank2:
-                st.markdown("##### 🥈 Semana Anterior")
-                df_ranking_anterior = load_ranking_data("ranking_semanal_anterior.csv", selected_year) # PASSANDO O ANO
-                
-                if df_ranking_anterior.empty:
-                    st.warning("Arquivo 'ranking_semanal_anterior.csv' não encontrado.")
-                elif 'Agente' not in df_ranking_anterior.columns:
-                     st.error("Ranking Anterior: Coluna 'Agente' não encontrada.")
-                else:
-                    agg_cols_ant = [col for col in ['QTD Atendimento', 'Satisfacao', 'FCR', 'TMIA'] if col in df_ranking_anterior.columns]
-                    agg_dict_ant = {col: ('sum' if col.startswith('QTD') else 'mean') for col in agg_cols_ant}
-                    df_compare_anterior = df_ranking_anterior.groupby('Agente').agg(agg_dict_ant).reset_index()
-
-                    # FCR
-                    if 'FCR' in df_compare_anterior.columns and 'QTD Atendimento' in df_compare_anterior.columns:
-                        df_fcr_filtered_ant = df_compare_anterior[(df_compare_anterior['FCR'] > 0.0) & (df_compare_anterior['FCR'] < 1.0)]
-                        top_fcr_ant = df_fcr_filtered_ant.sort_values(by=['FCR', 'QTD Atendimento'], ascending=[False, False]).head(3) 
-                        top_fcr_ant = top_fcr_ant[['Agente', 'FCR']] 
-                        top_fcr_ant['FCR'] = (top_fcr_ant['FCR'] * 100).map('{:.2f}%'.format) 
-                        st.dataframe(top_fcr_ant, use_container_width=True, hide_index=True)
-                    # Satisfacao
-                    if 'Satisfacao' in df_compare_anterior.columns and 'QTD Atendimento' in df_compare_anterior.columns:
-                        df_satisfacao_filtered_ant = df_compare_anterior[(df_compare_anterior['Satisfacao'] > 0.0) & (df_compare_anterior['Satisfacao'] < 5.0)]
-                        top_satisfacao_ant = df_satisfacao_filtered_ant.sort_values(by=['Satisfacao', 'QTD Atendimento'], ascending=[False, False]).head(3)
-                        top_satisfacao_ant = top_satisfacao_ant[['Agente', 'Satisfacao']]
-                        top_satisfacao_ant['Satisfacao'] = (top_satisfacao_ant['Satisfacao'] / 5.0 * 100).map('{:.2f}%'.format)
-                        st.dataframe(top_satisfacao_ant, use_container_width=True, hide_index=True)
-                    # TMIA
-                    if 'TMIA' in df_compare_anterior.columns and 'QTD Atendimento' in df_compare_anterior.columns:
-                        df_tmia_filtered_ant = df_compare_anterior[(df_compare_anterior['TMIA'] > 0.0)]
-                        top_tmia_ant = df_tmia_filtered_ant.sort_values(by=['TMIA', 'QTD Atendimento'], ascending=[True, False]).head(3)
-                        top_tmia_ant = top_tmia_ant[['Agente', 'TMIA']]
-                        top_tmia_ant['TMIA'] = top_tmia_ant['TMIA'].apply(format_time)
-                        st.dataframe(top_tmia_ant, use_container_width=True, hide_index=True)
-
-            # --- RANKING 3: MÊS ATUAL (CONSOLIDADO) ---
-            with col_rank3:
-                st.markdown(f"##### 🥉 Consolidado do Mês ({selected_month})")
-                st.info(f"Base: '{MESES.get(selected_month.lower())}'")
-                
-                # Usa o df_monthly_aggregate (o CSV do mês inteiro)
-                if df_monthly_aggregate.empty:
-                    st.warning("Arquivo consolidado do mês não encontrado.")
-                elif 'Agente' not in df_monthly_aggregate.columns:
-                     st.error("Ranking Mensal: Coluna 'Agente' não encontrada.")
-                else:
-                    # Não precisa agregar, pois df_monthly_aggregate já é agregado
-                    df_compare_monthly = df_monthly_aggregate.copy() 
-
-                    # FCR
-                    if 'FCR' in df_compare_monthly.columns and 'QTD Atendimento' in df_compare_monthly.columns:
-                        df_fcr_filtered_cal = df_compare_monthly[(df_compare_monthly['FCR'] > 0.0) & (df_compare_monthly['FCR'] < 1.0)]
-                        top_fcr_cal = df_fcr_filtered_cal.sort_values(by=['FCR', 'QTD Atendimento'], ascending=[False, False]).head(3) 
-                        top_fcr_cal = top_fcr_cal[['Agente', 'FCR']] 
-                        top_fcr_cal['FCR'] = (top_fcr_cal['FCR'] * 100).map('{:.2f}%'.format) 
-                        st.dataframe(top_fcr_cal, use_container_width=True, hide_index=True)
-                    else: st.info("Métrica 'FCR' não disponível.")
-                    # Satisfacao
-                    if 'Satisfacao' in df_compare_monthly.columns and 'QTD Atendimento' in df_compare_monthly.columns:
-                        df_satisfacao_filtered_cal = df_compare_monthly[(df_compare_monthly['Satisfacao'] > 0.0) & (df_compare_monthly['Satisfacao'] < 5.0)]
-                        top_satisfacao_cal = df_satisfacao_filtered_cal.sort_values(by=['Satisfacao', 'QTD Atendimento'], ascending=[False, False]).head(3)
-                        top_satisfacao_cal = top_satisfacao_cal[['Agente', 'Satisfacao']]
-                        top_satisfacao_cal['Satisfacao'] = (top_satisfacao_cal['Satisfacao'] / 5.0 * 100).map('{:.2f}%'.format)
-                        st.dataframe(top_satisfacao_cal, use_container_width=True, hide_index=True)
-                    else: st.info("Métrica 'Satisfacao' não disponível.")
-                    # TMIA
-                    if 'TMIA' in df_compare_monthly.columns and 'QTD Atendimento' in df_compare_monthly.columns:
-                        df_tmia_filtered_cal = df_compare_monthly[(df_compare_monthly['TMIA'] > 0.0)]
-                        top_tmia_cal = df_tmia_filtered_cal.sort_values(by=['TMIA', 'QTD Atendimento'], ascending=[True, False]).head(3)
-                        top_tmia_cal = top_tmia_cal[['Agente', 'TMIA']]
-                        top_tmia_cal['TMIA'] = top_tmia_cal['TMIA'].apply(format_time)
-                        st.dataframe(top_tmia_cal, use_container_width=True, hide_index=True)
-                    else: st.info("Métrica 'TMIA' não disponível.")
+                    board = apply_formatting(board)
+                    st.dataframe(board, column_config=table_config(board), use_container_width=True, hide_index=True)
+
+                rank_agent = st.selectbox("Posição do agente:", agent_list[1:], key="ranking_agent")
+                if rank_agent:
+                    rank = load_agent_rank(kind, selected_year, name, metric, rank_agent)
+                    if rank:
+                        st.caption(f"{rank_agent}: {rank[0]}º de {rank[1]} em {metric}.")
+                    else:
+                        st.caption(f"{rank_agent} não está no ranking de {metric} desta base.")
 
             st.markdown("---")
             
             # Gráficos de Comparação (Baseados no FILTRO DE CALENDÁRIO)
             st.subheader("⚖️ Comparação de Agentes (Período Selecionado)")
             
-            agg_cols = [col for col in ['QTD Atendimento', 'Satisfacao', 'NPS', 'FCR', 'TMA', 'TME', 'TMIA'] if col in df_filtered.columns]
+            agg_cols = [col for col in ['QTD Atendimento', 'Satisfacao', 'NPS', 'FCR', 'TMA', 'TME', 'TMIA'] if col in period_cube.metrics]
 
-            if 'Agente' in df_filtered.columns and agg_cols:
-                agg_dict_cal = {col: ('sum' if col.startswith('QTD') else 'mean') 
-                                for col in agg_cols if col in df_filtered.columns}
+            if agg_cols:
+                df_compare_calendario = period_cube.by_agent(period_range, metrics=agg_cols)
                 
-                if agg_dict_cal:
-                    df_compare_calendario = df_filtered.groupby('Agente').agg(agg_dict_cal).reset_index()
+                if not df_compare_calendario.empty:
 
                     if 'Satisfacao' in df_compare_calendario.columns:
                         fig_sat_agent = px.bar(df_compare_calendario.sort_values(by='Satisfacao', ascending=False), x='Agente', y='Satisfacao', title='Média de Satisfação por Agente', color='Satisfacao', color_continuous_scale=px.colors.sequential.Plotly3)
@@ -1055,39 +1125,49 @@ def display_admin_dashboard(df_monthly_aggregate): # df (passado do main) é o M
                     
                     df_compare_sorted = df_compare_calendario.sort_values(by=['Satisfacao', 'QTD Atendimento'], ascending=[False, False])
                     df_display_admin_agg = apply_formatting(df_compare_sorted)
-                    st.dataframe(df_display_admin_agg, use_container_width=True, hide_index=True)
+                    st.dataframe(df_display_admin_agg, column_config=table_config(df_display_admin_agg), use_container_width=True, hide_index=True)
+
+                    # Percentis dos dias de cada agente no mesmo intervalo do calendário
+                    if is_date_available:
+                        st.subheader("📐 Distribuição Diária por Agente (Período Selecionado)")
+                        sketches = load_daily_sketches(selected_month, selected_year)
+                        quantile_metric = st.selectbox("Métrica:", [col for col in metrics.QUANTILE_COLS if col in sketches.metrics],
+                                                       key="quantile_metric")
+                        df_quantiles = sketches.by_agent(quantile_metric, period_range)
+                        if quantile_metric in df_compare_calendario.columns and not df_quantiles.empty:
+                            df_means = df_compare_calendario[['Agente', quantile_metric]].rename(columns={quantile_metric: 'Média'})
+                            df_quantiles = df_means.merge(df_quantiles, on='Agente')
+                            df_display_quantiles, quantile_config = quantile_formatting(df_quantiles, quantile_metric)
+                            st.dataframe(df_display_quantiles, column_config=quantile_config, use_container_width=True, hide_index=True)
                 
                 else: 
-                    st.warning("Não há colunas de métricas suficientes no período selecionado para comparar agentes.")
+                    st.warning("Não há dados de 'Agente' no período selecionado.")
             else: 
-                st.warning("Não há dados de 'Agente' no período selecionado.")
+                st.warning("Não há colunas de métricas suficientes no período selecionado para comparar agentes.")
+
+            # Notas da equipe no período (histograma já agregado, sem carregar as avaliações)
+            st.markdown("---")
+            st.subheader("⭐ Distribuição das Notas da Equipe (Período Selecionado)")
+            score_cube = load_score_cube(selected_month, selected_year)
+            score_range = score_cube.period_range(*calendar_days, col='DaySort') if calendar_days else None
+            display_score_distribution(score_cube, periods=score_range)
 
         with tab2:
             # Chama a função de histórico SEM nome de agente (visão admin/geral)
             display_monthly_history(agente_name=None)
             
         with tab3:
-            # Chama a função de detalhe diário (que já usa df_filtered)
+            # Detalhe diário do período selecionado (roll-up do cubo diário)
             st.header(f"📅 Detalhe Dia a Dia ({selected_month.capitalize()})")
             
             if not is_date_available:
                 st.info("Detalhe diário não disponível (nenhuma subpasta encontrada).")
                 # Se não houver dados diários, exibe o consolidado mensal
-                df_display = apply_formatting(df_filtered)
-                st.dataframe(df_display, use_container_width=True)
+                df_display = apply_formatting(df_monthly_aggregate)
+                st.dataframe(df_display, column_config=table_config(df_display), use_container_width=True)
             else:
-                # Agrupamento para métricas diárias (Médias por Data e Agente)
-                agg_dict_full = {
-                    'QTD Atendimento': 'sum', 'TMA': 'mean', 'TME': 'mean', 'TMIA': 'mean',
-                    'FCR': 'mean', 'Satisfacao': 'mean', 'NPS': 'mean', 'QTD Avaliacoes': 'sum',
-                    'DaySort': 'first', 'Agente': 'first', 'Data': 'first'
-                }
-                
-                agg_cols_full = [col for col in agg_dict_full.keys() if col in df_filtered.columns]
-                
-                df_daily_agg = df_filtered.groupby(['DaySort', 'Dia', 'Agente'], as_index=False).agg({
-                    col: agg_dict_full[col] for col in agg_cols_full
-                }).sort_values(by='DaySort')
+                # Métricas diárias por Dia e Agente (células do cubo), já na ordem de DaySort
+                df_daily_agg = daily_cube.by_agent_period(period_range, metrics=metrics.KPI_COLS)
 
                 st.subheader("Gráficos de Tendência Diária (Todos Agentes)")
                 col1, col2 = st.columns(2)
@@ -1107,7 +1187,10 @@ def display_admin_dashboard(df_monthly_aggregate): # df (passado do main) é o M
                 df_daily_agg = df_daily_agg.drop(columns=['DaySort', 'Data']) 
                 df_display = apply_formatting(df_daily_agg)
                 cols = ['Dia'] + [col for col in df_display.columns if col != 'Dia']
-                st.dataframe(df_display[cols], use_container_width=True)
+                st.dataframe(df_display[cols], column_config=table_config(df_display), use_container_width=True)
+
+        with tab4:
+            display_protocol_search()
 
 
 # --- Funções de Autenticação na UI (Inalterada) ---
@@ -1,86 +1,93 @@
 import streamlit as st
-import gspread
-from google.oauth2.service_account import Credentials
 import pandas as pd
-import os
+import time
+import threading
+import store
+from sheets import get_write_queue
+from storage import get_storage
 
-# --- CONEXÃO COM O GOOGLE SHEETS ---
-def get_auth_connection():
-    """Conecta ao Google Sheets para buscar usuários."""
-    try:
-        scopes = ["https://www.googleapis.com/auth/spreadsheets", "https://www.googleapis.com/auth/drive"]
-        
-        if "google_credentials" in st.secrets:
-            creds_dict = dict(st.secrets["google_credentials"])
-        else:
-            return None
-
-        # Correção obrigatória de padding para Windows
-        if "private_key" in creds_dict:
-            creds_dict["private_key"] = creds_dict["private_key"].replace("\\n", "\n")
-            
-        creds = Credentials.from_service_account_info(creds_dict, scopes=scopes)
-        client = gspread.authorize(creds)
-        
-        # Tenta abrir pelo NOME "BaseFAQ" ou URL
-        try:
-            sh = client.open("BaseFAQ")
-        except:
-            if "spreadsheet_url" in st.secrets:
-                sh = client.open_by_url(st.secrets["spreadsheet_url"])
-            else:
-                return None
+# Tempo (segundos) que o diretório de usuários fica em memória antes de reler o armazenamento
+USERS_TTL = 300
 
-        return sh.worksheet("Usuarios") 
-        
-    except Exception as e:
-        return None
+# --- ARMAZENAMENTO (PLANILHA OU SQLITE) ---
+# Usuários são lidos e gravados por storage.get_storage(): a planilha ou o SQLite local; as
+# escritas na planilha vão pela fila (sheets.WriteQueue). O único cache de usuários é o
+# UserDirectory abaixo: toda escrita passa por invalidate_users().
 
 # --- LEITURA LOCAL (CSVs) ---
+@st.cache_resource
+def get_data_store():
+    """Store compilado compartilhado por todas as sessões."""
+    return store.ParquetStore()
+
+@st.cache_resource
+def get_agent_registry():
+    """Cadastro de agentes de toda a árvore data/ (store.AgentRegistry), compartilhado pelas sessões.
+
+    Lê pelo store compilado, como o índice de protocolos: a primeira varredura não reprocessa os CSVs.
+    """
+    data_store = get_data_store()
+    return store.AgentRegistry(data_store.store_dir, data_store.data_dir, reader=data_store.read_file)
+
 def get_csv_agents():
-    """Varre a pasta data/ para encontrar nomes de agentes nos arquivos CSV."""
-    agents = set()
-    DATA_FOLDER = 'data'
-    
-    if not os.path.exists(DATA_FOLDER):
-        return agents
-
-    for filename in os.listdir(DATA_FOLDER):
-        if filename.endswith(".csv"):
-            try:
-                path = os.path.join(DATA_FOLDER, filename)
-                # Leitura robusta
-                df = pd.read_csv(path, sep=';', encoding='latin1', engine='python')
-                if df.shape[1] < 2:
-                    df = pd.read_csv(path, sep=',', encoding='utf-8', engine='python')
-                
-                df.columns = df.columns.str.strip().str.upper().str.replace('[^A-Z0-9_]+', '', regex=True)
-                
-                if 'NOM_AGENTE' in df.columns: target = 'NOM_AGENTE'
-                elif 'NOMAGENTE' in df.columns: target = 'NOMAGENTE'
-                else: continue
-                
-                unique_names = df[target].dropna().unique()
-                for name in unique_names:
-                    if str(name).strip():
-                        agents.add(str(name).strip())
-            except:
-                continue
-    return agents
+    """Agentes vistos em qualquer CSV de data/ (todos os anos e tipos); só os arquivos novos são lidos."""
+    registry = get_agent_registry()
+    registry.refresh(max_age=store.REFRESH_INTERVAL)
+    return set(registry.names())
+
+# --- DIRETÓRIO DE USUÁRIOS (EM MEMÓRIA) ---
+class UserDirectory:
+    """Usuários (nuvem + CSVs) em memória, compartilhados por todas as sessões.
+
+    Recarrega depois de `ttl` segundos ou quando alguma escrita chama
+    invalidate(). A carga roda sob um lock: no começo do turno, quando todos
+    entram juntos, só a primeira sessão vai ao armazenamento e as outras esperam
+    pelo mesmo resultado.
+    """
+
+    def __init__(self, loader, ttl=USERS_TTL):
+        self._loader = loader
+        self._ttl = ttl
+        self._lock = threading.Lock()
+        self._users = None
+        self._loaded_at = 0.0
+
+    def get(self):
+        with self._lock:
+            if self._users is None or time.monotonic() - self._loaded_at > self._ttl:
+                self._users = self._loader()
+                self._loaded_at = time.monotonic()
+            return dict(self._users)
+
+    def invalidate(self):
+        with self._lock:
+            self._users = None
+
+@st.cache_resource
+def get_user_directory():
+    return UserDirectory(load_all_users)
+
+def invalidate_users():
+    """Descarta o diretório em memória (chamar depois de qualquer escrita de usuários)."""
+    get_user_directory().invalidate()
 
 # --- FUNÇÕES DE USUÁRIOS ---
 
 def get_all_users():
-    """Retorna dicionário unificado: Nuvem (Prioridade) + Local (Implícito)."""
+    """Retorna dicionário unificado: Nuvem (Prioridade) + Local (Implícito), do diretório em memória."""
+    return get_user_directory().get()
+
+def load_all_users():
+    """Lê o armazenamento (planilha ou SQLite) e os CSVs e monta o dicionário de usuários (ver get_all_users)."""
     users_db = {}
     
     # 1. Carrega da Nuvem
-    worksheet = get_auth_connection()
     cloud_usernames = set() # Para rastrear quem já está na nuvem
     
-    if worksheet:
-        try:
-            records = worksheet.get_all_records()
+    try:
+        storage = get_storage()
+        if storage is not None:
+            records = storage.users()
             for row in records:
                 usuario = str(row.get('Usuario', '')).strip()
                 if usuario:
@@ -94,7 +101,7 @@ def get_all_users():
                         'source': 'cloud'
                     }
                     cloud_usernames.add(usuario)
-        except: pass
+    except: pass
 
     # 2. Carrega Local (Apenas os que NÃO estão na nuvem)
     csv_agents = get_csv_agents()
@@ -123,21 +130,15 @@ def get_user_info(username):
     return users_db.get(username, {})
 
 def change_password_db(username, new_password):
-    worksheet = get_auth_connection()
-    if not worksheet: return False
-    
+    """Grava a troca de senha no armazenamento (na planilha, pela fila de escrita: resposta imediata)."""
+    storage = get_storage()
+    if storage is None: return False
+
     try:
-        cell = worksheet.find(username)
-        if cell:
-            # Atualiza existente
-            header = worksheet.row_values(1)
-            col_senha = header.index('Senha') + 1
-            col_acesso = header.index('PrimeiroAcesso') + 1
-            worksheet.update_cell(cell.row, col_senha, new_password)
-            worksheet.update_cell(cell.row, col_acesso, "FALSE")
-        else:
-            # Cria novo (caso raro de migração no momento da troca)
-            worksheet.append_row([username, new_password, username, "user", "FALSE"])
+        # Se o usuário ainda não estiver cadastrado (caso raro de migração no momento da troca), a linha é criada
+        storage.update_user(username, {'Senha': new_password, 'PrimeiroAcesso': "FALSE"},
+                            [username, new_password, username, "user", "FALSE"])
+        invalidate_users()
         return True
     except Exception as e:
         st.error(f"Erro ao salvar: {e}")
@@ -146,14 +147,14 @@ def change_password_db(username, new_password):
 # 🚨 NOVA FUNÇÃO: SINCRONIZAÇÃO EM MASSA 🚨
 def sync_csv_users_to_cloud():
     """Pega usuários que só existem no CSV e salva na Planilha."""
-    worksheet = get_auth_connection()
-    if not worksheet:
+    storage = get_storage()
+    if storage is None:
         st.error("Sem conexão com a planilha.")
         return
     
-    # 1. Pega usuários atuais da nuvem
+    # 1. Pega usuários atuais da nuvem (lidos agora; na planilha, incluindo os que ainda estão na fila)
     try:
-        cloud_records = worksheet.get_all_records()
+        cloud_records = storage.users()
         cloud_users = {str(row.get('Usuario', '')).strip() for row in cloud_records}
     except:
         cloud_users = set()
@@ -171,7 +172,8 @@ def sync_csv_users_to_cloud():
     # 4. Salva em massa (MUITO mais rápido que um por um)
     if new_users:
         try:
-            worksheet.append_rows(new_users)
+            storage.add_users(new_users)
+            invalidate_users()
             st.success(f"✅ Sucesso! {len(new_users)} novos agentes foram cadastrados na planilha.")
             st.rerun()
         except Exception as e:
@@ -180,8 +182,35 @@ def sync_csv_users_to_cloud():
         st.info("Todos os agentes do CSV já estão na nuvem.")
 
 # --- INTERFACE DE GERENCIAMENTO (PARA O ADMIN) ---
+def display_failed_writes():
+    """Escritas que a planilha recusou de vez (sheets.WriteQueue.failed): precisam ser refeitas."""
+    queue = get_write_queue()
+    failed = queue.failed() if queue is not None else []
+    if not failed:
+        return
+
+    st.error(f"⚠️ {len(failed)} escrita(s) foram recusadas pela planilha e descartadas. Refaça a operação.")
+    with st.expander("Ver escritas recusadas"):
+        rows = []
+        for entry in failed:
+            op = entry['pedido']
+            rows.append({
+                'Quando': entry['quando'],
+                'Aba': op['sheet'],
+                'Operação': 'Alteração' if op['op'] == 'update' else 'Inclusão',
+                'Registro': op['key'] if op['op'] == 'update' else ', '.join(str(row[0]) for row in op['rows'] if row),
+                'Erro': entry['erro'],
+            })
+        st.dataframe(pd.DataFrame(rows), use_container_width=True)
+        if st.button("Limpar lista"):
+            queue.clear_failed()
+            st.rerun()
+    st.markdown("---")
+
 def user_manager_interface(df_history):
     st.header("👥 Gerenciar Usuários")
+
+    display_failed_writes()
     
     users = get_all_users()
     
@@ -196,17 +225,21 @@ def user_manager_interface(df_history):
                 sync_csv_users_to_cloud()
         st.markdown("---")
 
-    # Tabela de Usuários
+    # Tabela de Usuários (com o primeiro e o último dia do agente nos arquivos)
     if users:
+        seen = get_agent_registry().agents().set_index('Agente')
         users_list = []
         for u, data in users.items():
             source_icon = "☁️ Nuvem" if data.get('source') == 'cloud' else "📂 CSV (Temp)"
+            agente = str(data.get('agente', '')).strip()
             users_list.append({
                 'Usuário': u,
                 'Nome': data['name'],
                 'Função': data['role'],
                 'Origem': source_icon,
-                'Primeiro Acesso': 'Sim' if data['primeiro_acesso'] else 'Não'
+                'Primeiro Acesso': 'Sim' if data['primeiro_acesso'] else 'Não',
+                'Visto de': seen['Primeiro dia'].get(agente),
+                'Visto até': seen['Último dia'].get(agente),
             })
         
         st.dataframe(pd.DataFrame(users_list), use_container_width=True)
@@ -227,12 +260,13 @@ def user_manager_interface(df_history):
         if st.form_submit_button("Salvar na Nuvem"):
             if new_user and new_pass and new_name:
                 try:
-                    ws = get_auth_connection()
-                    existing = ws.find(new_user)
+                    # Diretório em memória: já inclui as escritas ainda na fila
+                    existing = get_all_users().get(new_user, {}).get('source') == 'cloud'
                     if existing:
                         st.error("Usuário já existe!")
                     else:
-                        ws.append_row([new_user, new_pass, new_name, new_role, "TRUE"])
+                        get_storage().add_users([[new_user, new_pass, new_name, new_role, "TRUE"]])
+                        invalidate_users()
                         st.success(f"Usuário {new_user} criado!")
                         st.rerun()
                 except Exception as e:
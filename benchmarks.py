@@ -0,0 +1,170 @@
+"""Micro-benchmarks do motor de ingestão.
+
+Uso: python benchmarks.py
+"""
+import os
+import tempfile
+import timeit
+import numpy as np
+import pandas as pd
+import ingest
+
+
+# --- Referência: conversão antiga, célula a célula com .apply ---
+def time_to_minutes(time_str):
+    if pd.isna(time_str) or time_str == '': return 0.0
+    try:
+        parts = str(time_str).split(':')
+        if len(parts) == 3: hours, minutes, seconds = map(float, parts); return (hours * 60) + minutes + seconds / 60
+        elif len(parts) == 2: minutes, seconds = map(float, parts); return minutes + seconds / 60
+        else: return 0.0
+    except: return 0.0
+
+
+def make_duration_column(n, seed=0):
+    """Coluna sintética parecida com a dos CSVs: HH:MM:SS, alguns MM:SS e vazios."""
+    rng = np.random.default_rng(seed)
+    h, m, s = rng.integers(0, 3, n), rng.integers(0, 60, n), rng.integers(0, 60, n)
+    values = [f"{a:02d}:{b:02d}:{c:02d}" for a, b, c in zip(h, m, s)]
+    for i in range(0, n, 7): values[i] = np.nan
+    for i in range(3, n, 11): values[i] = f"{m[i]:02d}:{s[i]:02d}"
+    return pd.Series(values, dtype=object)
+
+
+def bench_duration(sizes=(30, 1_000, 100_000), repeat=5):
+    """Compara parse_duration (por célula até ingest.DURATION_SCALAR_ROWS linhas, vetorizado acima) com o caminho antigo (.apply)."""
+    print(f"{'linhas':>8} {'.apply (ms)':>12} {'parse_duration (ms)':>20} {'ganho':>7}")
+    for n in sizes:
+        col = make_duration_column(n)
+
+        # Mesmos valores (vazios antes viravam 0.0, agora NaN)
+        expected = col.apply(time_to_minutes)
+        assert np.allclose(ingest.parse_duration(col).fillna(0.0), expected)
+
+        number = max(1, 20_000 // n)
+        t_apply = min(timeit.repeat(lambda: col.apply(time_to_minutes), number=number, repeat=repeat)) / number
+        t_vec = min(timeit.repeat(lambda: ingest.parse_duration(col), number=number, repeat=repeat)) / number
+        print(f"{n:>8} {t_apply * 1000:>12.3f} {t_vec * 1000:>20.3f} {t_apply / t_vec:>6.1f}x")
+
+
+# --- Referência: formatação antiga de exibição (cópia inteira + .apply/.map por célula) ---
+def format_time(minutes):
+    if pd.isna(minutes) or minutes is None or minutes == 0:
+        return '00:00'
+    try:
+        total_seconds = round(minutes * 60)
+        mins = total_seconds // 60
+        secs = total_seconds % 60
+        return f'{int(mins):02d}:{int(secs):02d}'
+    except:
+        return 'N/A'
+
+
+def legacy_formatting(df):
+    df_copy = df.copy()
+    for col in [col for col in ingest.TIME_COLS if col in df_copy.columns]:
+        df_copy[col] = df_copy[col].apply(format_time)
+    df_copy['FCR'] = (df_copy['FCR'] * 100).map('{:.2f}%'.format)
+    df_copy['Satisfacao'] = (df_copy['Satisfacao'] / 5.0 * 100).map('{:.2f}%'.format)
+    return df_copy
+
+
+def vectorized_formatting(df):
+    """O que o apply_formatting do app.py faz hoje (os percentuais são formatados pelo st.dataframe)."""
+    df_copy = df.copy(deep=False)
+    for col in [col for col in ingest.TIME_COLS if col in df_copy.columns]:
+        df_copy[col] = ingest.format_duration(df_copy[col])
+    df_copy['FCR'] = df_copy['FCR'].astype('float64') * 100
+    df_copy['Satisfacao'] = df_copy['Satisfacao'].astype('float64') / 5.0 * 100
+    return df_copy
+
+
+def bench_formatting(agents=(40, 400), days=31, repeat=5):
+    """Tabela agentes × dias do admin: formatação antiga x vetorizada."""
+    rng = np.random.default_rng(0)
+    print(f"{'linhas':>8} {'antiga (ms)':>12} {'vetorizada (ms)':>16} {'ganho':>7}")
+    for n_agents in agents:
+        n = n_agents * days
+        df = pd.DataFrame({col: rng.uniform(0, 30, n).astype('float32') for col in ingest.TIME_COLS})
+        df['FCR'] = rng.uniform(0, 1, n).astype('float32')
+        df['Satisfacao'] = rng.uniform(0, 5, n).astype('float32')
+
+        # Mesmos textos de tempo
+        assert (legacy_formatting(df)['TMA'] == vectorized_formatting(df)['TMA']).all()
+
+        t_old = min(timeit.repeat(lambda: legacy_formatting(df), number=3, repeat=repeat)) / 3
+        t_new = min(timeit.repeat(lambda: vectorized_formatting(df), number=3, repeat=repeat)) / 3
+        print(f"{n:>8} {t_old * 1000:>12.2f} {t_new * 1000:>16.2f} {t_old / t_new:>6.1f}x")
+
+
+def legacy_frame(df):
+    """Mesmo frame com os tipos antigos: texto como object e números como float64."""
+    legacy = df.copy()
+    for col in legacy.columns:
+        if isinstance(legacy[col].dtype, pd.CategoricalDtype) or pd.api.types.is_string_dtype(legacy[col]):
+            legacy[col] = legacy[col].astype(object)
+        elif pd.api.types.is_numeric_dtype(legacy[col]):
+            legacy[col] = legacy[col].astype('float64')
+    return legacy
+
+
+def bench_memory(year='2025', data_dir='data'):
+    """Memória dos dias do ano inteiro (tipos compactos x tipos antigos)."""
+    frames = []
+    for month in ingest.MESES_ORDER:
+        folder = os.path.join(data_dir, year, month)
+        frames.append(ingest.load_folder(folder, 'diario', lambda df, f, m=month: ingest.annotate_day(df, f, m, year)))
+    df = ingest.apply_dtypes(pd.concat(frames, ignore_index=True), 'diario')
+    if df.empty:
+        print(f"Sem dados diários em {data_dir}/{year}.")
+        return
+
+    compact = ingest.memory_report(df)
+    legacy = ingest.memory_report(legacy_frame(df))
+    report = compact.join(legacy, rsuffix=' (antigo)')
+    print(f"Diários {year}: {len(df)} linhas")
+    print(report.to_string())
+    print(f"Redução: {legacy.loc['Total', 'Bytes'] / compact.loc['Total', 'Bytes']:.1f}x")
+
+
+def bench_storage(n_users=400, n_faq=300, logins=2_000, repeat=5):
+    """Logins e busca no FAQ sobre o SQLite local, direto e pelos caches do app (sem rede)."""
+    import auth, storage # Só este benchmark precisa do streamlit/gspread instalados
+
+    with tempfile.TemporaryDirectory() as tmp:
+        backend = storage.SQLiteStorage(os.path.join(tmp, 'bench.db'))
+        backend.add_users([[f"agente{i}", "12345", f"Agente {i}", "user", "TRUE"] for i in range(n_users)])
+        backend.replace_faq([{'Pergunta': f"Como resolver o caso {i}?", 'Resposta': f"Procedimento {i} do manual."}
+                             for i in range(n_faq)])
+        names = [f"agente{i % n_users}" for i in range(logins)]
+        load_users = lambda: {row['Usuario']: row for row in backend.users()}
+
+        # Usuários: o cache é o diretório do auth.py; FAQ: o CachedStorage
+        directory, cached = auth.UserDirectory(load_users), storage.CachedStorage(backend)
+
+        def login(get_users):
+            for name in names:
+                assert get_users()[name]['Senha'] == "12345"
+
+        def search(source, terms=("caso 1", "manual", "inexistente")):
+            df = pd.DataFrame(source.faq()).astype(str)
+            for term in terms:
+                df[df['Pergunta'].str.contains(term, case=False, na=False) |
+                   df['Resposta'].str.contains(term, case=False, na=False)]
+
+        print(f"{'operação':>14} {'SQLite (ms)':>12} {'com cache (ms)':>15} {'ganho':>7}")
+        cases = ((f"{logins} logins", login, load_users, directory.get, 1), ("busca FAQ", search, backend, cached, 20))
+        for label, fn, direct, via_cache, number in cases:
+            t_db = min(timeit.repeat(lambda: fn(direct), number=number, repeat=repeat)) / number
+            t_cache = min(timeit.repeat(lambda: fn(via_cache), number=number, repeat=repeat)) / number
+            print(f"{label:>14} {t_db * 1000:>12.2f} {t_cache * 1000:>15.2f} {t_db / t_cache:>6.1f}x")
+
+
+if __name__ == '__main__':
+    bench_duration()
+    print()
+    bench_formatting()
+    print()
+    bench_memory()
+    print()
+    bench_storage()
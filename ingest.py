@@ -0,0 +1,633 @@
+import os
+import math
+import logging
+import threading
+import datetime
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+# --- Motor de Ingestão dos CSVs ---
+# Todos os carregadores do app.py passam por aqui: limpeza de colunas,
+# renomeação, conversão de tempo e de percentuais (tudo por coluna).
+
+# Mapeamento de meses (para facilitar a identificação dos arquivos e ordenação)
+MESES_ORDER = ["janeiro", "fevereiro", "março", "abril", "maio", "junho",
+               "julho", "agosto", "setembro", "outubro", "novembro", "dezembro"]
+
+# Leitores em paralelo para cargas de pasta inteira (1 = sequencial)
+READ_WORKERS = int(os.environ.get('DASHBOARD_READ_WORKERS', min(8, os.cpu_count() or 1)))
+
+# Versão do esquema: incrementar ao mudar a normalização (invalida o store compilado)
+SCHEMA_VERSION = 3
+
+TIME_COLS = ['TMA', 'TME', 'TMIA', 'TMIC']
+
+# Até quantas linhas parse_duration converte célula a célula (mais barato que montar as matrizes numpy)
+DURATION_SCALAR_ROWS = 64
+
+# Escala final de cada coluna percentual: FCR (0-1), Satisfação (0-5), NPS (0-100)
+PERCENT_SCALE = {'FCR': 1 / 100, 'Satisfacao': 5 / 100, 'NPS': 1}
+
+METRICS_RENAME = {
+    'NOM_AGENTE': 'Agente',
+    'QTDATENDIMENTO': 'QTD Atendimento', # Corrigido (sem S)
+    'SATISFACAO': 'Satisfacao',
+    'QTDSATISFACAO': 'QTD Avaliacoes',
+}
+
+METRICS_EXPECTED = [
+    'Agente', 'QTD Atendimento', 'TMA', 'TME', 'TMIA', 'TMIC',
+    'FCR', 'Satisfacao', 'NPS', 'QTD Avaliacoes'
+]
+
+# Tipos finais: agente como categoria, contagens como inteiro anulável, taxas e tempos
+# como float32 (ausente = NaN, nunca 0)
+METRICS_DTYPES = {
+    'Agente': 'category',
+    'QTD Atendimento': 'Int64',
+    'QTD Avaliacoes': 'Int64',
+    **{col: 'float32' for col in TIME_COLS},
+    **{col: 'float32' for col in PERCENT_SCALE},
+}
+
+# Colunas derivadas do caminho (annotate_day / annotate_month), também compactas
+DERIVED_DTYPES = {
+    'Dia': 'category', 'Mês': 'category', 'Período': 'category',
+    'DaySort': 'int16', 'MonthSort': 'int16', 'Ano': 'int16', 'PeriodSort': 'int16',
+}
+
+# Esquema declarado por tipo de arquivo
+SCHEMAS = {
+    # data/[ANO]/[mês].csv
+    'mensal': {
+        'rename': METRICS_RENAME,
+        'expected': METRICS_EXPECTED,
+        'time_cols': TIME_COLS,
+        'percent_cols': PERCENT_SCALE,
+        'dtypes': METRICS_DTYPES,
+    },
+    # data/[ANO]/[mês]/DD.MM.csv
+    'diario': {
+        'rename': METRICS_RENAME,
+        'expected': METRICS_EXPECTED,
+        'time_cols': TIME_COLS,
+        'percent_cols': PERCENT_SCALE,
+        'dtypes': METRICS_DTYPES,
+    },
+    # data/[ANO]/semana/ranking_semanal_*.csv
+    'semanal': {
+        'rename': METRICS_RENAME,
+        'expected': METRICS_EXPECTED,
+        'time_cols': TIME_COLS,
+        'percent_cols': PERCENT_SCALE,
+        'dtypes': METRICS_DTYPES,
+    },
+    # data/[ANO]/[mês]/notas/DD.MM.csv (Dia, num_protocolo, nom_valor, nom_agente)
+    'notas': {
+        'rename': {
+            'NOM_AGENTE': 'Agente',
+            'NUM_PROTOCOLO': 'Protocolo',
+            'NOM_VALOR': 'Nota', # 'nom_valor' vira 'NOM_VALOR' -> 'Nota'
+            'DIA': 'Dia (CSV)' # Coluna 'Dia' original do CSV
+        },
+        'expected': ['Agente', 'Protocolo', 'Nota'],
+        'time_cols': [],
+        'percent_cols': {},
+        # Protocolo é identificador (texto), não número
+        'dtypes': {'Agente': 'category', 'Protocolo': 'string', 'Nota': 'Int64', 'Dia (CSV)': 'Int64'},
+    },
+}
+
+
+# --- Conversões por coluna ---
+
+def clean_columns(columns):
+    """Normaliza os nomes de coluna (maiúsculas, sem espaços, BOM ou acentos)."""
+    columns = columns.str.replace('\ufeff', '', regex=False) # BOM que sobrar de um fallback
+    return columns.str.strip().str.upper().str.replace('[^A-Z0-9_]+', '', regex=True)
+
+def _duration_scalar(value):
+    """Uma célula HH:MM:SS / MM:SS em minutos, com a conta do time_to_minutes antigo (vazio, inválido ou infinito = NaN)."""
+    if not isinstance(value, str):
+        if value is None or value != value:
+            return np.nan
+        value = str(value)
+    parts = value.split(':')
+    if len(parts) not in (2, 3):
+        return np.nan
+    try:
+        values = [float(part.replace(',', '.') if ',' in part else part) for part in parts]
+    except ValueError:
+        return np.nan
+    if len(values) == 2:
+        minutes = values[0] + values[1] / 60
+    else:
+        minutes = values[0] * 60 + values[1] + values[2] / 60
+    return minutes if math.isfinite(minutes) else np.nan
+
+def parse_duration(col):
+    """Converte uma coluna de HH:MM:SS / MM:SS para minutos (float), vetorizado; vazio ou inválido vira NaN."""
+    if col.empty or pd.api.types.is_numeric_dtype(col):
+        # Coluna toda vazia (o pandas lê como float NaN)
+        return pd.Series(np.nan, index=col.index, dtype='float64')
+    if len(col) <= DURATION_SCALAR_ROWS:
+        # Coluna curta (um agente, poucos dias): o laço por célula sai mais barato
+        minutes = np.fromiter(map(_duration_scalar, col.tolist()), dtype='float64', count=len(col))
+        return pd.Series(minutes, index=col.index)
+
+    values = col.to_numpy(dtype=object, copy=True)
+    blank = pd.isna(values)
+    values[blank] = ''
+    text = values.astype(str)
+    if text.dtype.itemsize < 8 * 4:
+        text = text.astype('<U8')
+
+    n = len(text)
+    codes = text.view(np.uint32).reshape(n, -1)[:, :8].astype(np.int64)
+    lengths = np.char.str_len(text)
+    digits = codes - 48
+    is_digit = (digits >= 0) & (digits <= 9)
+    is_colon = codes == 58
+
+    hms = (lengths == 8) & is_digit[:, [0, 1, 3, 4, 6, 7]].all(axis=1) & is_colon[:, 2] & is_colon[:, 5]
+    ms = (lengths == 5) & is_digit[:, [0, 1, 3, 4]].all(axis=1) & is_colon[:, 2]
+
+    first = digits[:, 0] * 10 + digits[:, 1]
+    second = digits[:, 3] * 10 + digits[:, 4]
+    third = digits[:, 6] * 10 + digits[:, 7]
+
+    minutes = np.full(n, np.nan)
+    minutes[hms] = (first * 60 + second + third / 60)[hms]
+    minutes[ms] = (first + second / 60)[ms]
+
+    other = ~(hms | ms) & (lengths > 0)
+    if other.any():
+        minutes[other] = [_duration_scalar(t) for t in text[other]]
+
+    return pd.Series(minutes, index=col.index)
+
+def format_duration(col):
+    """Minutos decimais -> 'MM:SS' para exibição (coluna inteira), como o format_time do app.py; infinito vira 'N/A'."""
+    if col.empty:
+        return pd.Series([], index=col.index, dtype=object)
+    minutes = pd.to_numeric(col, errors='coerce').to_numpy(dtype='float64', na_value=np.nan)
+    infinite = np.isinf(minutes)
+    minutes = np.where(np.isnan(minutes) | infinite, 0.0, minutes) # Antes do int64: inf não tem inteiro
+    mins, secs = np.divmod(np.round(minutes * 60).astype(np.int64), 60)
+
+    if mins.min() >= 0 and mins.max() < 100:
+        codes = np.empty((len(mins), 5), dtype=np.uint8)
+        codes[:, 0], codes[:, 1] = 48 + mins // 10, 48 + mins % 10
+        codes[:, 2] = 58 # ':'
+        codes[:, 3], codes[:, 4] = 48 + secs // 10, 48 + secs % 10
+        text = codes.view('S5').ravel().astype(str)
+    else:
+        text = np.char.add(np.char.add(np.char.zfill(mins.astype(str), 2), ':'), np.char.zfill(secs.astype(str), 2))
+    if infinite.any():
+        text = np.where(infinite, 'N/A', text)
+    return pd.Series(text, index=col.index, dtype=object)
+
+def percent_to_float(col, scale=1):
+    """Converte '88,89%' para número (vetorizado), aplicando a escala do esquema."""
+    text = col.astype(str).str.replace('%', '', regex=False).str.replace(',', '.', regex=False)
+    return pd.to_numeric(text, errors='coerce') * scale
+
+
+# --- Pipeline ---
+
+class MalformedFileError(ValueError):
+    """CSV que nem o parser rápido nem o engine='python' conseguiram ler."""
+
+def read_raw(path):
+    """Lê o CSV bruto como texto com o parser C; o BOM do UTF-8 é tratado pelo 'utf-8-sig'.
+
+    Se o arquivo estiver malformado (linhas tortas, outra codificação),
+    registra o motivo no log e tenta de novo com engine='python'.
+    """
+    try:
+        return pd.read_csv(path, encoding='utf-8-sig', dtype=str, engine='c')
+    except (pd.errors.ParserError, UnicodeDecodeError) as e:
+        logger.warning("Arquivo %s malformado para o parser rápido (%s); tentando engine='python'.", path, e)
+
+    for encoding in ('utf-8-sig', 'latin1'):
+        try:
+            return pd.read_csv(path, encoding=encoding, dtype=str, engine='python', sep=None)
+        except (pd.errors.ParserError, UnicodeDecodeError) as e:
+            last_error = e
+    raise MalformedFileError(f"Não foi possível ler {path}: {last_error}")
+
+def apply_dtypes(df, kind):
+    """Converte as colunas para os tipos declarados no esquema (e as derivadas do caminho)."""
+    for col, dtype in {**SCHEMAS[kind]['dtypes'], **DERIVED_DTYPES}.items():
+        if col not in df.columns or df[col].dtype == dtype:
+            continue
+        if dtype == 'Int64':
+            df[col] = pd.to_numeric(df[col], errors='coerce').round().astype('Int64')
+        elif dtype == 'int16':
+            df[col] = pd.to_numeric(df[col], errors='coerce').astype('int16')
+        elif dtype == 'category':
+            df[col] = df[col].astype(object).str.strip().astype('category')
+        else:
+            df[col] = df[col].astype(dtype)
+    return df
+
+def normalize(df, kind):
+    """Aplica o esquema do tipo de arquivo: limpeza, renomeação e conversões."""
+    schema = SCHEMAS[kind]
+    df.columns = clean_columns(df.columns)
+    df = df.rename(columns=schema['rename'])
+
+    for col in schema['time_cols']:
+        if col in df.columns:
+            df[col] = parse_duration(df[col])
+
+    for col, scale in schema['percent_cols'].items():
+        if col in df.columns:
+            df[col] = percent_to_float(df[col], scale)
+
+    return apply_dtypes(df, kind)
+
+def missing_columns(df, kind):
+    """Colunas esperadas pelo esquema que não vieram no arquivo."""
+    return set(SCHEMAS[kind]['expected']) - set(df.columns)
+
+def read_file(path, kind):
+    """Lê e normaliza um único arquivo do tipo informado."""
+    return normalize(read_raw(path), kind)
+
+
+# --- Metadados derivados do caminho ---
+
+def annotate_month(df, month_name_lower, year=None):
+    """Adiciona Mês e MonthSort (arquivos mensais).
+
+    Com o ano, adiciona também Ano, Período ('Dezembro/2025') e PeriodSort
+    (ordem global entre anos, para históricos que atravessam a virada do ano).
+    """
+    df['Mês'] = pd.Categorical([month_name_lower.capitalize()] * len(df))
+    df['MonthSort'] = np.int16(MESES_ORDER.index(month_name_lower))
+    if year is not None:
+        df['Ano'] = np.int16(int(year))
+        df['Período'] = pd.Categorical([f"{month_name_lower.capitalize()}/{year}"] * len(df))
+        df['PeriodSort'] = np.int16(month_key(year, month_name_lower))
+    return df
+
+def annotate_day(df, filename, month_name_lower=None, year=None):
+    """Adiciona Dia, DaySort (e Data, se mês/ano forem informados) a partir do nome 'DD.MM.csv'."""
+    # 01.10.csv -> 01/10
+    df['Dia'] = pd.Categorical([filename.replace('.csv', '').replace('.', '/')] * len(df))
+    # 01.10.csv -> 1
+    day = int(filename.split('.')[0])
+    df['DaySort'] = np.int16(day)
+    if month_name_lower is not None and year is not None:
+        month_num = MESES_ORDER.index(month_name_lower) + 1
+        # Data real (para o filtro de calendário)
+        df['Data'] = pd.to_datetime(
+            pd.DataFrame({'year': [int(year)], 'month': [month_num], 'day': [day]}),
+            errors='coerce'
+        ).iloc[0]
+    return df
+
+
+# --- Histórico por intervalo de meses (atravessa as pastas de ano) ---
+# Um mês é identificado por (ano, 'mês'), ex: (2025, 'dezembro'). O catálogo vem
+# só da listagem das pastas data/[ANO]/; nenhum arquivo é lido para montá-lo.
+
+def month_key(year, month_name_lower):
+    """Posição absoluta do mês (ano * 12 + mês), para comparar e ordenar entre anos."""
+    return int(year) * 12 + MESES_ORDER.index(month_name_lower)
+
+def list_months(data_dir='data'):
+    """Meses com arquivo mensal (data/[ANO]/[mês].csv), em ordem cronológica."""
+    months = []
+    if not os.path.isdir(data_dir):
+        return months
+    for year in os.listdir(data_dir):
+        if not year.isdigit():
+            continue
+        for filename in list_csv(os.path.join(data_dir, year)):
+            month_name_lower = filename[:-len('.csv')].lower()
+            if month_name_lower in MESES_ORDER:
+                months.append((int(year), month_name_lower))
+    return sorted(months, key=lambda m: month_key(*m))
+
+def months_in_range(start, end, data_dir='data'):
+    """Meses disponíveis entre start e end (inclusive), ambos (ano, 'mês')."""
+    lo, hi = month_key(*start), month_key(*end)
+    if lo > hi:
+        lo, hi = hi, lo
+    return [m for m in list_months(data_dir) if lo <= month_key(*m) <= hi]
+
+def trailing_months(end, count, data_dir='data'):
+    """Janela móvel: os `count` meses disponíveis que terminam em `end` (ex: últimos 6 ou 12)."""
+    hi = month_key(*end)
+    return [m for m in list_months(data_dir) if hi - count < month_key(*m) <= hi]
+
+def month_path(month, data_dir='data'):
+    """Caminho do arquivo mensal de (ano, 'mês')."""
+    year, month_name_lower = month
+    return os.path.join(data_dir, str(year), f"{month_name_lower}.csv")
+
+def range_version(months, data_dir='data'):
+    """Versão de um intervalo: (mtime, tamanho) de cada arquivo mensal que ele toca."""
+    return tuple((m, file_version(month_path(m, data_dir))) for m in months)
+
+def load_months(months, reader=read_file, data_dir='data', on_error=None, workers=None):
+    """Lê SÓ os arquivos mensais da lista e concatena (linhas de agentes, em ordem cronológica)."""
+    months = sorted(months, key=lambda m: month_key(*m))
+    paths = [month_path(m, data_dir) for m in months]
+    results = read_many(paths, 'mensal', reader, workers)
+
+    df_list = []
+    for (year, month_name_lower), (df_temp, error) in zip(months, results):
+        if error is not None:
+            if on_error:
+                on_error(f"{year}/{month_name_lower}.csv", error)
+            continue
+        if 'Agente' not in df_temp.columns:
+            continue
+        df_temp = agent_rows(annotate_month(df_temp, month_name_lower, year))
+        if not df_temp.empty:
+            df_list.append(df_temp)
+
+    if not df_list: return pd.DataFrame()
+    return apply_dtypes(pd.concat(df_list, ignore_index=True), 'mensal')
+
+
+# --- Semanas ISO calculadas a partir dos diários ---
+# Uma semana (ano ISO, número) junta os arquivos diários dos seus 7 dias, que podem
+# estar em duas pastas de mês (ou de ano). A versão da semana é a dos arquivos
+# dela: quando chega um dia novo, só a semana desse dia muda de versão.
+
+def day_date(filename, month_name_lower, year):
+    """Data de um arquivo diário 'DD.MM.csv' de data/[ANO]/[mês]/ (o mês vem da pasta), ou None."""
+    try:
+        return datetime.date(int(year), MESES_ORDER.index(month_name_lower) + 1, int(filename.split('.')[0]))
+    except ValueError:
+        return None
+
+def list_days(data_dir='data', until=None):
+    """Arquivos diários de toda a árvore: [(data, caminho, mês, ano)] em ordem de data (até `until`)."""
+    days = []
+    if not os.path.isdir(data_dir):
+        return days
+    for year in os.listdir(data_dir):
+        if not year.isdigit():
+            continue
+        for month_name_lower in MESES_ORDER:
+            folder = os.path.join(data_dir, year, month_name_lower)
+            for filename in list_csv(folder):
+                date = day_date(filename, month_name_lower, year)
+                if date is not None and (until is None or date <= until):
+                    days.append((date, os.path.join(folder, filename), month_name_lower, year))
+    return sorted(days)
+
+def iso_week(date):
+    """(ano ISO, semana) de uma data."""
+    iso = date.isocalendar()
+    return (iso[0], iso[1])
+
+def week_label(iso_year, week):
+    """'Semana 12/2026 (16/03 a 22/03)'."""
+    monday = datetime.date.fromisocalendar(iso_year, week, 1)
+    sunday = monday + datetime.timedelta(days=6)
+    return f"Semana {week:02d}/{iso_year} ({monday:%d/%m} a {sunday:%d/%m})"
+
+def list_weeks(data_dir='data'):
+    """Semanas ISO que têm pelo menos um arquivo diário, em ordem."""
+    return sorted({iso_week(date) for date, _, _, _ in list_days(data_dir)})
+
+def current_weeks(data_dir='data', until=None):
+    """(semana atual, semana anterior): a atual é a do dia mais recente com arquivo (até `until`)."""
+    days = list_days(data_dir, until)
+    if not days:
+        return None, None
+    latest = days[-1][0]
+    return iso_week(latest), iso_week(latest - datetime.timedelta(days=7))
+
+def week_files(iso_year, week, data_dir='data'):
+    """Arquivos diários da semana: [(data, caminho, mês, ano)], lendo só as pastas dos meses dela."""
+    dates = {datetime.date.fromisocalendar(iso_year, week, d) for d in range(1, 8)}
+    files = []
+    for year, month_num in sorted({(d.year, d.month) for d in dates}):
+        month_name_lower = MESES_ORDER[month_num - 1]
+        folder = os.path.join(data_dir, str(year), month_name_lower)
+        for filename in list_csv(folder):
+            date = day_date(filename, month_name_lower, year)
+            if date in dates:
+                files.append((date, os.path.join(folder, filename), month_name_lower, str(year)))
+    return sorted(files)
+
+def week_version(iso_year, week, data_dir='data'):
+    """Versão da semana: (caminho, mtime, tamanho) dos seus arquivos diários."""
+    return tuple((path,) + (file_version(path) or ()) for _, path, _, _ in week_files(iso_year, week, data_dir))
+
+def load_week(iso_year, week, reader=read_file, data_dir='data', on_error=None, workers=None, rows='agentes'):
+    """Lê os diários da semana pelo mesmo pipeline de load_folder (Dia, DaySort e Data anotados)."""
+    select = {'agentes': agent_rows, 'equipe': team_rows, 'todas': lambda df: df}[rows]
+    files = week_files(iso_year, week, data_dir)
+    results = read_many([path for _, path, _, _ in files], 'diario', reader, workers)
+
+    df_list = []
+    for (_, path, month_name_lower, year), (df_temp, error) in zip(files, results):
+        filename = os.path.basename(path)
+        try:
+            if error is not None:
+                raise error
+            df_temp = select(annotate_day(df_temp, filename, month_name_lower, year))
+            if not df_temp.empty:
+                df_list.append(df_temp)
+        except Exception as e:
+            if on_error:
+                on_error(f"{year}/{month_name_lower}/{filename}", e)
+
+    if not df_list: return pd.DataFrame()
+    return apply_dtypes(pd.concat(df_list, ignore_index=True), 'diario')
+
+
+# --- Linha de totais da equipe ---
+# Os CSVs diários, semanais e mensais abrem com uma linha SEM agente que traz os
+# totais da equipe (Satisfação e QTD Avaliações). Ela é separada na ingestão:
+# nunca entra nas agregações por agente e vira o resumo da equipe.
+
+def is_team_row(df):
+    """Máscara das linhas sem agente (totais da equipe)."""
+    if 'Agente' not in df.columns:
+        return pd.Series(False, index=df.index)
+    agent = df['Agente']
+    return agent.isna() | (agent.astype(object).astype(str).str.strip() == '')
+
+def agent_rows(df):
+    """Só as linhas de agentes."""
+    if df.empty:
+        return df
+    return df[~is_team_row(df)]
+
+def team_rows(df):
+    """Só as linhas de totais da equipe."""
+    if df.empty:
+        return df
+    return df[is_team_row(df)]
+
+def team_totals(team):
+    """KPIs da equipe a partir das linhas de resumo (um dia, vários dias, semana ou mês).
+
+    Satisfação é a média ponderada pela QTD Avaliações de cada linha.
+    """
+    if team.empty or 'QTD Avaliacoes' not in team.columns:
+        return {}
+    weights = team['QTD Avaliacoes'].astype('float64').fillna(0.0)
+    total = weights.sum()
+    totals = {'QTD Avaliacoes': total}
+    if 'Satisfacao' in team.columns:
+        sat = team['Satisfacao'].astype('float64')
+        valid = sat.notna() & (weights > 0)
+        totals['Satisfacao'] = (sat[valid] * weights[valid]).sum() / weights[valid].sum() if valid.any() else np.nan
+    return totals
+
+
+# --- Índice por agente ---
+
+def index_by_agent(df):
+    """Ordena o frame pelo código de categoria do agente (ver agent_view)."""
+    if df.empty or 'Agente' not in df.columns:
+        return df
+    if not isinstance(df['Agente'].dtype, pd.CategoricalDtype):
+        df = df.assign(Agente=df['Agente'].astype('category'))
+    order = np.argsort(df['Agente'].cat.codes.to_numpy(), kind='stable')
+    return df.iloc[order].reset_index(drop=True)
+
+def agent_view(df, agente_name):
+    """Linhas de um agente num frame de index_by_agent: busca binária nos códigos, sem varrer as linhas."""
+    if df.empty or 'Agente' not in df.columns:
+        return pd.DataFrame()
+    agent = df['Agente']
+    try:
+        code = agent.cat.categories.get_loc(agente_name)
+    except KeyError:
+        return df.iloc[0:0]
+    codes = agent.cat.codes.to_numpy()
+    start, stop = np.searchsorted(codes, code, 'left'), np.searchsorted(codes, code, 'right')
+    return df.iloc[start:stop].reset_index(drop=True)
+
+
+# --- Relatório de memória ---
+
+def memory_report(df):
+    """Memória por coluna (strings contadas por inteiro), com a linha 'Total'."""
+    usage = df.memory_usage(deep=True)
+    report = pd.DataFrame({
+        'Tipo': [str(df[col].dtype) if col in df.columns else 'índice' for col in usage.index],
+        'Bytes': usage.to_numpy(),
+    }, index=usage.index)
+    report.loc['Total'] = ['', int(usage.sum())]
+    return report
+
+
+# --- Versões e cache por arquivo ---
+
+def file_version(path):
+    """(mtime, tamanho) do arquivo, ou None se ele não existir."""
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return (stat.st_mtime_ns, stat.st_size)
+
+def folder_version(folder):
+    """Versão de uma pasta: (nome, mtime, tamanho) de cada CSV. Muda quando chega ou muda um arquivo."""
+    return tuple((f,) + (file_version(os.path.join(folder, f)) or ()) for f in sorted(list_csv(folder)))
+
+class FileCache:
+    """Cache em memória dos arquivos já normalizados, chaveado por (caminho, mtime, tamanho).
+
+    Quando chega um CSV novo na pasta, só ele é lido; o resto do mês vem daqui.
+    """
+
+    def __init__(self, reader=read_file):
+        self._reader = reader
+        self._pieces = {}
+        self._lock = threading.Lock()
+
+    def read_file(self, path, kind):
+        """Mesma assinatura de read_file: devolve a peça em cache ou lê de novo se o arquivo mudou."""
+        key = (path, kind)
+        version = file_version(path)
+        with self._lock:
+            cached = self._pieces.get(key)
+        if cached is None or cached[0] != version:
+            df = self._reader(path, kind)
+            with self._lock:
+                self._pieces[key] = (version, df)
+        else:
+            df = cached[1]
+        # Cópia rasa: quem chama pode adicionar colunas sem alterar a peça em cache
+        return df.copy(deep=False)
+
+    def __len__(self):
+        return len(self._pieces)
+
+
+def list_csv(folder):
+    """Lista os CSVs de uma pasta em ordem de nome (vazio se a pasta não existir)."""
+    if not os.path.isdir(folder):
+        return []
+    return sorted(f for f in os.listdir(folder) if f.endswith('.csv'))
+
+def read_many(paths, kind, reader=read_file, workers=None):
+    """Lê vários arquivos, em threads se workers > 1.
+
+    Devolve [(df, erro)] na MESMA ordem de `paths`, então o resultado é
+    idêntico ao da leitura sequencial.
+    """
+    workers = READ_WORKERS if workers is None else workers
+
+    def read_one(path):
+        try:
+            return reader(path, kind), None
+        except Exception as e:
+            return None, e
+
+    if workers <= 1 or len(paths) <= 1:
+        return [read_one(path) for path in paths]
+    with ThreadPoolExecutor(max_workers=min(workers, len(paths))) as pool:
+        return list(pool.map(read_one, paths))
+
+def load_folder(folder, kind, annotate, on_error=None, reader=read_file, workers=None, rows='agentes'):
+    """Lê todos os CSVs de uma pasta pelo mesmo pipeline e concatena (em ordem de nome).
+
+    `annotate(df, filename)` adiciona as colunas derivadas do nome do arquivo
+    e pode retornar None para descartar o arquivo. `on_error(filename, exc)`
+    é chamado para cada arquivo que falhar. `reader(path, kind)` permite ler
+    de outra fonte (ex: o store compilado em store.py). A leitura usa
+    `workers` threads (padrão READ_WORKERS); anotação e concatenação seguem
+    a ordem dos arquivos. `rows` escolhe 'agentes' (padrão), 'equipe' (a
+    linha de totais de cada arquivo) ou 'todas'.
+    """
+    select = {'agentes': agent_rows, 'equipe': team_rows, 'todas': lambda df: df}[rows]
+    filenames = list_csv(folder)
+    results = read_many([os.path.join(folder, f) for f in filenames], kind, reader, workers)
+
+    df_list = []
+    for filename, (df_temp, error) in zip(filenames, results):
+        try:
+            if error is not None:
+                raise error
+            df_temp = annotate(df_temp, filename)
+            if df_temp is None:
+                continue
+            df_temp = select(df_temp)
+            if df_temp.empty:
+                continue
+            df_list.append(df_temp)
+        except Exception as e:
+            if on_error:
+                on_error(filename, e)
+            continue
+
+    if not df_list: return pd.DataFrame()
+    # Categorias diferentes entre arquivos viram object no concat: reaplica o esquema
+    return apply_dtypes(pd.concat(df_list, ignore_index=True), kind)
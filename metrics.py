@@ -0,0 +1,694 @@
+import numpy as np
+import pandas as pd
+
+# --- Cubo de agregados (agente × período × métrica) ---
+# Montado UMA vez por carga (os diários de um mês ou um intervalo de meses) e guardado
+# no cache junto com o frame. Os painéis derivam dele o total do período, a visão por
+# agente, por dia/mês e por intervalo de datas, sem refazer groupby a cada rerun.
+#
+# Cada célula guarda estatísticas suficientes (soma ponderada, peso, contagem): juntar
+# dias, semanas ou meses é só somar células, e a média sai ponderada pelo volume de
+# cada linha em vez de média de médias.
+
+# Métricas somadas (contagens) e métricas médias (tempos e taxas)
+SUM_COLS = ['QTD Atendimento', 'QTD Avaliacoes']
+MEAN_COLS = ['TMA', 'TME', 'TMIA', 'TMIC', 'FCR', 'Satisfacao', 'NPS']
+
+# Peso de cada média: tempos e FCR por atendimento, Satisfação e NPS por avaliação
+WEIGHTS = {
+    'TMA': 'QTD Atendimento', 'TME': 'QTD Atendimento', 'TMIA': 'QTD Atendimento',
+    'TMIC': 'QTD Atendimento', 'FCR': 'QTD Atendimento',
+    'Satisfacao': 'QTD Avaliacoes', 'NPS': 'QTD Avaliacoes',
+}
+
+# Ordem das métricas nos cards e tabelas do dashboard
+KPI_COLS = ['QTD Atendimento', 'TMA', 'TME', 'TMIA', 'FCR', 'Satisfacao', 'NPS', 'QTD Avaliacoes']
+
+
+class RollupCube:
+    """Estatísticas suficientes por (agente, período, métrica).
+
+    `periods` tem uma linha por período, na ordem da primeira coluna
+    (DaySort, PeriodSort); as demais colunas são rótulos (Dia, Data, Período).
+    Cada célula guarda a soma ponderada dos valores não nulos (valor × peso
+    de WEIGHTS; nas contagens, o próprio valor), a soma dos pesos e quantos
+    valores eram, então qualquer combinação de agentes e períodos sai por
+    soma de células.
+
+    Guarda também as somas acumuladas ao longo dos períodos (prefix sums):
+    o total de um intervalo contíguo [i, j) por agente é acumulado[j] -
+    acumulado[i], em O(agentes), sem varrer dias nem copiar linhas.
+    """
+
+    def __init__(self, agents, periods, metrics, sums, weights, counts, rows):
+        self.agents = agents     # pd.Index com os nomes, em ordem alfabética
+        self.periods = periods   # DataFrame com uma linha por período
+        self.metrics = metrics   # métricas presentes nos dados
+        self.sums = sums         # (agentes, períodos, métricas) soma ponderada
+        self.weights = weights   # (agentes, períodos, métricas) soma dos pesos
+        self.counts = counts     # (agentes, períodos, métricas) valores não nulos
+        self.rows = rows         # (agentes, períodos) linhas de origem
+        # (agentes, períodos + 1, ...) com um zero à frente: acumulado[:, j] = soma dos períodos < j
+        self.cumulative = tuple(
+            np.concatenate([np.zeros_like(part[:, :1]), np.cumsum(part, axis=1)], axis=1)
+            for part in (sums, weights, counts, rows)
+        )
+
+    @classmethod
+    def from_frame(cls, df, period_cols):
+        """Monta o cubo a partir das linhas de agentes (ex: _load_daily_data, _load_history_range)."""
+        metrics = [col for col in SUM_COLS + MEAN_COLS if col in df.columns]
+        period_cols = [col for col in period_cols if col in df.columns]
+        if df.empty or 'Agente' not in df.columns or not period_cols:
+            return cls(pd.Index([], dtype=object), pd.DataFrame(columns=period_cols), metrics,
+                       np.zeros((0, 0, len(metrics))), np.zeros((0, 0, len(metrics))),
+                       np.zeros((0, 0, len(metrics)), dtype=np.int32), np.zeros((0, 0), dtype=np.int32))
+
+        df = df[df['Agente'].notna()]
+        agent_codes, agents = pd.factorize(df['Agente'].astype(str), sort=True)
+
+        key = period_cols[0]
+        periods = df[period_cols].drop_duplicates(key).sort_values(key).reset_index(drop=True)
+        period_codes = np.searchsorted(periods[key].to_numpy(), df[key].to_numpy())
+
+        values = df[metrics].astype('float64').to_numpy()
+        present = ~np.isnan(values)
+        # Peso de cada valor (1 para as contagens ou se a coluna de peso não veio)
+        weight = np.ones_like(values)
+        for j, col in enumerate(metrics):
+            if WEIGHTS.get(col) in df.columns:
+                weight[:, j] = df[WEIGHTS[col]].astype('float64').fillna(0.0).to_numpy()
+        weight = np.where(present, weight, 0.0)
+        weighted = np.where(present, values, 0.0) * np.where(np.isin(metrics, SUM_COLS), 1.0, weight)
+
+        shape = (len(agents), len(periods))
+        sums = np.zeros(shape + (len(metrics),))
+        weights = np.zeros(shape + (len(metrics),))
+        counts = np.zeros(shape + (len(metrics),), dtype=np.int32)
+        rows = np.zeros(shape, dtype=np.int32)
+        np.add.at(sums, (agent_codes, period_codes), weighted)
+        np.add.at(weights, (agent_codes, period_codes), weight)
+        np.add.at(counts, (agent_codes, period_codes), present)
+        np.add.at(rows, (agent_codes, period_codes), 1)
+        return cls(pd.Index(agents, dtype=object), periods, metrics, sums, weights, counts, rows)
+
+    @property
+    def empty(self):
+        return not self.rows.any()
+
+    # --- Seleção ---
+
+    def agent_names(self):
+        """Agentes com pelo menos uma linha no cubo."""
+        return list(self.agents[self.rows.sum(axis=1) > 0])
+
+    def has_agent(self, agente_name):
+        return agente_name in self.agents
+
+    def period_range(self, start=None, end=None, col='Data'):
+        """Intervalo contíguo (slice) dos períodos com `col` entre start e end (inclusive).
+
+        Busca binária sobre os períodos, que já estão em ordem; o slice é aceito
+        por todos os roll-ups e, em total/by_agent, usa as somas acumuladas.
+        """
+        if col not in self.periods.columns:
+            return slice(0, len(self.periods))
+        values = self.periods[col].to_numpy()
+        if col == 'Data':
+            # Datas (date ou Timestamp) viram limites Timestamp: [início do dia start, início do dia seguinte a end)
+            start = None if start is None else pd.Timestamp(start).normalize().to_datetime64()
+            end = None if end is None else (pd.Timestamp(end).normalize() + pd.Timedelta(days=1)).to_datetime64()
+            hi = len(values) if end is None else int(np.searchsorted(values, end, 'left'))
+        else:
+            hi = len(values) if end is None else int(np.searchsorted(values, end, 'right'))
+        lo = 0 if start is None else int(np.searchsorted(values, start, 'left'))
+        return slice(lo, max(lo, hi))
+
+    def _select(self, agente_name=None, periods=None):
+        """Fatias (somas, pesos, contagens, linhas) do agente e dos períodos pedidos."""
+        parts = (self.sums, self.weights, self.counts, self.rows)
+        if agente_name is not None:
+            if agente_name not in self.agents:
+                return tuple(part[:0] for part in parts)
+            i = self.agents.get_loc(agente_name)
+            parts = tuple(part[i:i + 1] for part in parts)
+        if periods is not None:
+            parts = tuple(part[:, periods] for part in parts)
+        return parts
+
+    def _values(self, sums, weights, counts, metrics):
+        """Converte as estatísticas nos valores finais: soma para contagens, média ponderada para o resto."""
+        out = {}
+        for col in metrics:
+            j = self.metrics.index(col)
+            if col in SUM_COLS:
+                out[col] = sums[..., j]
+            else:
+                with np.errstate(invalid='ignore', divide='ignore'):
+                    out[col] = np.where((weights[..., j] > 0) & (counts[..., j] > 0), sums[..., j] / weights[..., j], np.nan)
+        return out
+
+    def _metrics(self, metrics):
+        return [col for col in (metrics or SUM_COLS + MEAN_COLS) if col in self.metrics]
+
+    @staticmethod
+    def _frame(data, metrics):
+        df = pd.DataFrame(data)
+        for col in metrics:
+            if col in SUM_COLS:
+                df[col] = df[col].round().astype('Int64')
+        return df
+
+    def _per_agent(self, periods=None):
+        """(somas, pesos, contagens, linhas) de cada agente somados nos períodos pedidos.
+
+        Um slice (period_range) sai das somas acumuladas; máscaras somam as células.
+        """
+        if isinstance(periods, slice):
+            start, stop, step = periods.indices(len(self.periods))
+            if step == 1:
+                stop = max(start, stop)
+                return tuple(part[:, stop] - part[:, start] for part in self.cumulative)
+        return tuple(part.sum(axis=1) for part in self._select(None, periods))
+
+    # --- Roll-ups ---
+
+    def total(self, agente_name=None, periods=None, metrics=None):
+        """Totais (dict métrica -> valor) do agente (ou de todos) nos períodos pedidos."""
+        parts = self._per_agent(periods)
+        if agente_name is not None:
+            if agente_name not in self.agents:
+                return {}
+            i = self.agents.get_loc(agente_name)
+            parts = tuple(part[i:i + 1] for part in parts)
+        sums, weights, counts, rows = parts
+        if not rows.any():
+            return {}
+        metrics = self._metrics(metrics)
+        values = self._values(sums.sum(axis=0), weights.sum(axis=0), counts.sum(axis=0), metrics)
+        return {col: float(value) for col, value in values.items()}
+
+    def by_agent(self, periods=None, metrics=None):
+        """Uma linha por agente (como groupby('Agente')) nos períodos pedidos."""
+        sums, weights, counts, rows = self._per_agent(periods)
+        metrics = self._metrics(metrics)
+        keep = rows > 0
+        values = self._values(sums[keep], weights[keep], counts[keep], metrics)
+        return self._frame({'Agente': self.agents[keep], **values}, metrics)
+
+    def by_period(self, agente_name=None, periods=None, metrics=None):
+        """Uma linha por período (dia ou mês) do agente, ou de todos somados."""
+        sums, weights, counts, rows = self._select(agente_name, periods)
+        metrics = self._metrics(metrics)
+        labels = self.periods if periods is None else self.periods[periods]
+        keep = rows.sum(axis=0) > 0
+        values = self._values(sums.sum(axis=0)[keep], weights.sum(axis=0)[keep], counts.sum(axis=0)[keep], metrics)
+        df = labels[keep].reset_index(drop=True)
+        return pd.concat([df, self._frame(values, metrics)], axis=1)
+
+    def by_agent_period(self, periods=None, metrics=None):
+        """Uma linha por (período, agente) com dados, em ordem de período e agente."""
+        sums, weights, counts, rows = self._select(None, periods)
+        metrics = self._metrics(metrics)
+        labels = self.periods if periods is None else self.periods[periods]
+        period_idx, agent_idx = np.nonzero(rows.T > 0)
+        cells = (agent_idx, period_idx)
+        values = self._values(sums[cells], weights[cells], counts[cells], metrics)
+        df = labels.iloc[period_idx].reset_index(drop=True)
+        df.insert(len(df.columns), 'Agente', self.agents[agent_idx])
+        return pd.concat([df, self._frame(values, metrics)], axis=1)
+
+
+# --- Percentis por agente (sketches mescláveis) ---
+# A média esconde a cauda (os piores dias de TMA de um agente). Cada valor diário
+# cai num balde logarítmico fixo (como no DDSketch): o balde i cobre
+# (gamma^(i-1), gamma^i], com gamma = (1 + a) / (1 - a), e devolve um valor com
+# erro relativo de no máximo a. Como os baldes são os mesmos para todos, juntar
+# dias, meses ou agentes é só somar contagens, e o percentil de um intervalo
+# sai das contagens acumuladas, sem reler os dias.
+
+QUANTILE_COLS = ['TMA', 'TME', 'TMIA', 'FCR', 'Satisfacao']
+QUANTILES = (0.5, 0.9, 0.99)
+
+# Faixa válida das métricas: o valor do balde pode passar um pouco do teto (ex: 5,05 de Satisfação)
+METRIC_BOUNDS = {'FCR': (0.0, 1.0), 'Satisfacao': (0.0, 5.0), 'TMA': (0.0, None), 'TME': (0.0, None), 'TMIA': (0.0, None)}
+
+# Erro relativo dos baldes e faixa coberta (abaixo de SKETCH_MIN conta como zero)
+SKETCH_ACCURACY = 0.02
+SKETCH_MIN, SKETCH_MAX = 1e-2, 1e3
+
+
+def _prefix_sums(counts):
+    """Contagens acumuladas ao longo do eixo dos períodos, com um zero à frente."""
+    return np.concatenate([np.zeros_like(counts[:, :1]), np.cumsum(counts, axis=1, dtype=counts.dtype)], axis=1)
+
+
+class QuantileCube:
+    """Contagens por (agente, período, métrica, balde) dos valores de cada linha.
+
+    Guarda só as contagens acumuladas ao longo dos períodos (com um zero à
+    frente, como em RollupCube): qualquer intervalo contíguo de dias sai por
+    diferença, e as contagens de cada período por diferença de vizinhos.
+    As contagens são uint16 (cada linha soma 1 num balde), o que basta para
+    anos de diários por agente.
+
+    Valores no limite superior de METRIC_BOUNDS (FCR 100%, satisfação 5)
+    têm um balde próprio, cujo representante é o próprio limite: um p90 de
+    100% sai 100%, e não o representante do balde vizinho (~98%). O mínimo e
+    o máximo de cada (agente, período, métrica) também ficam guardados, e o
+    percentil sai preso entre eles.
+    """
+
+    gamma = (1 + SKETCH_ACCURACY) / (1 - SKETCH_ACCURACY)
+    offset = int(np.ceil(np.log(SKETCH_MIN) / np.log(gamma)))
+    buckets = int(np.ceil(np.log(SKETCH_MAX) / np.log(gamma))) - offset + 3 # + o balde do zero e o do limite
+
+    def __init__(self, agents, periods, metrics, cumulative, lows, highs):
+        self.agents = agents           # pd.Index com os nomes, em ordem alfabética
+        self.periods = periods         # DataFrame com uma linha por período
+        self.metrics = metrics         # métricas presentes nos dados
+        self.cumulative = cumulative   # (agentes, períodos + 1, métricas, baldes)
+        self.lows = lows               # (agentes, períodos, métricas): menor valor (+inf sem valores)
+        self.highs = highs             # (agentes, períodos, métricas): maior valor (-inf sem valores)
+
+    @classmethod
+    def _empty(cls, periods, metrics):
+        return cls(pd.Index([], dtype=object), periods, metrics,
+                   np.zeros((0, 1, len(metrics), cls.buckets), dtype=np.uint16),
+                   np.full((0, 0, len(metrics)), np.inf, dtype=np.float32),
+                   np.full((0, 0, len(metrics)), -np.inf, dtype=np.float32))
+
+    @classmethod
+    def bucket_of(cls, values, upper=None):
+        """Balde de cada valor (0 para zero, negativos e valores abaixo de SKETCH_MIN; o último para >= upper)."""
+        with np.errstate(divide='ignore', invalid='ignore'):
+            index = np.ceil(np.log(values) / np.log(cls.gamma)) - cls.offset + 1
+        index = np.where(values >= SKETCH_MIN, index, 0)
+        index = np.clip(np.nan_to_num(index), 0, cls.buckets - 2)
+        if upper is not None:
+            index = np.where(values >= upper, cls.buckets - 1, index)
+        return index.astype(np.intp)
+
+    @classmethod
+    def bucket_values(cls, metric=None):
+        """Valor representativo de cada balde (erro relativo <= SKETCH_ACCURACY; o último é o limite da métrica)."""
+        k = np.arange(cls.buckets) - 1 + cls.offset
+        values = 2 * cls.gamma ** k / (cls.gamma + 1)
+        values[0] = 0.0
+        upper = METRIC_BOUNDS.get(metric, (None, None))[1]
+        values[-1] = values[-2] if upper is None else upper
+        return values
+
+    @classmethod
+    def from_frame(cls, df, period_cols):
+        """Monta as contagens a partir das linhas de agentes, com os mesmos períodos de RollupCube.from_frame."""
+        metrics = [col for col in QUANTILE_COLS if col in df.columns]
+        period_cols = [col for col in period_cols if col in df.columns]
+        if df.empty or 'Agente' not in df.columns or not period_cols:
+            return cls._empty(pd.DataFrame(columns=period_cols), metrics)
+
+        df = df[df['Agente'].notna()]
+        agent_codes, agents = pd.factorize(df['Agente'].astype(str), sort=True)
+
+        key = period_cols[0]
+        periods = df[period_cols].drop_duplicates(key).sort_values(key).reset_index(drop=True)
+        period_codes = np.searchsorted(periods[key].to_numpy(), df[key].to_numpy())
+
+        counts = np.zeros((len(agents), len(periods), len(metrics), cls.buckets), dtype=np.uint16)
+        lows = np.full((len(agents), len(periods), len(metrics)), np.inf, dtype=np.float32)
+        highs = np.full_like(lows, -np.inf)
+        for j, col in enumerate(metrics):
+            values = df[col].astype('float64').to_numpy()
+            present = ~np.isnan(values)
+            cell = (agent_codes[present], period_codes[present], j)
+            upper = METRIC_BOUNDS.get(col, (None, None))[1]
+            np.add.at(counts, cell + (cls.bucket_of(values[present], upper),), 1)
+            np.minimum.at(lows, cell, values[present])
+            np.maximum.at(highs, cell, values[present])
+        return cls(pd.Index(agents, dtype=object), periods, metrics, _prefix_sums(counts), lows, highs)
+
+    @classmethod
+    def concat(cls, cubes):
+        """Junta cubos de períodos consecutivos (ex: os meses de um intervalo) num só, alinhando os agentes."""
+        cubes = [cube for cube in cubes if len(cube.agents)]
+        if not cubes:
+            return cls._empty(pd.DataFrame(), list(QUANTILE_COLS))
+        agents = pd.Index(sorted(set().union(*(cube.agents for cube in cubes))), dtype=object)
+        metrics = [col for col in QUANTILE_COLS if any(col in cube.metrics for cube in cubes)]
+        parts, lows, highs = [], [], []
+        for cube in cubes:
+            counts = np.zeros((len(agents), len(cube.periods), len(metrics), cls.buckets), dtype=np.uint16)
+            low = np.full(counts.shape[:3], np.inf, dtype=np.float32)
+            high = np.full_like(low, -np.inf)
+            rows = agents.get_indexer(cube.agents)
+            for j, col in enumerate(cube.metrics):
+                counts[rows, :, metrics.index(col)] = np.diff(cube.cumulative[:, :, j], axis=1)
+                low[rows, :, metrics.index(col)] = cube.lows[:, :, j]
+                high[rows, :, metrics.index(col)] = cube.highs[:, :, j]
+            parts.append(counts)
+            lows.append(low)
+            highs.append(high)
+        periods = pd.concat([cube.periods for cube in cubes], ignore_index=True)
+        return cls(agents, periods, metrics, _prefix_sums(np.concatenate(parts, axis=1)),
+                   np.concatenate(lows, axis=1), np.concatenate(highs, axis=1))
+
+    @property
+    def empty(self):
+        return not self.cumulative[:, -1].any()
+
+    def _counts(self, periods=None):
+        """(agentes, métricas, baldes) somados num intervalo contíguo de períodos (slice de period_range)."""
+        start, stop, _ = (slice(None) if periods is None else periods).indices(len(self.periods))
+        stop = max(start, stop)
+        return self.cumulative[:, stop] - self.cumulative[:, start]
+
+    def _extremes(self, periods=None):
+        """(menores, maiores) valores por (agente, métrica) no mesmo intervalo de _counts."""
+        start, stop, _ = (slice(None) if periods is None else periods).indices(len(self.periods))
+        stop = max(start, stop)
+        lows, highs = self.lows[:, start:stop], self.highs[:, start:stop]
+        if stop == start:
+            return np.full((len(self.agents), len(self.metrics)), np.inf), np.full((len(self.agents), len(self.metrics)), -np.inf)
+        return lows.min(axis=1), highs.max(axis=1)
+
+    @classmethod
+    def _quantiles(cls, counts, qs, metric=None, low=None, high=None):
+        """Percentis (..., len(qs)) a partir das contagens (..., baldes); NaN onde não há valores.
+
+        low/high (...): menor e maior valor observados, que limitam o representante do balde.
+        """
+        cum = np.cumsum(counts, axis=-1, dtype=np.int64)
+        total = cum[..., -1:]
+        values = cls.bucket_values(metric)
+        out = []
+        for q in qs:
+            # Posto mais próximo (ceil(q * n) - 1, entre 0 e n - 1) e o primeiro balde que o alcança:
+            # com poucos dias, o p90/p99 já é o pior dia, e não o mesmo valor do p50
+            rank = np.maximum(np.ceil(q * total) - 1, 0)
+            index = np.argmax(cum > rank, axis=-1)
+            out.append(np.where(total[..., 0] > 0, values[index], np.nan))
+        out = np.stack(out, axis=-1)
+        if low is not None:
+            out = np.clip(out, np.asarray(low, dtype='float64')[..., None], np.asarray(high, dtype='float64')[..., None])
+        if metric in METRIC_BOUNDS:
+            out = np.clip(out, *METRIC_BOUNDS[metric])
+        return out
+
+    def quantiles(self, agente_name=None, periods=None, metrics=None, qs=QUANTILES):
+        """Percentis por métrica (linhas 'p50', 'p90', ...) do agente, ou de todos juntos, nos períodos pedidos."""
+        counts = self._counts(periods)
+        lows, highs = self._extremes(periods)
+        if agente_name is not None:
+            if agente_name not in self.agents:
+                return pd.DataFrame()
+            i = self.agents.get_loc(agente_name)
+            counts, lows, highs = counts[i], lows[i], highs[i]
+        else:
+            counts, lows, highs = counts.sum(axis=0), lows.min(axis=0), highs.max(axis=0)
+        metrics = [col for col in (metrics or self.metrics) if col in self.metrics]
+        values = {}
+        for col in metrics:
+            j = self.metrics.index(col)
+            values[col] = self._quantiles(counts[j], qs, col, lows[j], highs[j])
+        return pd.DataFrame(values, index=[f"p{q * 100:g}" for q in qs], columns=metrics)
+
+    def by_agent(self, metric, periods=None, qs=QUANTILES):
+        """Uma linha por agente com valores no período: Agente e os percentis ('p50', 'p90', ...) da métrica."""
+        columns = ['Agente'] + [f"p{q * 100:g}" for q in qs]
+        if metric not in self.metrics:
+            return pd.DataFrame(columns=columns)
+        j = self.metrics.index(metric)
+        counts = self._counts(periods)[:, j]
+        lows, highs = self._extremes(periods)
+        keep = counts.sum(axis=-1) > 0
+        values = self._quantiles(counts[keep], qs, metric, lows[keep, j], highs[keep, j])
+        return pd.DataFrame({'Agente': self.agents[keep], **dict(zip(columns[1:], values.T))})
+
+
+# --- Distribuição das notas (notas/) ---
+# As avaliações (uma linha por protocolo) viram, na carga, contagens por agente,
+# dia e nota. A distribuição de um agente ou da equipe num mês ou intervalo sai
+# das contagens acumuladas, sem guardar nem varrer as linhas de cada agente.
+
+class ScoreCube:
+    """Histograma de notas por (agente, período), como contagens acumuladas ao longo dos períodos."""
+
+    def __init__(self, agents, periods, scores, cumulative):
+        self.agents = agents           # pd.Index com os nomes, em ordem alfabética
+        self.periods = periods         # DataFrame com uma linha por período
+        self.scores = scores           # notas possíveis (0 até a maior vista)
+        self.cumulative = cumulative   # (agentes, períodos + 1, notas)
+
+    period_range = RollupCube.period_range
+
+    @classmethod
+    def from_frame(cls, df, period_cols, col='Nota'):
+        """Monta as contagens a partir das avaliações (ex: _load_evaluation_data)."""
+        period_cols = [c for c in period_cols if c in df.columns]
+        if df.empty or 'Agente' not in df.columns or col not in df.columns or not period_cols:
+            return cls(pd.Index([], dtype=object), pd.DataFrame(columns=period_cols), np.arange(0),
+                       np.zeros((0, 1, 0), dtype=np.int32))
+
+        values = df[col].astype('float64').to_numpy()
+        df = df[df['Agente'].notna() & (values >= 0)]
+        values = df[col].astype('float64').to_numpy().astype(np.intp)
+        agent_codes, agents = pd.factorize(df['Agente'].astype(str), sort=True)
+
+        key = period_cols[0]
+        periods = df[period_cols].drop_duplicates(key).sort_values(key).reset_index(drop=True)
+        period_codes = np.searchsorted(periods[key].to_numpy(), df[key].to_numpy())
+
+        scores = np.arange(values.max() + 1 if len(values) else 0)
+        counts = np.zeros((len(agents), len(periods), len(scores)), dtype=np.int32)
+        np.add.at(counts, (agent_codes, period_codes, values), 1)
+        return cls(pd.Index(agents, dtype=object), periods, scores, _prefix_sums(counts))
+
+    @classmethod
+    def concat(cls, cubes):
+        """Junta cubos de períodos consecutivos (ex: os meses de um intervalo), alinhando agentes e notas."""
+        cubes = [cube for cube in cubes if len(cube.agents)]
+        if not cubes:
+            return cls(pd.Index([], dtype=object), pd.DataFrame(), np.arange(0), np.zeros((0, 1, 0), dtype=np.int32))
+        agents = pd.Index(sorted(set().union(*(cube.agents for cube in cubes))), dtype=object)
+        scores = np.arange(max(len(cube.scores) for cube in cubes))
+        parts = []
+        for cube in cubes:
+            counts = np.zeros((len(agents), len(cube.periods), len(scores)), dtype=np.int32)
+            counts[agents.get_indexer(cube.agents), :, :len(cube.scores)] = np.diff(cube.cumulative, axis=1)
+            parts.append(counts)
+        periods = pd.concat([cube.periods for cube in cubes], ignore_index=True)
+        return cls(agents, periods, scores, _prefix_sums(np.concatenate(parts, axis=1)))
+
+    @property
+    def empty(self):
+        return not self.cumulative[:, -1].any()
+
+    def counts(self, agente_name=None, periods=None):
+        """Avaliações por nota do agente (ou da equipe) num intervalo contíguo de períodos."""
+        start, stop, _ = (slice(None) if periods is None else periods).indices(len(self.periods))
+        counts = self.cumulative[:, max(start, stop)] - self.cumulative[:, start]
+        if agente_name is None:
+            return counts.sum(axis=0)
+        if agente_name not in self.agents:
+            return np.zeros(len(self.scores), dtype=np.int32)
+        return counts[self.agents.get_loc(agente_name)]
+
+    def histogram(self, agente_name=None, periods=None):
+        """Uma linha por nota: Nota, Avaliações e % do total."""
+        counts = self.counts(agente_name, periods)
+        total = counts.sum()
+        return pd.DataFrame({
+            'Nota': self.scores,
+            'Avaliações': counts,
+            '%': counts / total * 100 if total else np.zeros(len(counts)),
+        })
+
+    def summary(self, agente_name=None, periods=None):
+        """Totais (dict): Avaliações, Nota média e % de notas 0."""
+        counts = self.counts(agente_name, periods)
+        total = int(counts.sum())
+        if not total:
+            return {}
+        return {
+            'Avaliações': total,
+            'Nota média': float((counts * self.scores).sum() / total),
+            'Notas 0 (%)': float(counts[0] / total * 100),
+        }
+
+
+# --- Alertas diários (janela móvel por agente) ---
+# Cada dia novo é comparado com o "normal" recente do próprio agente: média ± k
+# desvios dos seus últimos N dias com valor. O estado é fixo por agente e métrica
+# (os N últimos valores num buffer circular, mais soma e soma dos quadrados), e
+# cada dia custa O(1) por agente: nada do histórico é relido.
+
+ALERT_COLS = ['FCR', 'Satisfacao', 'TMA']
+ALERT_WINDOW = 14       # dias com valor na janela de cada agente
+ALERT_K = 2.0           # desvios-padrão de tolerância
+ALERT_MIN_PERIODS = 7   # dias mínimos na janela antes de alertar
+
+
+class RollingAlerts:
+    """Estatísticas móveis incrementais por (agente, métrica) e os alertas de cada dia.
+
+    Os dias entram em ordem com push(); um dia mais antigo que o último já
+    processado exige começar de novo (novo objeto).
+    """
+
+    def __init__(self, metrics=ALERT_COLS, window=ALERT_WINDOW, k=ALERT_K, min_periods=ALERT_MIN_PERIODS):
+        self.metrics = list(metrics)
+        self.window = window
+        self.k = k
+        self.min_periods = min_periods
+        self.last_date = None
+        self.agents = {}   # nome -> linha dos arrays
+        shape = (0, len(self.metrics))
+        self.ring = np.zeros(shape + (window,))    # últimos valores (buffer circular)
+        self.pos = np.zeros(shape, dtype=np.intp)  # próxima posição do buffer
+        self.count = np.zeros(shape, dtype=np.intp)
+        self.sum = np.zeros(shape)
+        self.sumsq = np.zeros(shape)
+        self.alerts = {}   # data -> lista de alertas do dia
+
+    def _rows(self, names):
+        """Linha de cada agente, abrindo espaço para os que aparecem pela primeira vez."""
+        new = [name for name in dict.fromkeys(names) if name not in self.agents]
+        if new:
+            start = len(self.agents)
+            self.agents.update((name, start + i) for i, name in enumerate(new))
+            grow = lambda part: np.concatenate([part, np.zeros((len(new),) + part.shape[1:], dtype=part.dtype)])
+            self.ring, self.pos, self.count, self.sum, self.sumsq = map(grow, (self.ring, self.pos, self.count, self.sum, self.sumsq))
+        return np.array([self.agents[name] for name in names], dtype=np.intp)
+
+    def push(self, date, df):
+        """Processa as linhas de agentes de um dia: gera os alertas e só então atualiza as janelas."""
+        if self.last_date is not None and date <= self.last_date:
+            raise ValueError(f"Dia {date} não é posterior ao último processado ({self.last_date}).")
+        self.last_date = date
+        day_alerts = []
+        metrics = [col for col in self.metrics if col in df.columns]
+        if df.empty or 'Agente' not in df.columns or not metrics:
+            self.alerts[date] = day_alerts
+            return day_alerts
+
+        df = df[df['Agente'].notna()].drop_duplicates('Agente')
+        names = df['Agente'].astype(str).to_numpy()
+        rows = self._rows(list(names))
+        for col in metrics:
+            j = self.metrics.index(col)
+            x = df[col].astype('float64').to_numpy()
+            ok = ~np.isnan(x)
+            r, x, agent_names = rows[ok], x[ok], names[ok]
+
+            # Normal do agente ANTES do dia de hoje
+            n = self.count[r, j]
+            with np.errstate(invalid='ignore', divide='ignore'):
+                mean = self.sum[r, j] / n
+                std = np.sqrt(np.maximum(self.sumsq[r, j] - n * mean ** 2, 0.0) / (n - 1))
+            flagged = (n >= self.min_periods) & (np.abs(x - mean) > self.k * std)
+            # Faixa normal exibida, limitada ao que a métrica admite (ex: FCR até 100%)
+            low, high = np.clip(mean - self.k * std, *METRIC_BOUNDS.get(col, (None, None))), \
+                np.clip(mean + self.k * std, *METRIC_BOUNDS.get(col, (None, None)))
+            for i in np.flatnonzero(flagged):
+                day_alerts.append({
+                    'Data': date, 'Agente': agent_names[i], 'Métrica': col, 'Valor': x[i],
+                    'Média': mean[i], 'Mínimo': low[i], 'Máximo': high[i],
+                    'Desvios': (x[i] - mean[i]) / std[i] if std[i] > 0 else np.inf * np.sign(x[i] - mean[i]),
+                })
+
+            # Janela cheia: o valor mais antigo sai antes do novo entrar
+            full = n >= self.window
+            old = np.where(full, self.ring[r, j, self.pos[r, j]], 0.0)
+            self.sum[r, j] += x - old
+            self.sumsq[r, j] += x ** 2 - old ** 2
+            self.count[r, j] += ~full
+            self.ring[r, j, self.pos[r, j]] = x
+            self.pos[r, j] = (self.pos[r, j] + 1) % self.window
+
+        self.alerts[date] = day_alerts
+        return day_alerts
+
+    def current(self):
+        """Alertas do último dia processado (DataFrame, vazio se não houver)."""
+        columns = ['Data', 'Agente', 'Métrica', 'Valor', 'Média', 'Mínimo', 'Máximo', 'Desvios']
+        return pd.DataFrame(self.alerts.get(self.last_date, []), columns=columns)
+
+
+# --- Rankings (Top K) ---
+# Cada métrica declara o sentido (maior ou menor é melhor) e a faixa válida: valores
+# nas pontas (0%, 100%, 00:00) costumam ser agentes com pouquíssimos atendimentos e
+# ficam fora do ranking. A seleção é parcial (np.partition): só os candidatos até o
+# K-ésimo valor são ordenados, com os desempates.
+
+RANKINGS = {
+    'FCR': {'ascending': False, 'valid': (0.0, 1.0)},
+    'Satisfacao': {'ascending': False, 'valid': (0.0, 5.0)},
+    'TMIA': {'ascending': True, 'valid': (0.0, None)},
+}
+
+# Desempate (coluna, crescente?): mais atendimentos primeiro; por último, o nome
+TIEBREAKERS = [('QTD Atendimento', False)]
+
+def _ranking_keys(df, metric, spec, tiebreakers):
+    """Linhas candidatas e as chaves 'menor = melhor' (métrica, desempates..., nome)."""
+    values = df[metric].astype('float64').to_numpy()
+    ok = ~np.isnan(values)
+    lo, hi = spec.get('valid', (None, None))
+    if lo is not None:
+        ok &= values > lo
+    if hi is not None:
+        ok &= values < hi
+    rows = np.flatnonzero(ok)
+
+    def key(col, ascending):
+        k = df[col].astype('float64').fillna(0.0).to_numpy()[rows]
+        return k if ascending else -k
+
+    keys = [values[rows] if spec.get('ascending', False) else -values[rows]]
+    keys += [key(col, asc) for col, asc in tiebreakers if col in df.columns]
+    keys.append(np.unique(df['Agente'].astype(str).to_numpy()[rows], return_inverse=True)[1])
+    return rows, keys
+
+def top_k(df, metric, k=3, bottom=False, tiebreakers=TIEBREAKERS, spec=None):
+    """As K melhores (ou, com bottom=True, as K piores) linhas da métrica, com a coluna 'Posição'."""
+    columns = ['Posição', 'Agente', metric]
+    if df.empty or metric not in df.columns or 'Agente' not in df.columns or k <= 0:
+        return pd.DataFrame(columns=columns)
+    spec = spec or RANKINGS.get(metric, {'ascending': False})
+    rows, keys = _ranking_keys(df, metric, spec, tiebreakers)
+    total = len(rows)
+    if bottom:
+        keys = [-key for key in keys]
+
+    # Seleção parcial: mantém só quem empata ou supera o K-ésimo valor e ordena esses
+    if total > k:
+        threshold = np.partition(keys[0], k - 1)[k - 1]
+        keep = keys[0] <= threshold
+        rows, keys = rows[keep], [key[keep] for key in keys]
+    order = np.lexsort(keys[::-1])[:k]
+
+    board = df.iloc[rows[order]][['Agente', metric]].reset_index(drop=True)
+    positions = np.arange(1, len(board) + 1)
+    board.insert(0, 'Posição', total + 1 - positions if bottom else positions)
+    return board
+
+def agent_rank(df, metric, agente_name, tiebreakers=TIEBREAKERS, spec=None):
+    """(posição, total de ranqueados) do agente na métrica, ou None se ele não entrou no ranking.
+
+    Conta quantos agentes ficam à frente (comparação das chaves), sem ordenar.
+    """
+    if df.empty or metric not in df.columns or 'Agente' not in df.columns:
+        return None
+    spec = spec or RANKINGS.get(metric, {'ascending': False})
+    rows, keys = _ranking_keys(df, metric, spec, tiebreakers)
+    names = df['Agente'].astype(str).to_numpy()[rows]
+    mine = np.flatnonzero(names == agente_name)
+    if not len(mine):
+        return None
+    i = mine[0]
+    ahead = np.zeros(len(rows), dtype=bool)
+    tied = np.ones(len(rows), dtype=bool)
+    for key in keys:
+        ahead |= tied & (key < key[i])
+        tied &= key == key[i]
+    return int(ahead.sum()) + 1, len(rows)
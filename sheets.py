@@ -0,0 +1,523 @@
+"""Conexão única com o Google Sheets (planilha BaseFAQ).
+
+Um cliente gspread por processo, compartilhado por todas as sessões do
+Streamlit: as credenciais e o gspread.authorize rodam uma vez, e a planilha
+e as abas abertas ficam guardadas. O token OAuth é renovado sozinho pela
+sessão autorizada do google-auth; se mesmo assim a API recusar a
+autenticação, SheetsPool.call() refaz a conexão e tenta de novo uma vez.
+
+As escritas passam pela WriteQueue (write-behind): o pedido é gravado num
+diário local e respondido na hora; uma thread junta o que estiver pendente
+em um batch_update e um append_rows por aba.
+"""
+import os
+import json
+import time
+import random
+import logging
+import itertools
+import threading
+import streamlit as st
+import gspread
+from google.auth.exceptions import GoogleAuthError
+from google.oauth2.service_account import Credentials
+
+try:
+    import fcntl
+except ImportError: # Windows
+    fcntl = None
+    import msvcrt
+
+SCOPES = ["https://www.googleapis.com/auth/spreadsheets", "https://www.googleapis.com/auth/drive"]
+SPREADSHEET_NAME = "BaseFAQ"
+# Estado local que não se regenera (diário e falhas): fora do .store/, que é cache descartável
+STATE_DIR = os.environ.get('DASHBOARD_STATE_DIR', '.state')
+JOURNAL_PATH = os.environ.get('DASHBOARD_SHEETS_JOURNAL', os.path.join(STATE_DIR, 'sheets_journal.jsonl'))
+# Pedidos que a planilha recusou de vez (listados no Gerenciar Usuários do admin)
+DEAD_LETTER_PATH = os.path.join(STATE_DIR, 'sheets_falhas.jsonl')
+
+# Colunas que não vão para o diário nem para as falhas: aba -> (coluna, posição nas linhas anexadas).
+# Ficam num arquivo de senhas à parte (só o dono lê), apagado assim que os pedidos são aplicados.
+SECRET_COLUMNS = {"Usuarios": ("Senha", 1)}
+
+# Espera para juntar escritas próximas e limite do backoff entre tentativas (segundos)
+FLUSH_DELAY = 1.0
+MAX_BACKOFF = 300.0
+
+log = logging.getLogger(__name__)
+
+
+def _is_auth_error(e):
+    """Erro de credencial/token (vale reconectar), e não de dados ou permissão da aba."""
+    if isinstance(e, GoogleAuthError):
+        return True
+    return isinstance(e, gspread.exceptions.APIError) and getattr(e.response, 'status_code', None) == 401
+
+
+def _try_lock(f):
+    """Trava exclusiva, sem esperar, no arquivo aberto (False se outro processo já a tem)."""
+    try:
+        if fcntl is not None:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        else:
+            f.seek(0)
+            msvcrt.locking(f.fileno(), msvcrt.LK_NBLCK, 1)
+        return True
+    except OSError:
+        return False
+
+
+def _is_transient(e):
+    """Falha passageira (vale tentar de novo): rede, cota (429), erro do servidor (5xx) ou credencial.
+
+    O resto (aba ou coluna inexistente, 400, 403...) não melhora com o tempo.
+    """
+    if _is_auth_error(e) or isinstance(e, OSError): # Erros de rede do requests são OSError
+        return True
+    if isinstance(e, gspread.exceptions.APIError):
+        status = getattr(e.response, 'status_code', None) or 0
+        return status == 429 or status >= 500
+    return False
+
+
+class SheetsPool:
+    """Cliente gspread e handles de planilha/abas em cache, protegidos por lock."""
+
+    def __init__(self, creds_dict, spreadsheet_name=SPREADSHEET_NAME, spreadsheet_url=None):
+        self.creds_dict = dict(creds_dict)
+        # Correção obrigatória para Windows
+        if "private_key" in self.creds_dict:
+            self.creds_dict["private_key"] = self.creds_dict["private_key"].replace("\\n", "\n")
+        self.spreadsheet_name = spreadsheet_name
+        self.spreadsheet_url = spreadsheet_url
+        self._lock = threading.RLock()
+        self._client = None
+        self._spreadsheet = None
+        self._worksheets = {}
+
+    def client(self):
+        with self._lock:
+            if self._client is None:
+                creds = Credentials.from_service_account_info(self.creds_dict, scopes=SCOPES)
+                self._client = gspread.authorize(creds)
+            return self._client
+
+    def spreadsheet(self):
+        """A planilha, aberta pelo nome ou, se falhar, pela URL (uma vez por conexão)."""
+        with self._lock:
+            if self._spreadsheet is None:
+                client = self.client()
+                try:
+                    self._spreadsheet = client.open(self.spreadsheet_name)
+                except Exception:
+                    if not self.spreadsheet_url:
+                        raise
+                    self._spreadsheet = client.open_by_url(self.spreadsheet_url)
+            return self._spreadsheet
+
+    def worksheet(self, title=None):
+        """Aba pelo título (None = primeira aba), guardada depois da primeira busca."""
+        with self._lock:
+            if title not in self._worksheets:
+                sh = self.spreadsheet()
+                self._worksheets[title] = sh.sheet1 if title is None else sh.worksheet(title)
+            return self._worksheets[title]
+
+    def reset(self):
+        """Descarta cliente e handles: a próxima chamada autentica e abre tudo de novo."""
+        with self._lock:
+            self._client = None
+            self._spreadsheet = None
+            self._worksheets = {}
+
+    def call(self, title, fn):
+        """fn(aba) com a aba em cache; num erro de autenticação reconecta e tenta mais uma vez."""
+        try:
+            return fn(self.worksheet(title))
+        except Exception as e:
+            if not _is_auth_error(e):
+                raise
+            self.reset()
+            return fn(self.worksheet(title))
+
+
+@st.cache_resource
+def get_sheets():
+    """SheetsPool do processo, a partir do secrets.toml (None se não houver google_credentials)."""
+    if "google_credentials" not in st.secrets:
+        return None
+    return SheetsPool(st.secrets["google_credentials"], spreadsheet_url=st.secrets.get("spreadsheet_url"))
+
+
+class WriteQueue:
+    """Fila write-behind das escritas na planilha, com diário local durável.
+
+    Cada pedido vira uma linha JSON no diário (com fsync) antes de enqueue()
+    voltar; uma thread em segundo plano aplica os pendentes aba por aba e
+    só então os tira do diário. Se o processo cair, os pedidos do diário são
+    reenviados na próxima subida. Uma aba com falha passageira (rede, cota,
+    5xx) é tentada de novo com backoff exponencial, sem segurar as outras.
+    Numa falha permanente os pedidos da aba são aplicados um a um: os que
+    falham saem da fila para o arquivo de falhas (failed()) e os de trás
+    seguem. A entrega é "pelo menos uma vez": uma queda entre o append_rows
+    e a regravação do diário repete as linhas anexadas.
+
+    Cada processo fica com um diário só seu: o caminho pedido ou, se outro
+    processo já o travou, o primeiro "<nome>.N.jsonl" livre. A trava dura a
+    vida do processo; o diário de um processo que morreu é reenviado por
+    quem pegar a vaga dele. Senhas (SECRET_COLUMNS) não vão para o diário:
+    o pedido completo fica em "<diário>.secrets", criado com permissão 0600
+    e reescrito só com os pendentes (apagado quando não sobra nenhum). Na
+    subida, o pedido do diário é completado por ele; só se o arquivo sumiu o
+    pedido vai para as falhas, para ser refeito.
+
+    Pedidos:
+      {'op': 'append', 'sheet': aba, 'rows': [[...], ...]}
+      {'op': 'update', 'sheet': aba, 'key': valor da coluna A,
+       'values': {coluna: valor}, 'row': linha anexada se a chave não existir}
+    """
+
+    def __init__(self, pool, journal_path=JOURNAL_PATH, flush_delay=FLUSH_DELAY, dead_letter_path=DEAD_LETTER_PATH):
+        self.pool = pool
+        self._journal_lock = None
+        self.journal_path = self._claim_journal(journal_path)
+        self.secrets_path = self.journal_path + '.secrets'
+        self.dead_letter_path = dead_letter_path
+        self.flush_delay = flush_delay
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._pending = self._load_journal()
+        self._next_id = max((op['id'] for op in self._pending), default=0) + 1
+        self._failures = {}   # aba -> (tentativas, próxima tentativa); sob self._lock
+        self._headers = {}    # aba -> cabeçalho (linha 1); sob self._lock
+        self._thread = None
+        if self._pending:
+            # Pedidos que ficaram no diário (queda ou reinício): reenviados na subida
+            self._wake.set()
+            self._start()
+
+    # --- Diário ---
+
+    def _claim_journal(self, path):
+        """Trava e devolve o primeiro diário livre: path, path.1, path.2..."""
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        root, ext = os.path.splitext(path)
+        for slot in itertools.count():
+            candidate = path if slot == 0 else f"{root}.{slot}{ext}"
+            lock = open(candidate + '.lock', 'a+')
+            if _try_lock(lock):
+                self._journal_lock = lock # Aberto (e travado) enquanto o processo viver
+                return candidate
+            lock.close()
+
+    @staticmethod
+    def _redacted(op):
+        """Cópia do pedido que pode ir para o disco: sem os valores de SECRET_COLUMNS."""
+        secret = SECRET_COLUMNS.get(op['sheet'])
+        if secret is None:
+            return op
+        col, pos = secret
+        op = json.loads(json.dumps(op))
+        rows = op['rows'] if op['op'] == 'append' else [op['row']]
+        hidden = op['op'] == 'update' and col in op['values']
+        if hidden:
+            op['values'][col] = None
+        for row in rows:
+            if len(row) > pos:
+                row[pos] = None
+                hidden = True
+        if hidden:
+            op['redacted'] = True
+        return op
+
+    @staticmethod
+    def _read_lines(path):
+        """Pedidos de um arquivo JSON por linha (vazio se não existir)."""
+        ops = []
+        try:
+            with open(path, encoding='utf-8') as f:
+                for line in f:
+                    try:
+                        ops.append(json.loads(line))
+                    except ValueError:
+                        continue # Linha cortada por uma queda no meio da gravação
+        except OSError:
+            pass
+        return ops
+
+    @staticmethod
+    def _open_private(path, mode):
+        """Abre para escrita um arquivo que só o dono do processo lê (0600)."""
+        flags = os.O_WRONLY | os.O_CREAT | (os.O_APPEND if mode == 'a' else os.O_TRUNC)
+        return os.fdopen(os.open(path, flags, 0o600), mode, encoding='utf-8')
+
+    def _load_journal(self):
+        secrets = {op['id']: op for op in self._read_lines(self.secrets_path)}
+        ops, lost = [], []
+        for op in self._read_lines(self.journal_path):
+            if op.get('redacted'):
+                if op['id'] not in secrets:
+                    lost.append(op)
+                    continue
+                op = secrets[op['id']] # Pedido completo, com a senha
+            ops.append(op)
+        if lost:
+            self._dead_letter([(op, "A senha do pedido não foi encontrada em disco; refaça a operação.")
+                               for op in lost])
+        if lost or set(secrets) - {op['id'] for op in ops}:
+            self._pending = ops
+            self._rewrite_journal() # Tira do diário o que foi para as falhas e das senhas o que sobrou
+        return ops
+
+    def _append_journal(self, op):
+        redacted = self._redacted(op)
+        if redacted.get('redacted'):
+            # Senha antes do diário: uma queda entre os dois deixa só uma senha órfã, descartada na subida
+            with self._open_private(self.secrets_path, 'a') as f:
+                f.write(json.dumps(op, ensure_ascii=False) + '\n')
+                f.flush()
+                os.fsync(f.fileno())
+        with open(self.journal_path, 'a', encoding='utf-8') as f:
+            f.write(json.dumps(redacted, ensure_ascii=False) + '\n')
+            f.flush()
+            os.fsync(f.fileno())
+
+    def _rewrite_journal(self):
+        tmp_path = f"{self.journal_path}.{os.getpid()}.tmp"
+        secret_ops = []
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            for op in self._pending:
+                redacted = self._redacted(op)
+                if redacted.get('redacted'):
+                    secret_ops.append(op)
+                f.write(json.dumps(redacted, ensure_ascii=False) + '\n')
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.journal_path) # Troca atômica
+
+        if not secret_ops:
+            try:
+                os.remove(self.secrets_path) # Nenhuma senha pendente: nada fica em disco
+            except FileNotFoundError:
+                pass
+            return
+        tmp_path = f"{self.secrets_path}.{os.getpid()}.tmp"
+        with self._open_private(tmp_path, 'w') as f:
+            for op in secret_ops:
+                f.write(json.dumps(op, ensure_ascii=False) + '\n')
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.secrets_path)
+
+    # --- Pedidos ---
+
+    def enqueue(self, op):
+        """Grava o pedido no diário e devolve na hora; a planilha é atualizada em segundo plano."""
+        with self._lock:
+            op = {**op, 'id': self._next_id}
+            self._next_id += 1
+            self._append_journal(op)
+            self._pending.append(op)
+        self._start()
+        self._wake.set()
+        return op['id']
+
+    def header(self, sheet):
+        """Cabeçalho da aba, lido uma vez (None se a planilha não responder agora).
+
+        Aba inexistente levanta WorksheetNotFound já no pedido, e não depois
+        na thread, quando ninguém mais vê o erro.
+        """
+        with self._lock:
+            if sheet in self._headers:
+                return self._headers[sheet]
+        try:
+            header = self.pool.call(sheet, lambda worksheet: worksheet.row_values(1))
+        except Exception as e:
+            if _is_transient(e):
+                return None # Sem rede: a aplicação confere depois
+            raise
+        with self._lock:
+            return self._headers.setdefault(sheet, header)
+
+    def append_rows(self, sheet, rows):
+        self.header(sheet)
+        return self.enqueue({'op': 'append', 'sheet': sheet, 'rows': [list(row) for row in rows]})
+
+    def update_row(self, sheet, key, values, row):
+        header = self.header(sheet)
+        missing = sorted(set(values) - set(header)) if header is not None else []
+        if missing:
+            raise ValueError(f"Colunas inexistentes na aba {sheet}: {', '.join(missing)}")
+        return self.enqueue({'op': 'update', 'sheet': sheet, 'key': key, 'values': dict(values), 'row': list(row)})
+
+    def pending(self, sheet=None):
+        """Pedidos ainda não aplicados (da aba pedida), na ordem em que chegaram."""
+        with self._lock:
+            return [dict(op) for op in self._pending if sheet is None or op['sheet'] == sheet]
+
+    # --- Falhas permanentes ---
+
+    def _dead_letter(self, failures):
+        """Tira da fila os pedidos recusados de vez e os registra no arquivo de falhas."""
+        os.makedirs(os.path.dirname(self.dead_letter_path) or '.', exist_ok=True)
+        when = time.strftime('%Y-%m-%d %H:%M:%S')
+        with open(self.dead_letter_path, 'a', encoding='utf-8') as f:
+            for op, error in failures:
+                log.error("Pedido %s descartado na aba %s: %s", op['op'], op['sheet'], error)
+                f.write(json.dumps({'quando': when, 'erro': str(error), 'pedido': self._redacted(op)},
+                                   ensure_ascii=False) + '\n')
+            f.flush()
+            os.fsync(f.fileno())
+
+    def failed(self):
+        """Pedidos descartados por falha permanente: [{'quando', 'erro', 'pedido'}], mais antigos primeiro."""
+        entries = []
+        try:
+            with open(self.dead_letter_path, encoding='utf-8') as f:
+                for line in f:
+                    try:
+                        entries.append(json.loads(line))
+                    except ValueError:
+                        pass
+        except OSError:
+            pass
+        return entries
+
+    def clear_failed(self):
+        try:
+            os.remove(self.dead_letter_path)
+        except FileNotFoundError:
+            pass
+
+    # --- Aplicação ---
+
+    @staticmethod
+    def _apply(worksheet, ops):
+        """Aplica os pedidos de uma aba: no máximo um batch_get, um batch_update e um append_rows."""
+        header, row_of = [], {}
+        if any(op['op'] == 'update' for op in ops):
+            header_range, keys_range = worksheet.batch_get(['1:1', 'A:A'])
+            header = header_range[0] if header_range else []
+            missing = sorted({col for op in ops if op['op'] == 'update' for col in op['values']} - set(header))
+            if missing:
+                raise ValueError(f"Colunas inexistentes na aba: {', '.join(missing)}")
+            for i, cell in enumerate(keys_range, start=1):
+                if cell:
+                    row_of.setdefault(str(cell[0]).strip(), i)
+
+        cells, new_rows, new_row_of = {}, [], {}
+        for op in ops:
+            if op['op'] == 'append':
+                for row in op['rows']:
+                    if row:
+                        new_row_of.setdefault(str(row[0]).strip(), len(new_rows))
+                    new_rows.append(list(row))
+            elif op['key'] in row_of:
+                for col, value in op['values'].items():
+                    cells[(row_of[op['key']], header.index(col) + 1)] = value
+            elif op['key'] in new_row_of:
+                # Linha ainda na fila: altera antes de anexar
+                row = new_rows[new_row_of[op['key']]]
+                for col, value in op['values'].items():
+                    j = header.index(col)
+                    row.extend([''] * (j + 1 - len(row)))
+                    row[j] = value
+            else:
+                new_row_of[op['key']] = len(new_rows)
+                new_rows.append(list(op['row']))
+
+        # Atualizações primeiro: repetir um batch_update não muda nada
+        if cells:
+            worksheet.batch_update([{'range': gspread.utils.rowcol_to_a1(r, c), 'values': [[value]]}
+                                    for (r, c), value in sorted(cells.items())])
+        if new_rows:
+            worksheet.append_rows(new_rows)
+
+    def flush(self):
+        """Aplica os pendentes de cada aba (as que estão em backoff esperam a vez)."""
+        with self._lock:
+            by_sheet = {}
+            for op in self._pending:
+                by_sheet.setdefault(op['sheet'], []).append(op)
+            failures = dict(self._failures)
+
+        now = time.monotonic()
+        for sheet, ops in by_sheet.items():
+            attempts, retry_at = failures.get(sheet, (0, 0.0))
+            if now < retry_at:
+                continue
+            done, dead, error = self._flush_sheet(sheet, ops)
+            if error is not None:
+                delay = min(MAX_BACKOFF, 2 ** attempts) * (1 + random.random() / 2)
+                with self._lock:
+                    self._failures[sheet] = (attempts + 1, time.monotonic() + delay)
+                log.warning("Falha ao gravar %d pedido(s) na aba %s (nova tentativa em %.0fs): %s",
+                            len(ops) - len(done) - len(dead), sheet, delay, error)
+            else:
+                with self._lock:
+                    self._failures.pop(sheet, None)
+            if not done and not dead:
+                continue
+            if dead:
+                self._dead_letter(dead)
+            finished = {op['id'] for op in done} | {op['id'] for op, _ in dead}
+            with self._lock:
+                self._pending = [op for op in self._pending if op['id'] not in finished]
+                self._rewrite_journal()
+
+    def _flush_sheet(self, sheet, ops):
+        """Aplica os pedidos de uma aba; devolve (aplicados, [(descartado, erro)], falha passageira ou None).
+
+        Tenta tudo num lote; numa falha permanente refaz pedido a pedido, para
+        que só o pedido com problema saia da fila.
+        """
+        try:
+            self.pool.call(sheet, lambda worksheet: self._apply(worksheet, ops))
+            return ops, [], None
+        except Exception as e:
+            if _is_transient(e):
+                return [], [], e
+        with self._lock:
+            self._headers.pop(sheet, None) # A aba pode ter mudado
+
+        done, dead = [], []
+        for op in ops:
+            try:
+                self.pool.call(sheet, lambda worksheet: self._apply(worksheet, [op]))
+            except Exception as e:
+                if _is_transient(e):
+                    return done, dead, e # O resto espera o backoff
+                dead.append((op, e))
+                continue
+            done.append(op)
+        return done, dead, None
+
+    def _run(self):
+        while True:
+            self._wake.wait(timeout=MAX_BACKOFF)
+            time.sleep(self.flush_delay) # Junta os pedidos que chegam em rajada
+            self._wake.clear()
+            self.flush()
+            with self._lock:
+                waiting = bool(self._pending)
+                retry_at = min((t for _, t in self._failures.values()), default=time.monotonic())
+            if waiting:
+                # Sobrou pendente (aba em backoff): acorda quando a primeira puder tentar de novo
+                self._wake.wait(timeout=max(0.0, retry_at - time.monotonic()))
+                self._wake.set()
+
+    def _start(self):
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name='sheets-write-queue', daemon=True)
+                self._thread.start()
+
+
+@st.cache_resource
+def get_write_queue():
+    """WriteQueue do processo (None se não houver conexão com a planilha)."""
+    pool = get_sheets()
+    if pool is None:
+        return None
+    return WriteQueue(pool)
@@ -0,0 +1,349 @@
+"""Armazenamento de usuários, FAQ e novas perguntas.
+
+Uma interface (Storage) com duas implementações:
+
+- SheetsStorage: a planilha BaseFAQ, pelo SheetsPool do processo; as escritas
+  vão pela WriteQueue (write-behind).
+- SQLiteStorage: um arquivo SQLite local (embutido, sem rede). Pode ter a
+  planilha como espelho: cada escrita é gravada no SQLite e repassada à
+  SheetsStorage, que a aplica em segundo plano.
+
+CachedStorage fica na frente de qualquer uma das duas e guarda o FAQ em
+memória por `ttl` segundos (read-through). Os usuários passam direto: o
+cache deles é o diretório em memória do auth.py (UserDirectory).
+
+O backend principal vem de DASHBOARD_STORAGE (ou `storage` no secrets.toml):
+"sheets" (padrão) ou "sqlite". Com "sqlite" o app roda e pode ser testado
+sem rede; se houver google_credentials, a planilha vira o espelho e, na
+primeira subida com o banco vazio, usuários e FAQ são copiados dela.
+"""
+import os
+import json
+import logging
+import sqlite3
+import threading
+import time
+from contextlib import closing
+import streamlit as st
+import gspread
+from sheets import STATE_DIR, get_sheets, get_write_queue
+
+USERS_SHEET = "Usuarios"
+USERS_COLUMNS = ['Usuario', 'Senha', 'Nome', 'Funcao', 'PrimeiroAcesso']
+QUESTIONS_SHEET = "Novas_Perguntas"
+QUESTIONS_COLUMNS = ['Data', 'Pergunta', 'Usuario']
+
+# Banco principal no modo sqlite: junto do estado local (STATE_DIR), nunca no .store/, que é cache
+SQLITE_PATH = os.environ.get('DASHBOARD_SQLITE', os.path.join(STATE_DIR, 'dashboard.db'))
+
+# Tempo (segundos) que as leituras ficam no cache em memória
+STORAGE_TTL = 300
+# Intervalo (segundos) entre as atualizações do FAQ local a partir da planilha, no modo sqlite
+FAQ_REFRESH = 300
+
+log = logging.getLogger(__name__)
+
+
+class StorageError(Exception):
+    """Falha do armazenamento que vale mostrar ao usuário (ex.: aba inexistente)."""
+
+
+class Storage:
+    """Operações do app sobre usuários, FAQ e novas perguntas.
+
+    Usuários são dicionários com as colunas de USERS_COLUMNS (valores em
+    texto); linhas de escrita seguem a ordem dessas colunas.
+    """
+
+    def users(self):
+        """Lista de registros de usuários."""
+        raise NotImplementedError
+
+    def update_user(self, username, values, row):
+        """Altera as colunas `values` do usuário; se ele não existir, grava `row`."""
+        raise NotImplementedError
+
+    def add_users(self, rows):
+        """Cadastra usuários novos (linhas na ordem de USERS_COLUMNS)."""
+        raise NotImplementedError
+
+    def faq(self):
+        """Lista de registros do FAQ (colunas livres, ex.: Pergunta e Resposta)."""
+        raise NotImplementedError
+
+    def add_question(self, row):
+        """Registra uma nova pergunta (linha na ordem de QUESTIONS_COLUMNS)."""
+        raise NotImplementedError
+
+
+class SheetsStorage(Storage):
+    """Planilha BaseFAQ: leituras pelo SheetsPool, escritas pela WriteQueue."""
+
+    def __init__(self, pool, queue):
+        self.pool = pool
+        self.queue = queue
+
+    def users(self):
+        records = self.pool.call(USERS_SHEET, lambda worksheet: worksheet.get_all_records())
+        return self._with_pending(records)
+
+    def _with_pending(self, records):
+        """Registros da aba com as escritas ainda na fila aplicadas por cima."""
+        records = [dict(row) for row in records]
+        by_user = {str(row.get('Usuario', '')).strip(): row for row in records}
+        for op in self.queue.pending(USERS_SHEET):
+            if op['op'] == 'update' and op['key'] in by_user:
+                by_user[op['key']].update(op['values'])
+                continue
+            for row in (op['rows'] if op['op'] == 'append' else [op['row']]):
+                record = dict(zip(USERS_COLUMNS, row))
+                by_user[str(record.get('Usuario', '')).strip()] = record
+                records.append(record)
+        return records
+
+    def update_user(self, username, values, row):
+        self.queue.update_row(USERS_SHEET, username, values, row)
+
+    def add_users(self, rows):
+        self.queue.append_rows(USERS_SHEET, rows)
+
+    def faq(self):
+        return self.pool.call(None, lambda worksheet: worksheet.get_all_records()) # Primeira aba
+
+    def add_question(self, row):
+        try:
+            self.pool.worksheet(QUESTIONS_SHEET) # Handle em cache: só confere que a aba existe
+        except gspread.exceptions.WorksheetNotFound:
+            raise StorageError(f"Crie uma aba chamada '{QUESTIONS_SHEET}' na sua planilha!")
+        self.queue.append_rows(QUESTIONS_SHEET, [row])
+
+
+class SQLiteStorage(Storage):
+    """Banco SQLite local, com a planilha opcionalmente como espelho assíncrono.
+
+    Cada operação abre a sua conexão (o sqlite3 não compartilha conexões
+    entre threads) e o banco fica em modo WAL, então leituras de várias
+    sessões não esperam as escritas. Falhas do espelho só vão para o log: a
+    escrita local já valeu.
+
+    O FAQ é editado na planilha, mas faq() sempre responde com a tabela
+    local; com espelho, uma thread traz a versão da planilha a cada
+    `faq_refresh` segundos (refresh_faq) e avisa os `listeners` (o cache
+    na frente) quando a tabela muda.
+    """
+
+    def __init__(self, path=SQLITE_PATH, mirror=None, faq_refresh=FAQ_REFRESH):
+        self.path = path
+        self.mirror = mirror
+        self.faq_refresh = faq_refresh
+        self.listeners = []   # chamados com o nome da leitura que mudou ('faq')
+        self._faq_lock = threading.Lock()
+        self._faq_thread = None
+        self._faq_refreshed_at = None
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        with closing(self._connect()) as conn, conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(f"CREATE TABLE IF NOT EXISTS usuarios ({USERS_COLUMNS[0]} TEXT PRIMARY KEY, "
+                         f"{', '.join(f'{col} TEXT' for col in USERS_COLUMNS[1:])})")
+            conn.execute("CREATE TABLE IF NOT EXISTS faq (id INTEGER PRIMARY KEY, dados TEXT NOT NULL)")
+            conn.execute(f"CREATE TABLE IF NOT EXISTS novas_perguntas (id INTEGER PRIMARY KEY, "
+                         f"{', '.join(f'{col} TEXT' for col in QUESTIONS_COLUMNS)})")
+
+    def _connect(self):
+        return sqlite3.connect(self.path, timeout=30)
+
+    def _mirror(self, method, *args):
+        if self.mirror is None:
+            return
+        try:
+            getattr(self.mirror, method)(*args)
+        except Exception as e:
+            log.warning("Falha ao espelhar %s na planilha: %s", method, e)
+
+    def is_empty(self):
+        with closing(self._connect()) as conn:
+            return conn.execute("SELECT NOT EXISTS (SELECT 1 FROM usuarios)").fetchone()[0] == 1
+
+    # --- Usuários ---
+
+    def users(self):
+        with closing(self._connect()) as conn:
+            cursor = conn.execute(f"SELECT {', '.join(USERS_COLUMNS)} FROM usuarios")
+            return [dict(zip(USERS_COLUMNS, row)) for row in cursor]
+
+    def _insert_users(self, conn, rows):
+        """Insere as linhas cujo usuário ainda não existe; devolve as inseridas."""
+        inserted = []
+        for row in rows:
+            row = [str(value) for value in row][:len(USERS_COLUMNS)]
+            row += [''] * (len(USERS_COLUMNS) - len(row))
+            cursor = conn.execute(f"INSERT OR IGNORE INTO usuarios VALUES ({', '.join('?' * len(USERS_COLUMNS))})", row)
+            if cursor.rowcount:
+                inserted.append(row)
+        return inserted
+
+    def update_user(self, username, values, row):
+        unknown = set(values) - set(USERS_COLUMNS)
+        if unknown:
+            raise ValueError(f"Colunas desconhecidas: {sorted(unknown)}")
+        with closing(self._connect()) as conn, conn:
+            cursor = conn.execute(f"UPDATE usuarios SET {', '.join(f'{col} = ?' for col in values)} WHERE Usuario = ?",
+                                  [str(value) for value in values.values()] + [username])
+            if not cursor.rowcount:
+                self._insert_users(conn, [row])
+        self._mirror('update_user', username, values, row)
+
+    def add_users(self, rows):
+        with closing(self._connect()) as conn, conn:
+            inserted = self._insert_users(conn, rows)
+        if inserted:
+            self._mirror('add_users', inserted)
+
+    # --- FAQ e perguntas ---
+
+    def faq(self):
+        self._refresh_faq_later()
+        with closing(self._connect()) as conn:
+            return [json.loads(dados) for (dados,) in conn.execute("SELECT dados FROM faq ORDER BY id")]
+
+    def _refresh_faq_later(self):
+        """Dispara refresh_faq() numa thread se a cópia local passou de `faq_refresh` segundos."""
+        if self.mirror is None:
+            return
+        with self._faq_lock:
+            if self._faq_thread is not None and self._faq_thread.is_alive():
+                return
+            if self._faq_refreshed_at is not None and time.monotonic() - self._faq_refreshed_at < self.faq_refresh:
+                return
+            self._faq_thread = threading.Thread(target=self.refresh_faq, name='faq-refresh', daemon=True)
+            self._faq_thread.start()
+
+    def refresh_faq(self):
+        """Copia o FAQ do espelho para a tabela local; sem rede, fica a cópia que já existe."""
+        try:
+            records = self.mirror.faq()
+        except Exception as e:
+            log.warning("FAQ da planilha indisponível, mantendo a cópia local: %s", e)
+            return False
+        finally:
+            self._faq_refreshed_at = time.monotonic()
+        self.replace_faq(records)
+        for listener in self.listeners:
+            listener('faq')
+        return True
+
+    def replace_faq(self, records):
+        with closing(self._connect()) as conn, conn:
+            conn.execute("DELETE FROM faq")
+            conn.executemany("INSERT INTO faq (dados) VALUES (?)",
+                             [(json.dumps(dict(record), ensure_ascii=False),) for record in records])
+
+    def add_question(self, row):
+        with closing(self._connect()) as conn, conn:
+            conn.execute(f"INSERT INTO novas_perguntas ({', '.join(QUESTIONS_COLUMNS)}) "
+                         f"VALUES ({', '.join('?' * len(QUESTIONS_COLUMNS))})", [str(value) for value in row])
+        self._mirror('add_question', row)
+
+    def import_from(self, source):
+        """Copia usuários e FAQ de outro Storage (sem espelhar: os dados vieram de lá)."""
+        users = source.users()
+        with closing(self._connect()) as conn, conn:
+            inserted = self._insert_users(conn, [[record.get(col, '') for col in USERS_COLUMNS] for record in users])
+        self.replace_faq(source.faq())
+        self._faq_refreshed_at = time.monotonic()
+        return len(inserted)
+
+
+class CachedStorage(Storage):
+    """Cache read-through em memória na frente de outro Storage.
+
+    faq() fica guardado por `ttl` segundos, sob um lock: sessões que chegam
+    juntas esperam a mesma carga. Usuários e escritas vão direto ao backend;
+    os usuários já têm um cache só deles (auth.UserDirectory), e duas camadas
+    com TTL deixariam o dado velho por até duas vezes o prazo.
+    """
+
+    def __init__(self, backend, ttl=STORAGE_TTL):
+        self.backend = backend
+        self._ttl = ttl
+        self._locks = {'faq': threading.Lock()}
+        self._values = {}   # leitura -> (momento da carga, registros)
+        if hasattr(backend, 'listeners'):
+            backend.listeners.append(self.invalidate) # Mudança feita pelo próprio backend (ex.: FAQ atualizado)
+
+    def _read(self, name):
+        with self._locks[name]:
+            loaded_at, records = self._values.get(name, (None, None))
+            if loaded_at is None or time.monotonic() - loaded_at > self._ttl:
+                records = getattr(self.backend, name)()
+                self._values[name] = (time.monotonic(), records)
+            return [dict(record) for record in records]
+
+    def invalidate(self, name=None):
+        """Descarta uma leitura guardada ('faq') ou todas."""
+        for key in ([name] if name else list(self._locks)):
+            if key in self._locks:
+                with self._locks[key]:
+                    self._values.pop(key, None)
+
+    def users(self):
+        return self.backend.users()
+
+    def faq(self):
+        return self._read('faq')
+
+    def update_user(self, username, values, row):
+        self.backend.update_user(username, values, row)
+
+    def add_users(self, rows):
+        self.backend.add_users(rows)
+
+    def add_question(self, row):
+        self.backend.add_question(row)
+
+
+def storage_kind():
+    """Backend principal escolhido: DASHBOARD_STORAGE, senão `storage` do secrets.toml, senão "sheets"."""
+    kind = os.environ.get('DASHBOARD_STORAGE')
+    if not kind:
+        try:
+            kind = st.secrets.get("storage")
+        except Exception: # Sem secrets.toml
+            kind = None
+    return str(kind or "sheets").lower()
+
+
+@st.cache_resource
+def _build_storage():
+    """Monta o Storage do processo; levanta StorageError se não houver conexão.
+
+    Exceções não ficam no cache_resource: a próxima chamada tenta de novo.
+    """
+    pool = get_sheets()
+    sheets = SheetsStorage(pool, get_write_queue()) if pool is not None else None
+
+    kind = storage_kind()
+    if kind == "sqlite":
+        backend = SQLiteStorage(mirror=sheets)
+        if sheets is not None and backend.is_empty():
+            try:
+                log.info("Banco local vazio: %d usuário(s) copiados da planilha.", backend.import_from(sheets))
+            except Exception as e:
+                log.warning("Não foi possível copiar os dados da planilha: %s", e)
+    elif kind == "sheets":
+        backend = sheets
+    else:
+        raise ValueError(f"Armazenamento desconhecido: {kind!r} (use 'sheets' ou 'sqlite')")
+
+    if backend is None:
+        raise StorageError("Sem conexão com a planilha.")
+    return CachedStorage(backend)
+
+
+def get_storage():
+    """Storage do processo, já com o cache (None se não houver conexão agora; a próxima chamada tenta de novo)."""
+    try:
+        return _build_storage()
+    except Exception as e:
+        log.warning("Armazenamento indisponível: %s", e)
+        return None
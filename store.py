@@ -0,0 +1,615 @@
+"""Store colunar compilado a partir da árvore data/.
+
+Cada CSV vira um arquivo Parquet já normalizado (tipos definidos pelo
+ingest.py), particionado em [ANO]/[mês]/[tipo]/. Um manifest guarda
+caminho, mtime, tamanho e hash de cada fonte, para recompilar apenas o
+que mudou. Nada no store é pickle (o diretório pode ser compartilhado entre
+deploys): partições em Parquet, manifest e índices em JSON. Sem pyarrow, o
+store não grava nada e as leituras vão direto ao CSV.
+
+Também mantém, arquivo a arquivo (FileIndex), o índice de protocolos
+(ProtocolIndex: num_protocolo -> avaliações de todas as pastas notas/) e o
+cadastro de agentes (AgentRegistry: primeiro e último dia de cada agente).
+
+Uso: python store.py [--workers N]  (compila/atualiza o store inteiro e os índices)
+"""
+import os
+import json
+import atexit
+import datetime
+import hashlib
+import threading
+import time
+import logging
+from concurrent.futures import ProcessPoolExecutor
+import pandas as pd
+import ingest
+
+try:
+    import pyarrow  # noqa: F401 (só para detectar o suporte a Parquet)
+    PARQUET_AVAILABLE = True
+except ImportError:
+    PARQUET_AVAILABLE = False
+
+DATA_DIR = 'data'
+STORE_DIR = os.environ.get('DASHBOARD_STORE_DIR', '.store')
+MANIFEST_NAME = 'manifest.json'
+PROTOCOL_INDEX_NAME = 'protocolos.json'
+AGENT_REGISTRY_NAME = 'agentes.json'
+
+# Intervalo mínimo (segundos) entre varreduras da árvore por um índice, nas chamadas do app
+REFRESH_INTERVAL = 60
+
+# Espera (segundos) para juntar as entradas novas de uma leva de leituras num só save do manifest
+MANIFEST_SAVE_DELAY = 2.0
+
+log = logging.getLogger(__name__)
+
+
+def classify(path, data_dir=DATA_DIR):
+    """Identifica (ano, partição, tipo) de um CSV da árvore data/, ou None.
+
+    data/2026/março.csv            -> ('2026', 'março', 'mensal')
+    data/2026/março/01.03.csv      -> ('2026', 'março', 'diario')
+    data/2026/março/notas/01.03.csv -> ('2026', 'março', 'notas')
+    data/2026/semana/ranking_*.csv -> ('2026', 'semana', 'semanal')
+    """
+    rel = os.path.relpath(path, data_dir)
+    parts = rel.replace(os.sep, '/').split('/')
+    if not parts[-1].endswith('.csv') or not parts[0].isdigit():
+        return None
+
+    year = parts[0]
+    if len(parts) == 2:
+        month = parts[1][:-len('.csv')].lower()
+        return (year, month, 'mensal') if month in ingest.MESES_ORDER else None
+    if len(parts) == 3 and parts[1] == 'semana':
+        return (year, 'semana', 'semanal')
+    if len(parts) == 3 and parts[1] in ingest.MESES_ORDER:
+        return (year, parts[1], 'diario')
+    if len(parts) == 4 and parts[1] in ingest.MESES_ORDER and parts[2] == 'notas':
+        return (year, parts[1], 'notas')
+    return None
+
+def iter_sources(data_dir=DATA_DIR):
+    """Percorre a árvore data/ e devolve (caminho, tipo) de cada CSV reconhecido."""
+    for root, dirs, files in os.walk(data_dir):
+        dirs.sort()
+        for filename in sorted(files):
+            path = os.path.join(root, filename)
+            info = classify(path, data_dir)
+            if info:
+                yield path, info[2]
+
+def _file_hash(path):
+    with open(path, 'rb') as f:
+        return hashlib.sha1(f.read()).hexdigest()
+
+def _matches(entry, path):
+    """(confere?, mtime atualizado?) da entrada (mtime, tamanho, hash) com a fonte."""
+    stat = os.stat(path)
+    if entry['size'] != stat.st_size:
+        return False, False
+    if entry['mtime'] == stat.st_mtime_ns:
+        return True, False
+    # mtime muda em cada checkout/deploy: confirma pelo conteúdo
+    if entry['sha1'] != _file_hash(path):
+        return False, False
+    entry['mtime'] = stat.st_mtime_ns
+    return True, True
+
+def _iso(day):
+    return None if day is None else day.isoformat()
+
+def _from_iso(text):
+    return None if text is None else datetime.date.fromisoformat(text)
+
+def _partition_file(path, kind, data_dir):
+    year, partition, _ = classify(path, data_dir) or ('outros', 'outros', kind)
+    name = os.path.basename(path)[:-len('.csv')]
+    return os.path.join(year, partition, kind, f"{name}.parquet")
+
+def _parquet_safe(df, kind):
+    """O frame pronto para o Parquet: colunas fora do esquema tipado que ainda sejam object viram texto.
+
+    As colunas do esquema já saem de apply_dtypes com tipo fixo; só as extras
+    (lidas como texto, mas que podem ter ficado mistas) precisam disso.
+    """
+    declared = {**ingest.SCHEMAS[kind]['dtypes'], **ingest.DERIVED_DTYPES}
+    loose = [col for col in df.columns if col not in declared and df[col].dtype == object]
+    if not loose:
+        return df
+    return df.assign(**{col: df[col].astype('string') for col in loose})
+
+def compile_partition(path, kind, store_dir, data_dir):
+    """Lê o CSV pelo ingest e grava a partição. Devolve (df, entrada do manifest).
+
+    A entrada é None se a partição não pôde ser gravada (sem pyarrow, ou um
+    frame que o Parquet recusa): o frame lido vale, mas não fica no store.
+    Não toca em estado compartilhado, então pode rodar em threads ou processos.
+    """
+    stat = os.stat(path)
+    df = ingest.read_file(path, kind)
+    if not PARQUET_AVAILABLE:
+        return df, None
+
+    partition = _partition_file(path, kind, data_dir)
+    target = os.path.join(store_dir, partition)
+    os.makedirs(os.path.dirname(target), exist_ok=True)
+    tmp_target = f"{target}.{os.getpid()}.{threading.get_ident()}.tmp"
+    try:
+        _parquet_safe(df, kind).to_parquet(tmp_target, index=False)
+    except Exception as e:
+        log.warning("Partição de %s não gravada no store: %s", path, e)
+        try:
+            os.remove(tmp_target)
+        except FileNotFoundError:
+            pass
+        return df, None
+    os.replace(tmp_target, target)
+
+    # Partição pickle de uma versão antiga do store: não é mais lida, só removida
+    try:
+        os.remove(os.path.splitext(target)[0] + '.pkl')
+    except FileNotFoundError:
+        pass
+
+    entry = {
+        'kind': kind,
+        'mtime': stat.st_mtime_ns,
+        'size': stat.st_size,
+        'sha1': _file_hash(path),
+        'partition': partition.replace(os.sep, '/'),
+        'format': 'parquet',
+    }
+    return df, entry
+
+def _compile_task(args):
+    """Versão para o ProcessPoolExecutor: devolve só a entrada (o frame fica no disco)."""
+    path, kind, store_dir, data_dir = args
+    try:
+        entry = compile_partition(path, kind, store_dir, data_dir)[1]
+    except Exception as e:
+        return path, None, str(e)
+    if entry is None:
+        return path, None, "partição não gravada (sem pyarrow ou frame recusado pelo Parquet)"
+    return path, entry, None
+
+
+class ParquetStore:
+    """Store de partições compiladas, com manifest incremental (thread-safe).
+
+    Leituras que compilam uma partição só marcam o manifest como sujo; ele é
+    gravado uma vez, MANIFEST_SAVE_DELAY segundos depois da primeira
+    mudança (ou na saída do processo), e não a cada arquivo de uma pasta.
+    """
+
+    def __init__(self, store_dir=STORE_DIR, data_dir=DATA_DIR):
+        self.store_dir = store_dir
+        self.data_dir = data_dir
+        self.manifest_path = os.path.join(store_dir, MANIFEST_NAME)
+        self._lock = threading.Lock()
+        self._manifest = self._load_manifest()
+        self._dirty = False
+        self._save_timer = None
+        atexit.register(self.flush)
+
+    # --- Manifest ---
+
+    def _load_manifest(self):
+        try:
+            with open(self.manifest_path, encoding='utf-8') as f:
+                manifest = json.load(f)
+        except (OSError, ValueError):
+            return {}
+        # Mudou o esquema do ingest.py: tudo precisa ser recompilado
+        if manifest.get('schema_version') != ingest.SCHEMA_VERSION:
+            return {}
+        return manifest.get('files', {})
+
+    def _save_manifest(self):
+        os.makedirs(self.store_dir, exist_ok=True)
+        tmp_path = f"{self.manifest_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({'schema_version': ingest.SCHEMA_VERSION, 'files': self._manifest},
+                      f, ensure_ascii=False, indent=1, sort_keys=True)
+        os.replace(tmp_path, self.manifest_path) # Troca atômica
+        self._dirty = False
+
+    def _mark_dirty(self):
+        """Agenda o save do manifest (chamar com o lock)."""
+        self._dirty = True
+        if self._save_timer is None:
+            self._save_timer = threading.Timer(MANIFEST_SAVE_DELAY, self.flush)
+            self._save_timer.daemon = True
+            self._save_timer.start()
+
+    def flush(self):
+        """Grava o manifest se houver mudança pendente."""
+        with self._lock:
+            self._save_timer = None
+            if self._dirty:
+                self._save_manifest()
+
+    def _key(self, path):
+        return os.path.relpath(path, self.data_dir).replace(os.sep, '/')
+
+    def _lookup(self, path):
+        """Entrada do manifest se a partição ainda corresponde à fonte, senão None."""
+        entry = self._manifest.get(self._key(path))
+        if not entry or entry.get('format') != 'parquet':
+            return None # Sem entrada, ou partição pickle de uma versão antiga: recompila
+        same, touched = _matches(entry, path)
+        if not same:
+            return None
+        if touched:
+            self._mark_dirty()
+        if not os.path.exists(os.path.join(self.store_dir, entry['partition'])):
+            return None
+        return entry
+
+    # --- Compilação ---
+
+    def compile_tree(self, workers=None):
+        """Compila toda a árvore data/, recompilando só os arquivos novos ou alterados.
+
+        Com workers > 1 os CSVs alterados são compilados em processos paralelos.
+        """
+        workers = ingest.READ_WORKERS if workers is None else workers
+        summary = {'compilados': 0, 'inalterados': 0, 'removidos': 0, 'erros': []}
+        with self._lock:
+            seen = set()
+            pending = []
+            for path, kind in iter_sources(self.data_dir):
+                seen.add(self._key(path))
+                try:
+                    if self._lookup(path):
+                        summary['inalterados'] += 1
+                    else:
+                        pending.append((path, kind, self.store_dir, self.data_dir))
+                except Exception as e:
+                    summary['erros'].append((path, str(e)))
+
+            if workers > 1 and len(pending) > 1:
+                with ProcessPoolExecutor(max_workers=min(workers, len(pending))) as pool:
+                    results = list(pool.map(_compile_task, pending, chunksize=8))
+            else:
+                results = [_compile_task(task) for task in pending]
+
+            for path, entry, error in results:
+                if error is not None:
+                    summary['erros'].append((path, error))
+                    continue
+                self._manifest[self._key(path)] = entry
+                summary['compilados'] += 1
+
+            # Fontes apagadas: remove a partição órfã
+            for key in set(self._manifest) - seen:
+                entry = self._manifest.pop(key)
+                try:
+                    os.remove(os.path.join(self.store_dir, entry['partition']))
+                except OSError:
+                    pass
+                summary['removidos'] += 1
+
+            self._save_manifest()
+        return summary
+
+    # --- Leitura ---
+
+    def read_file(self, path, kind):
+        """Lê um arquivo pelo store (compila na hora se a partição estiver ausente ou velha)."""
+        with self._lock:
+            entry = self._lookup(path)
+
+        if entry is None:
+            # A leitura do CSV fica fora do lock: outras threads seguem lendo
+            df, entry = compile_partition(path, kind, self.store_dir, self.data_dir)
+            if entry is not None:
+                with self._lock:
+                    self._manifest[self._key(path)] = entry
+                    self._mark_dirty()
+            return df
+
+        return pd.read_parquet(os.path.join(self.store_dir, entry['partition']))
+
+
+class FileIndex:
+    """Base dos índices persistentes montados arquivo a arquivo sobre a árvore data/.
+
+    Guarda, por arquivo dos tipos em `kinds`, mtime/tamanho/hash e o conteúdo
+    extraído por _extract(). refresh() só lê os arquivos novos ou alterados e
+    tira os apagados; as subclasses mantêm as estruturas de busca em
+    _insert/_remove (chamados também na carga do índice salvo). O índice é
+    salvo em JSON; o conteúdo que não for JSON puro passa por
+    _encode/_decode.
+    """
+
+    name = None   # arquivo do índice dentro do store
+    kinds = ()    # tipos de arquivo indexados (ver classify)
+    version = 1   # formato do conteúdo: mudou, o índice salvo é remontado
+
+    def __init__(self, store_dir=STORE_DIR, data_dir=DATA_DIR, reader=ingest.read_file):
+        self.data_dir = data_dir
+        self.reader = reader
+        self.path = os.path.join(store_dir, self.name)
+        self._lock = threading.Lock()
+        self._refreshed_at = None
+        self._last_summary = None
+        self._files = self._load()
+        for key, entry in self._files.items():
+            self._insert(key, entry['content'])
+
+    def _load(self):
+        try:
+            with open(self.path, encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return {}
+        if data.get('schema_version') != ingest.SCHEMA_VERSION or data.get('version', 1) != self.version:
+            return {}
+        files = data.get('files', {})
+        # Índice gravado num formato antigo: remonta do zero
+        if not all('content' in entry for entry in files.values()):
+            return {}
+        try:
+            return {key: {**entry, 'content': self._decode(entry['content'])} for key, entry in files.items()}
+        except (KeyError, TypeError, ValueError):
+            return {}
+
+    def _save(self):
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        tmp_path = f"{self.path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        files = {key: {**entry, 'content': self._encode(entry['content'])} for key, entry in self._files.items()}
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({'schema_version': ingest.SCHEMA_VERSION, 'version': self.version, 'files': files},
+                      f, ensure_ascii=False)
+        os.replace(tmp_path, self.path) # Troca atômica
+
+    def _encode(self, content):
+        """Conteúdo de um arquivo como JSON puro (para _save)."""
+        return content
+
+    def _decode(self, content):
+        """Inverso de _encode (na carga do índice salvo)."""
+        return content
+
+    def _key(self, path):
+        return os.path.relpath(path, self.data_dir).replace(os.sep, '/')
+
+    def _extract(self, path, kind):
+        """Conteúdo do arquivo que o índice guarda (implementado pelas subclasses)."""
+        raise NotImplementedError
+
+    def _insert(self, key, content):
+        pass
+
+    def _remove(self, key, content):
+        pass
+
+    def refresh(self, max_age=0):
+        """Atualiza o índice com os arquivos novos, alterados ou apagados.
+
+        Com max_age, uma varredura feita há menos de max_age segundos vale:
+        devolve o resumo dela sem listar a árvore de novo (o app chama a cada rerun).
+        """
+        with self._lock:
+            if (max_age and self._refreshed_at is not None
+                    and time.monotonic() - self._refreshed_at < max_age):
+                return self._last_summary
+        summary = {'indexados': 0, 'inalterados': 0, 'removidos': 0, 'erros': []}
+        with self._lock:
+            changed = False
+            seen = set()
+            for path, kind in iter_sources(self.data_dir):
+                if kind not in self.kinds:
+                    continue
+                key = self._key(path)
+                seen.add(key)
+                try:
+                    entry = self._files.get(key)
+                    same, touched = _matches(entry, path) if entry else (False, False)
+                    changed |= touched
+                    if same:
+                        summary['inalterados'] += 1
+                        continue
+                    stat = os.stat(path)
+                    content = self._extract(path, kind)
+                    if entry:
+                        self._remove(key, entry['content'])
+                    self._files[key] = {'kind': kind, 'mtime': stat.st_mtime_ns, 'size': stat.st_size,
+                                        'sha1': _file_hash(path), 'content': content}
+                    self._insert(key, content)
+                    summary['indexados'] += 1
+                    changed = True
+                except Exception as e:
+                    summary['erros'].append((path, str(e)))
+
+            for key in set(self._files) - seen:
+                self._remove(key, self._files.pop(key)['content'])
+                summary['removidos'] += 1
+                changed = True
+
+            if changed:
+                self._save()
+            self._refreshed_at = time.monotonic()
+            self._last_summary = summary
+        return summary
+
+
+class ProtocolIndex(FileIndex):
+    """Índice persistente num_protocolo -> avaliações, sobre todas as pastas notas/.
+
+    Cada protocolo aponta para as suas avaliações (ano, mês, dia, agente, nota);
+    a busca é um acesso ao dicionário.
+    """
+
+    name = PROTOCOL_INDEX_NAME
+    kinds = ('notas',)
+
+    def __init__(self, *args, **kwargs):
+        self._entries = {}
+        super().__init__(*args, **kwargs)
+
+    def _extract(self, path, kind):
+        year, month_name_lower, _ = classify(path, self.data_dir)
+        day = int(os.path.basename(path).split('.')[0])
+        df = self.reader(path, kind)
+        if 'Protocolo' not in df.columns:
+            return []
+        df = df[df['Protocolo'].notna()]
+        missing = pd.Series(None, index=df.index, dtype=object)
+        agents = df['Agente'].astype(object) if 'Agente' in df.columns else missing
+        notes = df['Nota'].astype(object) if 'Nota' in df.columns else missing
+        return [
+            (protocolo, int(year), month_name_lower, day,
+             None if pd.isna(agente) else agente, None if pd.isna(nota) else int(nota))
+            for protocolo, agente, nota in zip(df['Protocolo'].str.strip(), agents, notes)
+        ]
+
+    def _insert(self, key, content):
+        for protocolo, *item in content:
+            self._entries.setdefault(protocolo, []).append((*item, key))
+
+    def _remove(self, key, content):
+        for protocolo in {row[0] for row in content}:
+            kept = [item for item in self._entries.get(protocolo, ()) if item[-1] != key]
+            if kept:
+                self._entries[protocolo] = kept
+            else:
+                self._entries.pop(protocolo, None)
+
+    def __len__(self):
+        return len(self._entries)
+
+    def lookup(self, protocolo):
+        """Avaliações do protocolo: [{'Protocolo', 'Ano', 'Mês', 'Dia', 'Agente', 'Nota'}] (vazia se não existir)."""
+        protocolo = str(protocolo).strip()
+        return [
+            {'Protocolo': protocolo, 'Ano': year, 'Mês': month_name_lower, 'Dia': day, 'Agente': agente, 'Nota': nota}
+            for year, month_name_lower, day, agente, nota, _ in self._entries.get(protocolo, ())
+        ]
+
+
+class AgentRegistry(FileIndex):
+    """Cadastro persistente dos agentes vistos em qualquer arquivo da árvore data/.
+
+    Guarda, por arquivo, o primeiro e o último dia de cada agente, tirados
+    das datas das linhas onde o arquivo as tem (coluna Data, ou o dia de cada
+    avaliação nas notas) e, senão, do dia do arquivo (diários). Os mensais
+    não têm data por linha: valem o mês, mas o mês em andamento (o que passa
+    do último dia com diários/notas na árvore, ou de hoje) termina nesse
+    dia, e não no fim do mês. Os semanais não têm data.
+    """
+
+    name = AGENT_REGISTRY_NAME
+    kinds = ('mensal', 'diario', 'notas', 'semanal')
+    version = 2
+
+    def _extract(self, path, kind):
+        year, month_name_lower, _ = classify(path, self.data_dir)
+        df = ingest.agent_rows(self.reader(path, kind))
+        content = {'agents': {}, 'first': None, 'last': None, 'monthly': False}
+        if 'Agente' not in df.columns:
+            return content
+        names = df['Agente'].astype(str).str.strip()
+
+        dates = None
+        if 'Data' in df.columns:
+            dates = pd.to_datetime(df['Data'], errors='coerce')
+        elif kind == 'notas' and 'Dia (CSV)' in df.columns:
+            month = ingest.MESES_ORDER.index(month_name_lower) + 1
+            dates = pd.to_datetime(pd.DataFrame({'year': int(year), 'month': month, 'day': df['Dia (CSV)']}),
+                                   errors='coerce')
+        if dates is None or dates.isna().all():
+            if kind in ('diario', 'notas'):
+                dates = pd.Series(pd.Timestamp(ingest.day_date(os.path.basename(path), month_name_lower, year)),
+                                  index=df.index)
+            elif kind == 'mensal':
+                month_start = pd.Timestamp(int(year), ingest.MESES_ORDER.index(month_name_lower) + 1, 1)
+                content['monthly'] = True
+                dates = pd.Series(month_start, index=df.index)
+                dates = pd.concat([dates, dates + pd.offsets.MonthEnd(0)])
+                names = pd.concat([names, names])
+
+        frame = pd.DataFrame({'Agente': names.to_numpy(), 'Data': dates.to_numpy() if dates is not None else pd.NaT})
+        frame = frame[frame['Agente'] != '']
+        for name, group in frame.groupby('Agente', sort=True)['Data']:
+            first, last = group.min(), group.max()
+            content['agents'][name] = (None, None) if pd.isna(first) else (first.date(), last.date())
+        ranges = [r for r in content['agents'].values() if r[0] is not None]
+        if ranges:
+            content['first'] = min(first for first, _ in ranges)
+            content['last'] = max(last for _, last in ranges)
+        return content
+
+    def _encode(self, content):
+        """Datas como texto ISO (AAAA-MM-DD)."""
+        return {**content, 'first': _iso(content['first']), 'last': _iso(content['last']),
+                'agents': {name: [_iso(first), _iso(last)] for name, (first, last) in content['agents'].items()}}
+
+    def _decode(self, content):
+        return {**content, 'first': _from_iso(content['first']), 'last': _from_iso(content['last']),
+                'agents': {name: (_from_iso(first), _from_iso(last)) for name, (first, last) in content['agents'].items()}}
+
+    def agents(self):
+        """Uma linha por agente: Agente, Primeiro dia, Último dia e Arquivos (em ordem alfabética)."""
+        with self._lock:
+            contents = [entry['content'] for entry in self._files.values()]
+
+        # Último dia com dados datados (ou hoje): limita o fim do mensal do mês em andamento
+        dated = [content['last'] for content in contents if not content['monthly'] and content['last'] is not None]
+        latest = max(dated) if dated else datetime.date.today()
+
+        seen = {}
+        for content in contents:
+            for name, (agent_first, agent_last) in content['agents'].items():
+                first, last, files = seen.get(name, (None, None, 0))
+                if agent_first is not None:
+                    if content['monthly']:
+                        agent_last = max(agent_first, min(agent_last, latest))
+                    first = agent_first if first is None else min(first, agent_first)
+                    last = agent_last if last is None else max(last, agent_last)
+                seen[name] = (first, last, files + 1)
+        rows = [(name, *seen[name]) for name in sorted(seen)]
+        return pd.DataFrame(rows, columns=['Agente', 'Primeiro dia', 'Último dia', 'Arquivos'])
+
+    def names(self, start=None, end=None):
+        """Agentes com algum dia datado no intervalo [start, end] (todos, sem intervalo).
+
+        Com intervalo, só contam os dias de cada agente nos arquivos datados
+        (diários e notas): o mensal vale o mês inteiro e não diz em que dias
+        o agente trabalhou.
+        """
+        with self._lock:
+            names = set()
+            for entry in self._files.values():
+                content = entry['content']
+                if start is None and end is None:
+                    names.update(content['agents'])
+                    continue
+                if content['monthly'] or content['first'] is None:
+                    continue
+                names.update(
+                    name for name, (first, last) in content['agents'].items()
+                    if first is not None and (end is None or first <= end) and (start is None or last >= start)
+                )
+        return sorted(names)
+
+
+if __name__ == '__main__':
+    import argparse
+    parser = argparse.ArgumentParser(description="Compila a árvore data/ no store colunar.")
+    parser.add_argument('--workers', type=int, default=None, help="processos em paralelo (1 = sequencial)")
+    args = parser.parse_args()
+    data_store = ParquetStore()
+    result = data_store.compile_tree(workers=args.workers)
+    print(f"Compilados: {result['compilados']} | Inalterados: {result['inalterados']} | Removidos: {result['removidos']}")
+    for path, error in result['erros']:
+        print(f"Erro em {path}: {error}")
+    for label, index in (("Protocolos", ProtocolIndex(reader=data_store.read_file)),
+                         ("Agentes", AgentRegistry(reader=data_store.read_file))):
+        result = index.refresh()
+        print(f"{label} - Indexados: {result['indexados']} | Inalterados: {result['inalterados']} | Removidos: {result['removidos']}")
+        for path, error in result['erros']:
+            print(f"Erro em {path}: {error}")
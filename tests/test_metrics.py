@@ -0,0 +1,139 @@
+import datetime
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import metrics
+
+
+def daily_frame():
+    """Linhas de agentes em 5 dias (com falta de dias e valores ausentes), como as de _load_daily_data."""
+    rng = np.random.default_rng(7)
+    days = [1, 2, 4, 7, 9]
+    rows = []
+    for agent in ['ANA', 'BRUNO', 'CARLA']:
+        for day in days:
+            if agent == 'CARLA' and day == 4:
+                continue
+            rows.append({
+                'Agente': agent,
+                'DaySort': day,
+                'Data': pd.Timestamp(2025, 11, day),
+                'QTD Atendimento': int(rng.integers(1, 80)),
+                'QTD Avaliacoes': int(rng.integers(0, 30)),
+                'TMA': float(rng.uniform(2, 20)),
+                'FCR': float(rng.uniform(0.5, 1.0)),
+                'Satisfacao': float(rng.uniform(3, 5)),
+            })
+    df = pd.DataFrame(rows)
+    df.loc[3, 'TMA'] = np.nan
+    df.loc[5, 'Satisfacao'] = np.nan
+    return df
+
+
+def weighted_groupby(df):
+    """Referência em pandas: contagens somadas, médias ponderadas pela coluna de WEIGHTS."""
+    out = {}
+    for agent, group in df.groupby('Agente'):
+        row = {col: group[col].sum() for col in metrics.SUM_COLS}
+        for col in ['TMA', 'FCR', 'Satisfacao']:
+            valid = group[col].notna()
+            weight = group.loc[valid, metrics.WEIGHTS[col]]
+            row[col] = (group.loc[valid, col] * weight).sum() / weight.sum()
+        out[agent] = row
+    return pd.DataFrame.from_dict(out, orient='index')
+
+
+def test_by_agent_matches_weighted_groupby():
+    df = daily_frame()
+    cube = metrics.RollupCube.from_frame(df, ['DaySort', 'Data'])
+    got = cube.by_agent().set_index('Agente')
+    expected = weighted_groupby(df)
+    for col in expected.columns:
+        np.testing.assert_allclose(got[col].astype('float64'), expected.loc[got.index, col])
+
+
+def test_total_matches_weighted_groupby():
+    df = daily_frame()
+    cube = metrics.RollupCube.from_frame(df, ['DaySort', 'Data'])
+    expected = weighted_groupby(df.assign(Agente='todos')).iloc[0]
+    total = cube.total()
+    for col in expected.index:
+        assert total[col] == pytest.approx(expected[col])
+
+    # Um agente, num intervalo de dias: só as linhas dele nesses dias
+    part = df[(df['Agente'] == 'BRUNO') & df['DaySort'].between(2, 7)]
+    expected = weighted_groupby(part).iloc[0]
+    total = cube.total('BRUNO', cube.period_range(datetime.date(2025, 11, 2), datetime.date(2025, 11, 7)))
+    for col in expected.index:
+        assert total[col] == pytest.approx(expected[col])
+
+
+def test_total_of_unknown_agent_is_empty():
+    cube = metrics.RollupCube.from_frame(daily_frame(), ['DaySort', 'Data'])
+    assert cube.total('NINGUEM') == {}
+
+
+@pytest.mark.parametrize('start, end, expected', [
+    (None, None, (0, 5)),
+    (datetime.date(2025, 11, 1), datetime.date(2025, 11, 9), (0, 5)),
+    (datetime.date(2025, 10, 1), datetime.date(2025, 12, 31), (0, 5)),
+    # Dias sem arquivo nas pontas: o intervalo encolhe para os dias que existem
+    (datetime.date(2025, 11, 3), datetime.date(2025, 11, 6), (2, 3)),
+    (datetime.date(2025, 11, 4), datetime.date(2025, 11, 4), (2, 3)),
+    (datetime.date(2025, 11, 5), datetime.date(2025, 11, 6), (3, 3)),
+    (datetime.date(2025, 11, 10), None, (5, 5)),
+    (None, datetime.date(2025, 10, 31), (0, 0)),
+    # Timestamp com hora conta pelo dia
+    (pd.Timestamp(2025, 11, 2, 15), pd.Timestamp(2025, 11, 7, 8), (1, 4)),
+])
+def test_period_range_edges(start, end, expected):
+    cube = metrics.RollupCube.from_frame(daily_frame(), ['DaySort', 'Data'])
+    window = cube.period_range(start, end)
+    assert (window.start, window.stop) == expected
+    assert window.stop >= window.start
+
+
+def test_period_range_on_other_column():
+    cube = metrics.RollupCube.from_frame(daily_frame(), ['DaySort', 'Data'])
+    window = cube.period_range(2, 7, col='DaySort')
+    assert (window.start, window.stop) == (1, 4)
+
+
+def test_empty_period_range_gives_no_total():
+    cube = metrics.RollupCube.from_frame(daily_frame(), ['DaySort', 'Data'])
+    assert cube.total(periods=cube.period_range(datetime.date(2025, 11, 5), datetime.date(2025, 11, 6))) == {}
+
+
+def quantile_cube(values, metric='TMA'):
+    df = pd.DataFrame({'Agente': 'ANA', 'DaySort': range(1, len(values) + 1), metric: values})
+    return metrics.QuantileCube.from_frame(df, ['DaySort'])
+
+
+def test_quantiles_of_one_sample_are_the_sample():
+    got = quantile_cube([7.25]).quantiles('ANA')['TMA']
+    np.testing.assert_allclose(got, [7.25, 7.25, 7.25])
+
+
+def test_quantiles_of_two_samples_keep_the_tail():
+    got = quantile_cube([4.0, 30.0]).quantiles('ANA')['TMA']
+    # Posto mais próximo: p50 é o menor, p90/p99 o pior dia
+    np.testing.assert_allclose(got, [4.0, 30.0, 30.0])
+
+
+def test_quantiles_match_nearest_rank_within_accuracy():
+    values = np.random.default_rng(3).uniform(1, 60, 40)
+    got = quantile_cube(values).quantiles('ANA')['TMA'].to_numpy()
+    expected = np.quantile(values, metrics.QUANTILES, method='inverted_cdf')
+    np.testing.assert_allclose(got, expected, rtol=metrics.SKETCH_ACCURACY)
+
+
+def test_quantiles_at_the_metric_bound_are_exact():
+    got = quantile_cube([0.8, 1.0, 1.0], metric='FCR').quantiles('ANA')['FCR']
+    np.testing.assert_allclose(got[['p90', 'p99']], [1.0, 1.0])
+
+
+def test_quantiles_without_values_are_nan():
+    cube = quantile_cube([np.nan, np.nan])
+    assert cube.quantiles('ANA')['TMA'].isna().all()
@@ -0,0 +1,139 @@
+import os
+import stat
+
+import pytest
+
+pytest.importorskip('streamlit')
+gspread = pytest.importorskip('gspread')
+pytest.importorskip('google.oauth2.service_account')
+
+import sheets
+
+HEADER = ['Usuario', 'Senha', 'Nome', 'Funcao', 'PrimeiroAcesso']
+
+
+class FakeWorksheet:
+    """Aba em memória com as chamadas do gspread que a WriteQueue usa."""
+
+    def __init__(self, rows):
+        self.rows = [list(row) for row in rows]
+
+    def row_values(self, i):
+        return list(self.rows[i - 1])
+
+    def batch_get(self, ranges):
+        return [[list(self.rows[0])], [[row[0]] for row in self.rows]]
+
+    def batch_update(self, data):
+        for cell in data:
+            r, c = gspread.utils.a1_to_rowcol(cell['range'])
+            row = self.rows[r - 1]
+            row.extend([''] * (c - len(row)))
+            row[c - 1] = cell['values'][0][0]
+
+    def append_rows(self, rows):
+        self.rows.extend(list(row) for row in rows)
+
+
+class FakePool:
+    def __init__(self, **sheets_by_title):
+        self.sheets = sheets_by_title
+
+    def call(self, title, fn):
+        return fn(self.sheets[title])
+
+
+@pytest.fixture
+def pool():
+    return FakePool(Usuarios=FakeWorksheet([HEADER, ['ana', '1', 'Ana', 'user', 'TRUE']]),
+                    Novas_Perguntas=FakeWorksheet([['Data', 'Pergunta', 'Usuario']]))
+
+
+@pytest.fixture
+def paths(tmp_path):
+    return str(tmp_path / 'journal.jsonl'), str(tmp_path / 'falhas.jsonl')
+
+
+def crash(queue):
+    """Simula a queda do processo: a trava do diário é solta sem aplicar nada."""
+    queue._journal_lock.close()
+
+
+def open_queue(pool, paths):
+    journal, dead_letter = paths
+    # Espera longa: a thread não aplica nada sozinha durante o teste, só flush()
+    return sheets.WriteQueue(pool, journal, flush_delay=3600, dead_letter_path=dead_letter)
+
+
+def enqueue_writes(queue):
+    queue.update_row('Usuarios', 'ana', {'Senha': 'nova-senha', 'PrimeiroAcesso': 'FALSE'},
+                     ['ana', 'nova-senha', 'ana', 'user', 'FALSE'])
+    queue.append_rows('Usuarios', [['bob', 'senha-bob', 'Bob', 'user', 'TRUE']])
+    queue.append_rows('Novas_Perguntas', [['01/11/2025 10:00', 'Dúvida', 'bob']])
+
+
+def test_crash_replays_pending_writes_with_passwords(pool, paths):
+    queue = open_queue(pool, paths)
+    enqueue_writes(queue)
+    crash(queue)
+
+    replayed = open_queue(pool, paths)
+    assert replayed.journal_path == queue.journal_path
+    assert [op['sheet'] for op in replayed.pending()] == ['Usuarios', 'Usuarios', 'Novas_Perguntas']
+    replayed.flush()
+
+    users = pool.sheets['Usuarios'].rows
+    assert users[1] == ['ana', 'nova-senha', 'Ana', 'user', 'FALSE']
+    assert users[2] == ['bob', 'senha-bob', 'Bob', 'user', 'TRUE']
+    assert pool.sheets['Novas_Perguntas'].rows[1][1] == 'Dúvida'
+    assert replayed.pending() == []
+    assert replayed.failed() == []
+    assert not os.path.exists(replayed.secrets_path)
+    with open(replayed.journal_path, encoding='utf-8') as f:
+        assert f.read() == ''
+
+
+def test_passwords_stay_out_of_the_journal(pool, paths):
+    queue = open_queue(pool, paths)
+    enqueue_writes(queue)
+    with open(queue.journal_path, encoding='utf-8') as f:
+        journal = f.read()
+    assert 'nova-senha' not in journal and 'senha-bob' not in journal
+    with open(queue.secrets_path, encoding='utf-8') as f:
+        assert 'nova-senha' in f.read()
+    if os.name == 'posix':
+        assert stat.S_IMODE(os.stat(queue.secrets_path).st_mode) == 0o600
+
+
+def test_lost_secrets_file_sends_only_those_writes_to_failed(pool, paths):
+    queue = open_queue(pool, paths)
+    enqueue_writes(queue)
+    crash(queue)
+    os.remove(queue.secrets_path)
+
+    replayed = open_queue(pool, paths)
+    assert [op['sheet'] for op in replayed.pending()] == ['Novas_Perguntas']
+    failed = replayed.failed()
+    assert len(failed) == 2
+    assert all('nova-senha' not in str(entry) and 'senha-bob' not in str(entry) for entry in failed)
+
+
+def test_live_queue_journal_is_not_claimed_twice(pool, paths):
+    first = open_queue(pool, paths)
+    second = open_queue(pool, paths)
+    assert first.journal_path != second.journal_path
+    first.append_rows('Novas_Perguntas', [['x', 'y', 'z']])
+    assert second.pending() == []
+
+
+def test_truncated_journal_line_is_skipped(pool, paths):
+    queue = open_queue(pool, paths)
+    queue.append_rows('Novas_Perguntas', [['01/11/2025 10:00', 'Primeira', 'ana']])
+    crash(queue)
+    with open(queue.journal_path, 'a', encoding='utf-8') as f:
+        f.write('{"op": "append", "sheet": "Novas_Pergun') # Queda no meio da gravação
+
+    replayed = open_queue(pool, paths)
+    assert len(replayed.pending()) == 1
+    replayed.flush()
+    assert pool.sheets['Novas_Perguntas'].rows[-1][1] == 'Primeira'
@@ -0,0 +1,113 @@
+import pytest
+
+pytest.importorskip('streamlit')
+pytest.importorskip('gspread')
+pytest.importorskip('google.oauth2.service_account')
+
+import storage
+
+
+class MemoryStorage(storage.Storage):
+    """Espelho em memória: registra as escritas repassadas pelo SQLiteStorage."""
+
+    def __init__(self, users=(), faq=()):
+        self._users = [dict(user) for user in users]
+        self._faq = [dict(record) for record in faq]
+        self.writes = []
+
+    def users(self):
+        return [dict(user) for user in self._users]
+
+    def faq(self):
+        return [dict(record) for record in self._faq]
+
+    def update_user(self, username, values, row):
+        self.writes.append(('update_user', username, values, row))
+
+    def add_users(self, rows):
+        self.writes.append(('add_users', rows))
+
+    def add_question(self, row):
+        self.writes.append(('add_question', row))
+
+
+@pytest.fixture
+def db(tmp_path):
+    return storage.SQLiteStorage(str(tmp_path / 'dashboard.db'))
+
+
+def by_user(records):
+    return {record['Usuario']: record for record in records}
+
+
+def test_users_round_trip(db):
+    assert db.is_empty()
+    db.add_users([['ana', '1', 'Ana', 'admin', 'TRUE'], ['bob', '2', 'Bob', 'user', 'TRUE']])
+    db.update_user('ana', {'Senha': 'nova', 'PrimeiroAcesso': 'FALSE'}, ['ana', 'nova', 'Ana', 'admin', 'FALSE'])
+
+    users = by_user(db.users())
+    assert not db.is_empty()
+    assert users['ana'] == {'Usuario': 'ana', 'Senha': 'nova', 'Nome': 'Ana', 'Funcao': 'admin', 'PrimeiroAcesso': 'FALSE'}
+    assert users['bob']['Senha'] == '2'
+
+
+def test_existing_user_is_not_duplicated(db):
+    db.add_users([['ana', '1', 'Ana', 'user', 'TRUE']])
+    db.add_users([['ana', 'outra', 'Outra', 'admin', 'FALSE']])
+    assert db.users() == [{'Usuario': 'ana', 'Senha': '1', 'Nome': 'Ana', 'Funcao': 'user', 'PrimeiroAcesso': 'TRUE'}]
+
+
+def test_update_of_missing_user_inserts_the_row(db):
+    db.update_user('zed', {'Senha': '7'}, ['zed', '7', 'zed', 'user', 'FALSE'])
+    assert by_user(db.users())['zed']['Senha'] == '7'
+
+
+def test_update_of_unknown_column_is_refused(db):
+    db.add_users([['ana', '1', 'Ana', 'user', 'TRUE']])
+    with pytest.raises(ValueError):
+        db.update_user('ana', {'Sneha': '2'}, ['ana'])
+
+
+def test_data_survives_reopening(tmp_path):
+    path = str(tmp_path / 'dashboard.db')
+    storage.SQLiteStorage(path).add_users([['ana', '1', 'Ana', 'user', 'TRUE']])
+    assert by_user(storage.SQLiteStorage(path).users())['ana']['Nome'] == 'Ana'
+
+
+def test_faq_round_trip(db):
+    records = [{'Pergunta': 'Como trocar a senha?', 'Resposta': 'No menu.'}, {'Pergunta': 'P2', 'Resposta': 'R2'}]
+    db.replace_faq(records)
+    assert db.faq() == records
+
+
+def test_writes_go_to_the_mirror(tmp_path):
+    mirror = MemoryStorage()
+    db = storage.SQLiteStorage(str(tmp_path / 'dashboard.db'), mirror=mirror)
+    db.add_users([['ana', '1', 'Ana', 'user', 'TRUE']])
+    db.add_users([['ana', '1', 'Ana', 'user', 'TRUE']]) # Já existe: nada a espelhar
+    db.update_user('ana', {'Senha': '2'}, ['ana', '2', 'Ana', 'user', 'TRUE'])
+    db.add_question(['01/11/2025 10:00', 'Dúvida', 'ana'])
+    assert [write[0] for write in mirror.writes] == ['add_users', 'update_user', 'add_question']
+
+
+def test_import_from_copies_users_and_faq(db):
+    source = MemoryStorage(users=[{'Usuario': 'ana', 'Senha': '1', 'Nome': 'Ana', 'Funcao': 'user', 'PrimeiroAcesso': 'TRUE'}],
+                           faq=[{'Pergunta': 'P', 'Resposta': 'R'}])
+    assert db.import_from(source) == 1
+    assert db.users() == source.users()
+    assert db.faq() == source.faq()
+    assert source.writes == []
+
+
+def test_cached_storage_passes_users_through_and_caches_faq(db):
+    cached = storage.CachedStorage(db, ttl=3600)
+    db.replace_faq([{'Pergunta': 'P1', 'Resposta': 'R1'}])
+    assert len(cached.faq()) == 1
+
+    cached.add_users([['ana', '1', 'Ana', 'user', 'TRUE']])
+    assert [user['Usuario'] for user in cached.users()] == ['ana']
+
+    db.replace_faq([])
+    assert len(cached.faq()) == 1 # Ainda no cache
+    cached.invalidate('faq')
+    assert cached.faq() == []
@@ -0,0 +1,105 @@
+import json
+import os
+import shutil
+
+import pytest
+
+pytest.importorskip('pyarrow')
+
+import store
+
+SAMPLE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'data', '2025', 'novembro', '03.11.csv')
+
+
+@pytest.fixture
+def tree(tmp_path):
+    """Árvore data/ com um diário, e um store vazio ao lado."""
+    data_dir = tmp_path / 'data'
+    (data_dir / '2025' / 'novembro').mkdir(parents=True)
+    path = data_dir / '2025' / 'novembro' / '03.11.csv'
+    shutil.copy(SAMPLE, path)
+    return str(data_dir), str(tmp_path / 'store'), str(path)
+
+
+@pytest.fixture
+def compiles(monkeypatch):
+    """Conta as compilações de partição."""
+    calls = []
+    original = store.compile_partition
+
+    def counting(path, kind, store_dir, data_dir):
+        calls.append(path)
+        return original(path, kind, store_dir, data_dir)
+
+    monkeypatch.setattr(store, 'compile_partition', counting)
+    return calls
+
+
+def test_second_read_uses_the_partition(tree, compiles):
+    data_dir, store_dir, path = tree
+    data_store = store.ParquetStore(store_dir, data_dir)
+    first = data_store.read_file(path, 'diario')
+    second = data_store.read_file(path, 'diario')
+    assert len(compiles) == 1
+    assert first.equals(second)
+
+
+def test_manifest_is_json_and_survives_a_restart(tree, compiles):
+    data_dir, store_dir, path = tree
+    data_store = store.ParquetStore(store_dir, data_dir)
+    data_store.read_file(path, 'diario')
+    data_store.flush()
+
+    with open(os.path.join(store_dir, store.MANIFEST_NAME), encoding='utf-8') as f:
+        manifest = json.load(f)
+    assert manifest['files']['2025/novembro/03.11.csv']['format'] == 'parquet'
+    assert not [name for _, _, files in os.walk(store_dir) for name in files if name.endswith('.pkl')]
+
+    store.ParquetStore(store_dir, data_dir).read_file(path, 'diario')
+    assert len(compiles) == 1
+
+
+def test_size_change_recompiles(tree, compiles):
+    data_dir, store_dir, path = tree
+    data_store = store.ParquetStore(store_dir, data_dir)
+    rows = len(data_store.read_file(path, 'diario'))
+    with open(path, 'a', encoding='utf-8') as f:
+        f.write('NOVO,10,00:05:00,00:00:10,00:00:05,00:01:00,"50,00%","80,00%","10,00%",2\n')
+    df = data_store.read_file(path, 'diario')
+    assert len(compiles) == 2
+    assert len(df) == rows + 1
+
+
+def test_touched_mtime_with_same_content_does_not_recompile(tree, compiles):
+    data_dir, store_dir, path = tree
+    data_store = store.ParquetStore(store_dir, data_dir)
+    data_store.read_file(path, 'diario')
+    stat = os.stat(path)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9)) # Checkout/deploy: mesmo conteúdo
+    data_store.read_file(path, 'diario')
+    assert len(compiles) == 1
+    assert data_store._manifest['2025/novembro/03.11.csv']['mtime'] == stat.st_mtime_ns + 10**9
+
+
+def test_same_size_new_content_recompiles(tree, compiles):
+    data_dir, store_dir, path = tree
+    data_store = store.ParquetStore(store_dir, data_dir)
+    data_store.read_file(path, 'diario')
+    with open(path, encoding='utf-8-sig') as f:
+        text = f.read()
+    with open(path, 'w', encoding='utf-8-sig') as f:
+        f.write(text.replace('ALICE', 'ALINE', 1)) # Mesmo tamanho
+    stat = os.stat(path)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+    df = data_store.read_file(path, 'diario')
+    assert len(compiles) == 2
+    assert 'ALINE' in set(df['Agente'].astype(str))
+
+
+def test_compile_tree_skips_unchanged_and_drops_deleted(tree):
+    data_dir, store_dir, path = tree
+    data_store = store.ParquetStore(store_dir, data_dir)
+    assert data_store.compile_tree(workers=1)['compilados'] == 1
+    assert data_store.compile_tree(workers=1)['inalterados'] == 1
+    os.remove(path)
+    assert data_store.compile_tree(workers=1)['removidos'] == 1